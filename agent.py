@@ -1,14 +1,28 @@
+import asyncio
 import re
-from typing import TypedDict, List
-from langchain_core.tools import tool
-from langchain_milvus import Milvus
-from langchain_groq import ChatGroq
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypedDict, List, Optional
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tools import StructuredTool
+from langgraph.config import get_config
 from langgraph.graph import StateGraph, END
 from pydantic import BaseModel
-from langgraph.checkpoint.memory import MemorySaver
 
 import config
-from data_handler import FastEmbedEmbeddings
+import metrics
+from llm_cache import current_node, node_context
+from resources import (
+    get_checkpointer,
+    get_embedding_model,
+    get_llm,
+    get_prefetcher,
+    get_reranker,
+    get_sparse_index,
+    get_vector_backend,
+)
+from manifest import current_generation
+from retrieval import PlanContext, build_plan_context, fuse_rankings, missing_ids
 from prompts import PLANNER_PROMPT, DRAFT_PROMPT, REVISER_PROMPT
 
 
@@ -24,92 +38,315 @@ class AgentState(TypedDict):
 
 
 # --- 2. Define Tools (No changes) ---
-llm = ChatGroq(model="llama-3.1-8b-instant", temperature=0)
-embedding_model = FastEmbedEmbeddings(model_name=config.EMBEDDING_MODEL)
-vector_store = Milvus(
-    embedding_function=embedding_model,
-    collection_name=config.COLLECTION_NAME,
-    connection_args={"host": config.MILVUS_HOST, "port": config.MILVUS_PORT},
-    drop_old=False,
-)
+# The chat model comes from the registry (resources.get_llm), so benchmarks
+# and tests can swap in an offline model
+def _invoke_llm(prompt: str):
+    """Calls the chat model and records its latency and token usage."""
+    started = time.perf_counter()
+    response = get_llm().invoke(prompt)
+    metrics.record_llm_call(current_node(), time.perf_counter() - started, response)
+    return response
+
+
+async def _ainvoke_llm(prompt: str):
+    """Async variant of `_invoke_llm`."""
+    llm = await asyncio.to_thread(get_llm)
+    started = time.perf_counter()
+    response = await llm.ainvoke(prompt)
+    metrics.record_llm_call(current_node(), time.perf_counter() - started, response)
+    return response
+
+
+def format_search_results(query: str, hits: List[dict]) -> str:
+    """Renders retrieved chunks as source-tagged context."""
+    if not hits:
+        return f"No information found for query: '{query}'"
+    context_parts = [
+        f"[Source: {hit['source']}, page: {hit['page']}]\n{hit['text']}" for hit in hits
+    ]
+    return "\n\n---\n\n".join(context_parts)
 
 
-@tool
-def vector_database_search(query: str) -> str:
-    """Searches the local document knowledge base to find relevant information."""
+def _embed_queries(queries: List[str]):
+    return get_embedding_model().embed_queries(queries)
+
+
+def _vector_database_search(query: str) -> str:
     print(f"--- Performing vector search for query: '{query}' ---")
     try:
-        retrieved_docs = vector_store.similarity_search(query, k=3)
-        if not retrieved_docs:
-            return f"No information found for query: '{query}'"
-        context_parts = [
-            f"[Source: {doc.metadata.get('source', 'N/A')}, page: {doc.metadata.get('page', 'N/A')}]\n{doc.page_content}"
-            for doc in retrieved_docs
-        ]
-        return "\n\n---\n\n".join(context_parts)
+        # Shared, lazily created backend (see resources.py)
+        vectors = get_embedding_model().embed_queries([query])
+        hits = get_vector_backend().search(vectors, k=config.RETRIEVAL_TOP_K)
+        return format_search_results(query, hits[0])
+    except Exception as e:
+        return f"Search error: {str(e)}"
+
+
+async def _avector_database_search(query: str) -> str:
+    print(f"--- Performing async vector search for query: '{query}' ---")
+    try:
+        # ONNX inference is CPU-bound, so it runs off the event loop
+        vectors = await asyncio.to_thread(_embed_queries, [query])
+        backend = await asyncio.to_thread(get_vector_backend)
+        hits = await backend.asearch(vectors, k=config.RETRIEVAL_TOP_K)
+        return format_search_results(query, hits[0])
     except Exception as e:
         return f"Search error: {str(e)}"
 
 
+# One tool, usable from both invoke() and ainvoke()
+vector_database_search = StructuredTool.from_function(
+    func=_vector_database_search,
+    coroutine=_avector_database_search,
+    name="vector_database_search",
+    description="Searches the local document knowledge base to find relevant information.",
+)
+
+
+def _search_step(query: str) -> str:
+    try:
+        return vector_database_search.invoke({"query": query})
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+
+async def _asearch_step(query: str, semaphore: asyncio.Semaphore) -> str:
+    async with semaphore:
+        try:
+            return await vector_database_search.ainvoke({"query": query})
+        except Exception as e:
+            return f"Error: {str(e)}"
+
+
+def _per_step_context(queries: List[str], results: List[str]) -> PlanContext:
+    """Fallback context: each step's own results, in plan order."""
+    text = "\n\n".join(
+        f"**Research for '{query}':**\n{result}"
+        for query, result in zip(queries, results)
+    )
+    return PlanContext(text, 0, 0, 0)
+
+
+def _keyword_rankings(queries: List[str]) -> Optional[List[List[str]]]:
+    """BM25 rankings per step, or None when the keyword index is unavailable."""
+    sparse_index = get_sparse_index()
+    if sparse_index is None or not sparse_index.is_current(current_generation()):
+        return None
+    return [
+        [pk for pk, _ in sparse_index.search(query, config.RETRIEVAL_FETCH_K)]
+        for query in queries
+    ]
+
+
+def _fetch_k(reranker) -> int:
+    """Candidates per step: the reranker gets a deeper list to reorder."""
+    return config.RERANK_FETCH_K if reranker is not None else config.RETRIEVAL_FETCH_K
+
+
+def _plan_context(
+    queries: List[str], vectors, hits: List[List[dict]], reranker
+) -> PlanContext:
+    """Reranks every step's hits in one batched pass, then pools them."""
+    if reranker is not None:
+        reranked = reranker.rerank(queries, hits)
+        if reranked is not None:
+            hits, relevance = reranked
+            return build_plan_context(vectors, hits, relevance)
+        # Over budget or no model: vector order, at the usual depth
+        hits = [step_hits[: config.RETRIEVAL_FETCH_K] for step_hits in hits]
+    return build_plan_context(vectors, hits)
+
+
+def search_plan(queries: List[str]) -> PlanContext:
+    """
+    Retrieves a compact context covering every plan step.
+
+    All steps are embedded in one batch and sent to the vector backend as a single
+    multi-vector search that over-fetches candidates per step. Each step's
+    dense ranking is fused with its BM25 keyword ranking and reranked by the
+    cross-encoder (see reranker.py), and the pooled candidates are
+    deduplicated and diversified (see retrieval.py). If that
+    request fails, the steps are searched concurrently on a bounded pool, each
+    with its own error handling.
+    """
+    if not queries:
+        return _per_step_context([], [])
+    try:
+        vectors = get_embedding_model().embed_queries(queries)
+        backend = get_vector_backend()
+        reranker = get_reranker()
+        hits = backend.search(vectors, k=_fetch_k(reranker), with_vectors=True)
+        sparse = _keyword_rankings(queries)
+        if sparse is not None:
+            fetched = backend.get(missing_ids(hits, sparse), with_vectors=True)
+            hits = fuse_rankings(hits, sparse, fetched)
+        return _plan_context(queries, vectors, hits, reranker)
+    except Exception as e:
+        print(f"--- Batched search failed ({e}), searching steps concurrently ---")
+
+    workers = max(1, min(config.RETRIEVAL_MAX_WORKERS, len(queries)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # map() keeps plan order regardless of completion order
+        return _per_step_context(queries, list(executor.map(_search_step, queries)))
+
+
+async def asearch_plan(queries: List[str]) -> PlanContext:
+    """Async variant of `search_plan`; the fallback uses bounded gather()."""
+    if not queries:
+        return _per_step_context([], [])
+    try:
+        # The registry getters may wait for warm-up, so they run off the loop
+        # too; ONNX inference is CPU-bound
+        vectors = await asyncio.to_thread(_embed_queries, queries)
+        backend = await asyncio.to_thread(get_vector_backend)
+        reranker = await asyncio.to_thread(get_reranker)
+        hits = await backend.asearch(vectors, k=_fetch_k(reranker), with_vectors=True)
+        sparse = await asyncio.to_thread(_keyword_rankings, queries)
+        if sparse is not None:
+            fetched = await backend.aget(missing_ids(hits, sparse), with_vectors=True)
+            hits = fuse_rankings(hits, sparse, fetched)
+        # Cross-encoder inference is CPU-bound as well
+        return await asyncio.to_thread(_plan_context, queries, vectors, hits, reranker)
+    except Exception as e:
+        print(f"--- Batched search failed ({e}), searching steps concurrently ---")
+
+    semaphore = asyncio.Semaphore(max(1, config.RETRIEVAL_MAX_WORKERS))
+    # gather() keeps plan order regardless of completion order
+    results = await asyncio.gather(*(_asearch_step(q, semaphore) for q in queries))
+    return _per_step_context(queries, list(results))
+
+
 # --- 3. Define Graph Nodes (CORRECTED) ---
-def planner_node(state: AgentState):
-    print("--- 📝 PLANNER ---")
-    log = ["Generating a new research plan..."]
-    prompt = PLANNER_PROMPT.format(task=state["task"])
-    response = llm.invoke(prompt)
-    plan_text = response.content
-    plan_items = [
+# Every node has a sync and an async variant sharing the same prompt and state
+# handling, so the graph works with both invoke()/stream() and
+# ainvoke()/astream(). The async variants await the LLM and the vector store
+# instead of blocking a worker thread.
+def _parse_plan(plan_text: str) -> List[str]:
+    return [
         item.strip()
         for item in re.split(r"^\d+\.\s*", plan_text, flags=re.MULTILINE)
         if item.strip()
     ]
+
+
+def _planner_update(response) -> dict:
+    plan_items = _parse_plan(response.content)
     print(f"--- Parsed Plan: {plan_items} ---")
-    log.append("Plan generated successfully.")
+    log = ["Generating a new research plan...", "Plan generated successfully."]
     return {"plan": plan_items, "reasoning_log": log}
 
 
-def researcher_node(state: AgentState):
-    print("--- 📚 RESEARCHER ---")
+def planner_node(state: AgentState):
+    print("--- 📝 PLANNER ---")
+    prompt = PLANNER_PROMPT.format(task=state["task"])
+    return _planner_update(_invoke_llm(prompt))
+
+
+async def aplanner_node(state: AgentState):
+    print("--- 📝 PLANNER ---")
+    prompt = PLANNER_PROMPT.format(task=state["task"])
+    return _planner_update(await _ainvoke_llm(prompt))
+
+
+def _researcher_update(
+    state: AgentState, context: PlanContext, started: float, prefetched: bool
+) -> dict:
     log = state["reasoning_log"] + ["Executing research based on the plan..."]
-    research_results = []
-    research_results.append(f"**Original Query:** {state['task']}")
+    if prefetched:
+        log.append("  - Using the searches started while the plan was reviewed.")
     for i, plan_item in enumerate(state["plan"], 1):
         log.append(f"  - Researching step {i}/{len(state['plan'])}: {plan_item}")
-        try:
-            result = vector_database_search.invoke({"query": plan_item})
-            research_results.append(f"**Research for '{plan_item}':**\n{result}")
-        except Exception as e:
-            research_results.append(f"**Research for '{plan_item}':**\nError: {str(e)}")
-    research_summary = "\n\n" + "=" * 50 + "\n\n".join(research_results)
-    log.append("Research complete. All sources gathered.")
+    if context.candidates:
+        log.append(
+            f"  - Pooled {context.candidates} results: {context.unique} unique, "
+            f"{context.selected} kept for the report."
+        )
+    plan_text = "\n".join(
+        f"{i}. {plan_item}" for i, plan_item in enumerate(state["plan"], 1)
+    )
+    research_summary = (
+        f"**Original Query:** {state['task']}\n\n"
+        f"**Research Plan:**\n{plan_text}\n\n"
+        f"**Sources:**\n{context.text}"
+    )
+    log.append(
+        f"Research complete. All sources gathered in {time.perf_counter() - started:.2f}s."
+    )
     return {"research_summary": research_summary, "reasoning_log": log}
 
 
-def draft_writer_node(state: AgentState):
-    print("--- ✍️ DRAFT WRITER ---")
-    log = state["reasoning_log"] + ["Writing the first draft of the report..."]
-    prompt = DRAFT_PROMPT.format(
+def _thread_id() -> Optional[str]:
+    """The LangGraph thread (session) the running node belongs to."""
+    return get_config().get("configurable", {}).get("thread_id")
+
+
+def researcher_node(state: AgentState):
+    print("--- 📚 RESEARCHER ---")
+    started = time.perf_counter()
+    # Searches the app started while the plan was shown (see prefetch.py)
+    prefetcher = get_prefetcher()
+    context = None
+    if prefetcher is not None:
+        context = prefetcher.result(_thread_id(), state["plan"])
+    prefetched = context is not None
+    if context is None:
+        context = search_plan(state["plan"])
+    return _researcher_update(state, context, started, prefetched)
+
+
+async def aresearcher_node(state: AgentState):
+    print("--- 📚 RESEARCHER ---")
+    started = time.perf_counter()
+    prefetcher = await asyncio.to_thread(get_prefetcher)
+    context = None
+    if prefetcher is not None:
+        context = await prefetcher.aresult(_thread_id(), state["plan"])
+    prefetched = context is not None
+    if context is None:
+        context = await asearch_plan(state["plan"])
+    return _researcher_update(state, context, started, prefetched)
+
+
+def _draft_prompt(state: AgentState) -> str:
+    return DRAFT_PROMPT.format(
         task=state["task"], research_summary=state["research_summary"]
     )
 
+
+def _draft_update(state: AgentState, response) -> dict:
+    log = state["reasoning_log"] + ["Writing the first draft of the report..."]
     # THE FIX: Extract the .content attribute from the AIMessage object
-    response = llm.invoke(prompt)
-    draft_content = response.content
+    return {"draft": response.content, "reasoning_log": log}
+
 
-    return {"draft": draft_content, "reasoning_log": log}
+def draft_writer_node(state: AgentState):
+    print("--- ✍️ DRAFT WRITER ---")
+    return _draft_update(state, _invoke_llm(_draft_prompt(state)))
+
+
+async def adraft_writer_node(state: AgentState):
+    print("--- ✍️ DRAFT WRITER ---")
+    return _draft_update(state, await _ainvoke_llm(_draft_prompt(state)))
+
+
+def _reviser_prompt(state: AgentState) -> str:
+    return REVISER_PROMPT.format(task=state["task"], draft=state["draft"])
+
+
+def _reviser_update(state: AgentState, response) -> dict:
+    log = state["reasoning_log"] + ["Revising and polishing the final report..."]
+    log.append("Report finalized.")
+    return {"revised_draft": response.content, "reasoning_log": log}
 
 
 def reviser_node(state: AgentState):
     print("--- ✨ REVISER ---")
-    log = state["reasoning_log"] + ["Revising and polishing the final report..."]
-    prompt = REVISER_PROMPT.format(task=state["task"], draft=state["draft"])
+    return _reviser_update(state, _invoke_llm(_reviser_prompt(state)))
 
-    # THE FIX: Extract the .content attribute from the AIMessage object
-    response = llm.invoke(prompt)
-    revised_draft_content = response.content
 
-    log.append("Report finalized.")
-    return {"revised_draft": revised_draft_content, "reasoning_log": log}
+async def areviser_node(state: AgentState):
+    print("--- ✨ REVISER ---")
+    return _reviser_update(state, await _ainvoke_llm(_reviser_prompt(state)))
 
 
 # --- 4. Define the Conditional Edge (No changes) ---
@@ -118,11 +355,39 @@ def should_continue(state: AgentState):
 
 
 # --- 5. Build and Export the Graph (No changes) ---
+def _with_timing(update: dict, span: metrics.NodeSpan) -> dict:
+    """Adds the node's timing summary to the reasoning log it returns."""
+    return {**update, "reasoning_log": update["reasoning_log"] + [span.summary()]}
+
+
+def _graph_node(name: str, func, afunc) -> RunnableLambda:
+    """
+    Sync/async node whose LLM calls are attributed to `name` in cache stats,
+    and whose time, tokens and searches are recorded in metrics.
+    """
+
+    def run(state: AgentState):
+        with node_context(name), metrics.node_span(name) as span:
+            update = func(state)
+        return _with_timing(update, span)
+
+    async def arun(state: AgentState):
+        with node_context(name), metrics.node_span(name) as span:
+            update = await afunc(state)
+        return _with_timing(update, span)
+
+    return RunnableLambda(run, afunc=arun, name=name)
+
+
 graph_builder = StateGraph(AgentState)
-graph_builder.add_node("planner", planner_node)
-graph_builder.add_node("researcher", researcher_node)
-graph_builder.add_node("draft_writer", draft_writer_node)
-graph_builder.add_node("reviser", reviser_node)
+graph_builder.add_node("planner", _graph_node("planner", planner_node, aplanner_node))
+graph_builder.add_node(
+    "researcher", _graph_node("researcher", researcher_node, aresearcher_node)
+)
+graph_builder.add_node(
+    "draft_writer", _graph_node("draft_writer", draft_writer_node, adraft_writer_node)
+)
+graph_builder.add_node("reviser", _graph_node("reviser", reviser_node, areviser_node))
 graph_builder.set_entry_point("planner")
 graph_builder.add_conditional_edges(
     "planner", should_continue, {"continue": "researcher", "pause": END}
@@ -131,5 +396,5 @@ graph_builder.add_edge("researcher", "draft_writer")
 graph_builder.add_edge("draft_writer", "reviser")
 graph_builder.add_edge("reviser", END)
 
-checkpointer = MemorySaver()
-research_agent = graph_builder.compile(checkpointer=checkpointer)
+# Bounded and persistent, so sessions survive restarts (see checkpointer.py)
+research_agent = graph_builder.compile(checkpointer=get_checkpointer())
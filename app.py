@@ -1,40 +1,149 @@
+import asyncio
 import gradio as gr
-import markdown
-from weasyprint import HTML
 import os
+import threading
+import time
 import uuid
 from langchain_core.messages import HumanMessage
 
-from agent import research_agent
+from agent import asearch_plan, research_agent
 import config
-from data_handler import process_and_embed_pdfs
+import health
+import metrics
+from manifest import current_generation
+from resources import (
+    get_embedding_model,
+    get_export_jobs,
+    get_llm_cache,
+    get_prefetcher,
+    get_report_cache,
+    warm_up,
+)
+
+# Nodes whose LLM tokens are streamed into the chatbot, with their status text
+STREAMED_NODES = {
+    "draft_writer": "*Writing the first draft...*",
+    "reviser": "*Revising and polishing the report...*",
+}
+# Minimum seconds between streamed UI updates
+STREAM_UPDATE_INTERVAL = 0.05
 
 
 # --- Helper & File Upload Functions (No changes) ---
-def generate_exports(markdown_report: str):
-    md_path = "research_report.md"
-    with open(md_path, "w", encoding="utf-8") as f:
-        f.write(markdown_report)
-    html_report = markdown.markdown(markdown_report)
-    pdf_path = "research_report.pdf"
-    HTML(string=html_report).write_pdf(pdf_path)
-    return md_path, pdf_path
+async def deliver_report(
+    thread_id: str, report: str, chat_history: list, reasoning_log: str
+):
+    """
+    Shows the finished report with its Markdown download, then the PDF
+    download once the background export job has rendered it (see exports.py).
+    """
+    export_jobs = await asyncio.to_thread(get_export_jobs)
+    md_path = await asyncio.to_thread(export_jobs.write_markdown, thread_id, report)
+    pdf_job = export_jobs.submit_pdf(thread_id, report)
+    yield (
+        chat_history,
+        reasoning_log,
+        gr.update(value=md_path, visible=True),
+        gr.update(visible=False),
+        gr.update(interactive=True),  # Re-enable start button
+        gr.update(visible=False),
+    )
+    try:
+        pdf_path = await asyncio.wrap_future(pdf_job)
+    except Exception as e:
+        print(f"PDF export failed: {e}")
+        return
+    # Only the PDF button changes: a new research may have started meanwhile
+    yield (
+        gr.update(),
+        gr.update(),
+        gr.update(),
+        gr.update(value=pdf_path, visible=True),
+        gr.update(),
+        gr.update(),
+    )
 
 
 def handle_file_upload(files):
     if not files:
         return "No files uploaded."
     file_paths = [file.name for file in files]
+    # Ingestion (PDF parsing, fastembed) is loaded on first upload
+    from data_handler import process_and_embed_pdfs
+
     try:
-        docs_processed, chunks_ingested = process_and_embed_pdfs(file_paths)
+        docs_processed, chunks_ingested = process_and_embed_pdfs(
+            file_paths, origin="upload"
+        )
         return f"✅ Successfully processed {docs_processed} file(s) and ingested {chunks_ingested} new chunks."
     except Exception as e:
         return f"❌ Error during file processing: {e}"
 
 
+# --- Semantic Report Cache ---
+def _embed_task_sync(task: str):
+    return get_embedding_model().embed_queries([task])[0]
+
+
+async def _embed_task(task: str):
+    # Resolving the model may wait for warm-up, so not on the event loop
+    return await asyncio.to_thread(_embed_task_sync, task)
+
+
+async def lookup_cached_report(task: str):
+    """Returns a cached report for a near-identical task, or None."""
+    report_cache = await asyncio.to_thread(get_report_cache)
+    if report_cache is None:
+        return None
+    try:
+        embedding = await _embed_task(task)
+        # SQLite and manifest reads, so not on the event loop either
+        return await asyncio.to_thread(
+            lambda: report_cache.lookup(embedding, current_generation())
+        )
+    except Exception as e:
+        print(f"Report cache lookup failed: {e}")
+        return None
+
+
+async def store_report(final_state: dict, generation: int):
+    report_cache = await asyncio.to_thread(get_report_cache)
+    if report_cache is None:
+        return
+    try:
+        await asyncio.to_thread(
+            report_cache.store,
+            final_state["task"],
+            await _embed_task(final_state["task"]),
+            generation,
+            final_state["plan"],
+            final_state["revised_draft"],
+            final_state["reasoning_log"],
+        )
+    except Exception as e:
+        print(f"Could not cache report: {e}")
+
+
+def cancel_prefetches(request: gr.Request):
+    """Stops the searches of a plan whose browser tab was closed."""
+    prefetcher = get_prefetcher()
+    if prefetcher is not None:
+        prefetcher.cancel_owner(request.session_hash)
+
+
+def _plan_markdown(plan: list) -> str:
+    return "### Research Plan\n" + "\n".join(f"1. {step}" for step in plan)
+
+
 # --- Agent Interaction Logic (REBUILT FOR STABILITY) ---
-def start_new_research(query: str, chat_history: list):
+# The handlers are async generators: while a session waits on Groq or Milvus
+# the event loop serves other sessions instead of pinning a worker thread.
+async def start_new_research(query: str, chat_history: list, request: gr.Request):
     """PHASE 1: Plan the research."""
+    prefetcher = await asyncio.to_thread(get_prefetcher)
+    if prefetcher is not None:
+        # A plan this tab did not execute is abandoned
+        prefetcher.cancel_owner(request.session_hash)
     chat_history.append({"role": "user", "content": query})
     thread_id = str(uuid.uuid4())
     config = {"configurable": {"thread_id": thread_id}}
@@ -45,16 +154,43 @@ def start_new_research(query: str, chat_history: list):
         "*Generating research plan...*",
         thread_id,
         None,
+        None,
         gr.update(interactive=False),
         gr.update(visible=False),
     )
 
+    # A near-identical question against the same corpus: skip the planner and
+    # hand the cached report to the execution phase
+    cached = await lookup_cached_report(query)
+    if cached is not None:
+        yield (
+            chat_history,
+            _plan_markdown(cached.plan)
+            + f"\n\n*Cached report found (similarity {cached.similarity:.2f}).*",
+            thread_id,
+            cached.plan,
+            cached,
+            gr.update(interactive=False),
+            gr.update(visible=True, interactive=True),
+        )
+        return
+
     # Run the planning phase
-    result = research_agent.invoke(
+    result = await research_agent.ainvoke(
         {"task": query, "execute_research": False}, config=config
     )
     plan = result["plan"]
-    plan_markdown = "### Research Plan\n" + "\n".join(f"1. {step}" for step in plan)
+    plan_markdown = _plan_markdown(plan)
+    # Search for every step while the user reads the plan; the researcher
+    # uses the result if the plan is executed
+    if prefetcher is not None:
+        prefetcher.start(
+            thread_id,
+            plan,
+            asearch_plan,
+            await asyncio.to_thread(current_generation),
+            owner=request.session_hash,
+        )
 
     # Final update for this phase
     yield (
@@ -62,15 +198,54 @@ def start_new_research(query: str, chat_history: list):
         plan_markdown,
         thread_id,
         plan,
+        None,
         gr.update(interactive=False),
         gr.update(visible=True, interactive=True),
     )
 
 
-def execute_research(thread_id: str, plan: list, chat_history: list):
+async def execute_research(
+    thread_id: str, plan: list, cached_report, chat_history: list
+):
     """PHASE 2: Execute the plan and generate the report."""
     config = {"configurable": {"thread_id": thread_id}}
 
+    if cached_report is not None:
+        chat_history.append({"role": "assistant", "content": cached_report.report})
+        reasoning_log = cached_report.reasoning_log + [
+            f"Served from the report cache (similarity {cached_report.similarity:.2f}"
+            f" to: '{cached_report.task}')."
+        ]
+        async for update in deliver_report(
+            thread_id,
+            cached_report.report,
+            chat_history,
+            "\n".join(f"- {step}" for step in reasoning_log),
+        ):
+            yield update
+        return
+
+    # The session's checkpoint may have expired (or been evicted) while the
+    # plan was on screen; the graph would then start over without a task
+    state = await research_agent.aget_state(config)
+    if not state.values.get("task") or not state.values.get("plan"):
+        chat_history.append(
+            {
+                "role": "assistant",
+                "content": "This research session has expired. "
+                "Please start the research again.",
+            }
+        )
+        yield (
+            chat_history,
+            "*Session expired.*",
+            gr.update(visible=False),
+            gr.update(visible=False),
+            gr.update(interactive=True),
+            gr.update(visible=False, interactive=False),
+        )
+        return
+
     # Update UI immediately
     yield (
         chat_history,
@@ -81,29 +256,73 @@ def execute_research(thread_id: str, plan: list, chat_history: list):
         gr.update(visible=False, interactive=False),
     )
 
-    # Run the execution phase
-    final_state = research_agent.invoke({"execute_research": True}, config=config)
+    # Reports are cached under the generation they were researched against
+    generation = await asyncio.to_thread(current_generation)
+
+    # Run the execution phase, streaming LLM tokens from the writing nodes into
+    # the chatbot as they arrive; the final state comes from the "values" stream
+    final_state = None
+    streaming_node = None
+    partial_report = ""
+    last_update = 0.0
+    async for mode, chunk in research_agent.astream(
+        {"execute_research": True},
+        config=config,
+        stream_mode=["messages", "values"],
+    ):
+        if mode == "values":
+            final_state = chunk
+            continue
+
+        message, metadata = chunk
+        node = metadata.get("langgraph_node")
+        if node not in STREAMED_NODES or not isinstance(message.content, str):
+            continue
+        if node != streaming_node:
+            # The reviser rewrites the report from scratch
+            if streaming_node is None:
+                chat_history.append({"role": "assistant", "content": ""})
+            streaming_node = node
+            partial_report = ""
+        partial_report += message.content
+
+        now = time.monotonic()
+        if now - last_update < STREAM_UPDATE_INTERVAL:
+            continue
+        last_update = now
+        chat_history[-1]["content"] = partial_report
+        yield (
+            chat_history,
+            STREAMED_NODES[node],
+            gr.update(visible=False),
+            gr.update(visible=False),
+            gr.update(interactive=False),
+            gr.update(visible=False, interactive=False),
+        )
 
     final_report = final_state["revised_draft"]
     reasoning_log = "\n".join(f"- {step}" for step in final_state["reasoning_log"])
-    chat_history.append({"role": "assistant", "content": final_report})
-    md_path, pdf_path = generate_exports(final_report)
+    if streaming_node is None:
+        chat_history.append({"role": "assistant", "content": final_report})
+    else:
+        chat_history[-1]["content"] = final_report
+    await store_report(final_state, generation)
+    llm_cache = get_llm_cache()
+    if llm_cache is not None:
+        print(f"--- LLM cache hit rates per node: {llm_cache.stats()} ---")
 
-    # Final update for the entire process
-    yield (
-        chat_history,
-        reasoning_log,
-        gr.update(value=md_path, visible=True),
-        gr.update(value=pdf_path, visible=True),
-        gr.update(interactive=True),  # Re-enable start button
-        gr.update(visible=False),
-    )
+    # Final update for the entire process; the PDF follows when it is rendered
+    async for update in deliver_report(
+        thread_id, final_report, chat_history, reasoning_log
+    ):
+        yield update
 
 
 # --- Gradio UI Definition ---
 with gr.Blocks(theme=gr.themes.Soft(), title=config.APP_TITLE) as demo:
     plan_state = gr.State()
     thread_id_state = gr.State()
+    cached_report_state = gr.State()
 
     gr.Markdown(f"# {config.APP_TITLE}")
     with gr.Row():
@@ -138,6 +357,7 @@ with gr.Blocks(theme=gr.themes.Soft(), title=config.APP_TITLE) as demo:
             reasoning_display,
             thread_id_state,
             plan_state,
+            cached_report_state,
             plan_button,
             execute_button,
         ],
@@ -145,7 +365,7 @@ with gr.Blocks(theme=gr.themes.Soft(), title=config.APP_TITLE) as demo:
 
     execute_button.click(
         fn=execute_research,
-        inputs=[thread_id_state, plan_state, chatbot],
+        inputs=[thread_id_state, plan_state, cached_report_state, chatbot],
         outputs=[
             chatbot,
             reasoning_display,
@@ -160,5 +380,29 @@ with gr.Blocks(theme=gr.themes.Soft(), title=config.APP_TITLE) as demo:
         fn=handle_file_upload, inputs=[upload_button], outputs=[upload_status]
     )
 
+    demo.unload(cancel_prefetches)
+
+
+def _warm_up_in_background():
+    # Retried until it succeeds: /readyz (and the container healthcheck)
+    # stays 503 until then, while requests still load resources on first use
+    delay = config.READINESS_PROBE_SECONDS
+    while True:
+        try:
+            warm_up()
+            return
+        except Exception as e:
+            print(f"Warm-up failed ({e}), retrying in {delay:.0f}s")
+        time.sleep(delay)
+        delay = min(delay * 2, config.WARM_UP_RETRY_MAX_SECONDS)
+
+
 if __name__ == "__main__":
+    # The UI serves straight away while the embedding model loads and the
+    # vector store connects; GET /readyz turns 200 once that is done
+    threading.Thread(target=_warm_up_in_background, name="warm-up", daemon=True).start()
+    try:
+        metrics.serve(ready=health.readiness)
+    except OSError as e:
+        print(f"Metrics endpoint not started: {e}")
     demo.launch()
@@ -0,0 +1,7 @@
+"""
+Offline benchmarks. Run them from the repository root, e.g.
+
+    python -m benchmarks.retrieval_benchmark --sizes 1000,10000
+
+Each one prints a summary table and writes machine-readable JSON results.
+"""
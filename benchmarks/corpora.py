@@ -0,0 +1,182 @@
+"""
+Labelled corpora for the benchmarks, built without network access.
+
+- `synthetic_corpus`: clustered random unit vectors; queries are new points
+  from the same distribution and the relevant chunk is the exact nearest
+  neighbour, so recall@k measures what an approximate index loses.
+- `pdf_corpus`: the chunks of the PDFs in `data/`, padded to the requested
+  size with distractors stitched together from short word runs of random real
+  chunks (same vocabulary, no long verbatim passages). Each query is a window
+  of words from one real chunk.
+
+Text is embedded with `HashingEmbedder`, a deterministic feature-hashing
+stand-in for the ONNX model, so nothing has to be downloaded.
+"""
+
+import os
+import zlib
+from collections import Counter
+from typing import Dict, List, NamedTuple, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+import config
+from sparse_index import tokenize
+
+DEFAULT_DIM = 384
+# Words per PDF-derived query, and per run copied into a distractor
+QUERY_WORDS = 12
+DISTRACTOR_RUN_WORDS = 3
+
+
+class Corpus(NamedTuple):
+    name: str
+    ids: List[str]
+    texts: List[str]
+    metadatas: List[dict]
+    vectors: np.ndarray
+    query_texts: List[str]
+    query_vectors: np.ndarray
+    relevant_ids: List[str]  # one relevant chunk per query
+
+
+def _unit_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+class HashingEmbedder(Embeddings):
+    """
+    Signed feature hashing of log-scaled word counts, L2-normalised.
+
+    Shares the interface of `data_handler.FastEmbedEmbeddings`, so it can be
+    used wherever the app expects the embedding model.
+    """
+
+    def __init__(self, dim: int = DEFAULT_DIM):
+        self.dim = dim
+        self._buckets: Dict[str, Tuple[int, float]] = {}
+
+    def _bucket(self, token: str) -> Tuple[int, float]:
+        bucket = self._buckets.get(token)
+        if bucket is None:
+            digest = zlib.crc32(token.encode("utf-8"))
+            bucket = (digest % self.dim, 1.0 if digest & 0x80000000 else -1.0)
+            self._buckets[token] = bucket
+        return bucket
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token, count in Counter(tokenize(text)).items():
+                column, sign = self._bucket(token)
+                matrix[row, column] += sign * (1.0 + np.log(count))
+        return _unit_rows(matrix)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_array([text])[0].tolist()
+
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        return self.embed_array(texts)
+
+
+def synthetic_corpus(
+    size: int,
+    num_queries: int,
+    dim: int = DEFAULT_DIM,
+    chunks_per_cluster: int = 50,
+    spread: float = 0.5,
+    seed: int = 0,
+) -> Corpus:
+    """Gaussian clusters of unit vectors; labels are exact nearest neighbours."""
+    rng = np.random.default_rng(seed)
+    clusters = max(1, size // chunks_per_cluster)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+
+    def _sample(count: int):
+        assignment = rng.integers(0, clusters, count)
+        noise = spread * rng.standard_normal((count, dim)).astype(np.float32)
+        return assignment, _unit_rows(centers[assignment] + noise)
+
+    assignment, vectors = _sample(size)
+    _, query_vectors = _sample(num_queries)
+    targets = np.argmax(query_vectors @ vectors.T, axis=1)
+    ids = [f"syn-{i}" for i in range(size)]
+    return Corpus(
+        name="synthetic",
+        ids=ids,
+        texts=[f"synthetic chunk {i}" for i in range(size)],
+        metadatas=[
+            {"source": f"cluster-{assignment[i]}.pdf", "page": 0} for i in range(size)
+        ],
+        vectors=vectors,
+        query_texts=[f"synthetic query {i}" for i in range(num_queries)],
+        query_vectors=query_vectors,
+        relevant_ids=[ids[t] for t in targets],
+    )
+
+
+def load_pdf_chunks(directory: str = config.DATA_DIRECTORY) -> List[Tuple[str, dict]]:
+    """`(text, metadata)` of every chunk of the PDFs in `directory`."""
+    from pdf_parser import iter_split_pdfs
+
+    pdf_files = sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.lower().endswith(".pdf")
+    )
+    chunks = []
+    for _, range_chunks, _ in iter_split_pdfs(pdf_files):
+        for chunk in range_chunks or []:
+            if len(chunk.page_content.split()) >= QUERY_WORDS:
+                chunks.append((chunk.page_content, chunk.metadata))
+    return chunks
+
+
+def pdf_corpus(
+    size: int,
+    num_queries: int,
+    base_chunks: List[Tuple[str, dict]],
+    embedder: HashingEmbedder,
+    seed: int = 0,
+) -> Corpus:
+    """Real chunks plus stitched distractors; queries are windows of real chunks."""
+    if not base_chunks:
+        raise ValueError("no PDF chunks to build a corpus from")
+    rng = np.random.default_rng(seed)
+    real = base_chunks[:size]
+    texts = [text for text, _ in real]
+    metadatas = [dict(metadata) for _, metadata in real]
+    words = [text.split() for text in texts]
+    while len(texts) < size:
+        length = len(words[rng.integers(0, len(real))])
+        stitched: List[str] = []
+        while len(stitched) < length:
+            source = words[rng.integers(0, len(real))]
+            start = rng.integers(0, max(1, len(source) - DISTRACTOR_RUN_WORDS))
+            stitched.extend(source[start : start + DISTRACTOR_RUN_WORDS])
+        texts.append(" ".join(stitched))
+        metadatas.append({"source": "distractor.pdf", "page": 0})
+    ids = [f"pdf-{i}" for i in range(size)]
+
+    # A small PDF set has fewer chunks than queries; windows then repeat chunks
+    targets = rng.choice(len(real), num_queries, replace=num_queries > len(real))
+    query_texts = []
+    for target in targets:
+        start = rng.integers(0, len(words[target]) - QUERY_WORDS + 1)
+        query_texts.append(" ".join(words[target][start : start + QUERY_WORDS]))
+    return Corpus(
+        name="pdf",
+        ids=ids,
+        texts=texts,
+        metadatas=metadatas,
+        vectors=embedder.embed_array(texts),
+        query_texts=query_texts,
+        query_vectors=embedder.embed_array(query_texts),
+        relevant_ids=[ids[t] for t in targets],
+    )
@@ -0,0 +1,115 @@
+"""
+Deterministic stand-in for ChatGroq.
+
+`ScriptedChatModel` answers according to the graph node that calls it (see
+`llm_cache.node_context`): the planner gets a numbered plan and the writing
+nodes get text of a configured length. Each call sleeps for a simulated time
+to first token plus generation time, and reports token usage like a real
+model, so pipeline timings and token volumes are reproducible offline.
+"""
+
+import asyncio
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from llm_cache import current_node
+
+# The planner prompt puts the user's question on the line after this label
+TASK_PATTERN = re.compile(r"User Query:\**\s*\n(.+)")
+# Steps in the scripted research plan
+PLAN_STEPS = 5
+PLAN_ASPECTS = (
+    "background and definitions",
+    "key requirements and constraints",
+    "evaluation criteria",
+    "timeline and deliverables",
+    "examples and prior work",
+    "risks and open questions",
+)
+
+
+def _prompt_text(messages: List[BaseMessage]) -> str:
+    return "\n".join(
+        message.content for message in messages if isinstance(message.content, str)
+    )
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Chat model with scripted answers, latency and token counts per node."""
+
+    # Simulated seconds before the first token, and generation speed
+    time_to_first_token: float = 0.2
+    tokens_per_second: float = 400.0
+    # Output tokens per graph node; other callers get `default_output_tokens`
+    output_tokens: Dict[str, int] = {
+        "planner": 60,
+        "draft_writer": 700,
+        "reviser": 800,
+    }
+    default_output_tokens: int = 100
+    plan_steps: int = PLAN_STEPS
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    def _script(self, messages: List[BaseMessage]) -> Tuple[AIMessage, float]:
+        """The response for the calling node and its simulated latency."""
+        node = current_node()
+        prompt = _prompt_text(messages)
+        # Whitespace tokens are close enough to compare runs with each other
+        input_tokens = len(prompt.split())
+        count = self.output_tokens.get(node, self.default_output_tokens)
+
+        if node == "planner":
+            match = TASK_PATTERN.search(prompt)
+            task = match.group(1).strip() if match else "the task"
+            words_per_step = max(1, count // self.plan_steps)
+            lines = []
+            for i in range(self.plan_steps):
+                aspect = PLAN_ASPECTS[i % len(PLAN_ASPECTS)]
+                step = f"{aspect} of {task}".split()[:words_per_step]
+                lines.append(f"{i + 1}. {' '.join(step)}")
+            content = "\n".join(lines)
+        else:
+            vocabulary = prompt.split()[-400:] or ["report"]
+            content = " ".join(vocabulary[i % len(vocabulary)] for i in range(count))
+
+        output_tokens = len(content.split())
+        message = AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+        )
+        latency = self.time_to_first_token + output_tokens / self.tokens_per_second
+        return message, latency
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message, latency = self._script(messages)
+        time.sleep(latency)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message, latency = self._script(messages)
+        await asyncio.sleep(latency)
+        return ChatResult(generations=[ChatGeneration(message=message)])
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark of the research pipeline, fully offline.
+
+Drives `research_agent` through both phases exactly like the app does
+(`execute_research=False` to plan, then `True` to research, draft and
+revise), followed by the Markdown/PDF export. `ChatGroq` is replaced by
+`ScriptedChatModel` (fixed answers, simulated latency and token counts) and
+Milvus by a local vector store filled with the PDFs in `data/`, embedded with
+the hashing stand-in.
+
+Reported per graph node (and for the export): wall time percentiles, LLM
+calls, input/output tokens and peak Python memory allocated while the node
+ran (tracemalloc; `--no-memory` turns it off, as it slows allocation-heavy
+code). The sparse index and the LLM response cache are disabled so every run
+does the full work.
+
+    python -m benchmarks.pipeline_benchmark --runs 5
+    python -m benchmarks.pipeline_benchmark --sync --ttft 0 --tps 1e9
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import tempfile
+import time
+import tracemalloc
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+import numpy as np
+from langchain_core.callbacks import BaseCallbackHandler
+
+import config
+from benchmarks.corpora import HashingEmbedder, load_pdf_chunks, pdf_corpus
+from benchmarks.fake_llm import ScriptedChatModel
+from exports import render_pdf
+from local_vector_store import LocalVectorStore
+
+DEFAULT_TASKS = [
+    "What are the hackathon problem statements?",
+    "Summarise the hackathon guidelines and judging criteria.",
+    "What experience do the candidates list on their resumes?",
+]
+EXPORT_STAGE = "export"
+
+
+class NodeProfiler(BaseCallbackHandler):
+    """Times graph nodes and attributes LLM token usage to them."""
+
+    # Called in the graph's own thread/task, so timings are not delayed
+    run_inline = True
+
+    def __init__(self, trace_memory: bool):
+        self.trace_memory = trace_memory
+        self.samples: Dict[str, List[dict]] = defaultdict(list)
+        self._open: Dict[UUID, dict] = {}
+        self._llm_nodes: Dict[UUID, str] = {}
+
+    def on_chain_start(
+        self,
+        serialized: Optional[Dict[str, Any]],
+        inputs: Any,
+        *,
+        run_id: UUID,
+        metadata: Optional[Dict[str, Any]] = None,
+        name: Optional[str] = None,
+        **kwargs: Any,
+    ):
+        node = (metadata or {}).get("langgraph_node")
+        # Only the node's own run, not the runnables nested inside it (the
+        # RunnableLambda from agent._graph_node carries the node's name too)
+        if node is None or (name or kwargs.get("name")) != node:
+            return
+        if any(sample["node"] == node for sample in self._open.values()):
+            return
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        self._open[run_id] = {
+            "node": node,
+            "started": time.perf_counter(),
+            "memory": tracemalloc.get_traced_memory()[0] if self.trace_memory else 0,
+            "llm_calls": 0,
+            "input_tokens": 0,
+            "output_tokens": 0,
+        }
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any):
+        sample = self._open.pop(run_id, None)
+        if sample is None:
+            return
+        sample["seconds"] = time.perf_counter() - sample.pop("started")
+        started_memory = sample.pop("memory")
+        if self.trace_memory:
+            sample["peak_bytes"] = tracemalloc.get_traced_memory()[1] - started_memory
+        self.samples[sample.pop("node")].append(sample)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._open.pop(run_id, None)
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: Any,
+        *,
+        run_id: UUID,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ):
+        node = (metadata or {}).get("langgraph_node")
+        if node is not None:
+            self._llm_nodes[run_id] = node
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any):
+        node = self._llm_nodes.pop(run_id, None)
+        sample = next((s for s in self._open.values() if s["node"] == node), None)
+        if sample is None:
+            return
+        sample["llm_calls"] += 1
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(generation.message, "usage_metadata", None) or {}
+                sample["input_tokens"] += usage.get("input_tokens", 0)
+                sample["output_tokens"] += usage.get("output_tokens", 0)
+
+    def record_export(self, seconds: float, peak_bytes: Optional[int]):
+        sample = {
+            "seconds": seconds,
+            "llm_calls": 0,
+            "input_tokens": 0,
+            "output_tokens": 0,
+        }
+        if peak_bytes is not None:
+            sample["peak_bytes"] = peak_bytes
+        self.samples[EXPORT_STAGE].append(sample)
+
+
+def _export(report: str, directory: str) -> Optional[str]:
+    """
+    Markdown and an uncached PDF render, as the app's export job does; returns
+    a note instead of the PDF if WeasyPrint is unusable.
+    """
+    with open(os.path.join(directory, "report.md"), "w", encoding="utf-8") as f:
+        f.write(report)
+    try:
+        render_pdf(report, os.path.join(directory, "report.pdf"))
+    except (ImportError, OSError) as e:
+        return f"PDF skipped ({str(e).splitlines()[0]})"
+    return None
+
+
+def _setup(directory: str, corpus_size: int, llm: ScriptedChatModel):
+    """
+    Offline resources: local store with the PDF corpus, fake LLM, no caches,
+    checkpoints in the temporary directory.
+    """
+    config.SPARSE_INDEX_ENABLED = False
+    config.LLM_CACHE_ENABLED = False
+    config.REPORT_CACHE_ENABLED = False
+    # The cross-encoder would have to be downloaded
+    config.RERANK_ENABLED = False
+    config.CHECKPOINT_PATH = os.path.join(directory, "checkpoints.sqlite")
+
+    from resources import set_resources
+
+    embedder = HashingEmbedder()
+    store = LocalVectorStore(os.path.join(directory, "vectors"))
+    corpus = pdf_corpus(corpus_size, 1, load_pdf_chunks(), embedder)
+    store.ensure_collection(embedder.dim)
+    store.upsert(corpus.ids, corpus.texts, corpus.metadatas, corpus.vectors)
+    set_resources(embedding_model=embedder, vector_backend=store, llm=llm)
+
+
+async def _arun_phases(agent, task: str, run_config: dict) -> dict:
+    await agent.ainvoke({"task": task, "execute_research": False}, config=run_config)
+    final_state = None
+    # The app streams the second phase
+    async for final_state in agent.astream(
+        {"execute_research": True}, config=run_config, stream_mode="values"
+    ):
+        pass
+    return final_state
+
+
+def _run_phases(agent, task: str, run_config: dict) -> dict:
+    agent.invoke({"task": task, "execute_research": False}, config=run_config)
+    return agent.invoke({"execute_research": True}, config=run_config)
+
+
+def _summarise(samples: List[dict]) -> dict:
+    seconds = np.asarray([s["seconds"] for s in samples]) * 1000
+    summary = {
+        "calls": len(samples),
+        "wall_ms": {
+            "p50": float(np.percentile(seconds, 50)),
+            "p95": float(np.percentile(seconds, 95)),
+            "mean": float(seconds.mean()),
+            "total": float(seconds.sum()),
+        },
+        "llm_calls": sum(s["llm_calls"] for s in samples),
+        "input_tokens": sum(s["input_tokens"] for s in samples),
+        "output_tokens": sum(s["output_tokens"] for s in samples),
+    }
+    if all("peak_bytes" in s for s in samples):
+        summary["peak_bytes"] = max(s["peak_bytes"] for s in samples)
+    return summary
+
+
+def run(
+    tasks: List[str],
+    runs: int,
+    corpus_size: int,
+    llm: ScriptedChatModel,
+    use_async: bool = True,
+    trace_memory: bool = True,
+) -> dict:
+    profiler = NodeProfiler(trace_memory)
+    notes = set()
+    pipeline_seconds = []
+    with tempfile.TemporaryDirectory() as directory:
+        _setup(directory, corpus_size, llm)
+        import agent
+
+        if trace_memory:
+            tracemalloc.start()
+        for run_index in range(runs):
+            for task in tasks:
+                run_config = {
+                    "configurable": {"thread_id": str(uuid.uuid4())},
+                    "callbacks": [profiler],
+                }
+                started = time.perf_counter()
+                if use_async:
+                    final_state = asyncio.run(
+                        _arun_phases(agent.research_agent, task, run_config)
+                    )
+                else:
+                    final_state = _run_phases(agent.research_agent, task, run_config)
+
+                if trace_memory:
+                    tracemalloc.reset_peak()
+                    memory_before = tracemalloc.get_traced_memory()[0]
+                export_started = time.perf_counter()
+                note = _export(final_state["revised_draft"], directory)
+                export_seconds = time.perf_counter() - export_started
+                profiler.record_export(
+                    export_seconds,
+                    (
+                        tracemalloc.get_traced_memory()[1] - memory_before
+                        if trace_memory
+                        else None
+                    ),
+                )
+                if note:
+                    notes.add(note)
+                pipeline_seconds.append(time.perf_counter() - started)
+                print(
+                    f"Run {run_index + 1}/{runs}: '{task[:40]}' "
+                    f"in {pipeline_seconds[-1] * 1000:.0f} ms"
+                )
+        if trace_memory:
+            tracemalloc.stop()
+
+    totals = np.asarray(pipeline_seconds) * 1000
+    return {
+        "benchmark": "pipeline",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            # ru_maxrss is KiB on Linux
+            "max_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        },
+        "settings": {
+            "runs": runs,
+            "tasks": tasks,
+            "corpus_size": corpus_size,
+            "async": use_async,
+            "time_to_first_token": llm.time_to_first_token,
+            "tokens_per_second": llm.tokens_per_second,
+            "output_tokens": llm.output_tokens,
+            "trace_memory": trace_memory,
+        },
+        "pipeline_ms": {
+            "p50": float(np.percentile(totals, 50)),
+            "p95": float(np.percentile(totals, 95)),
+            "mean": float(totals.mean()),
+        },
+        "nodes": {
+            node: _summarise(samples) for node, samples in profiler.samples.items()
+        },
+        "notes": sorted(notes),
+    }
+
+
+def _print_report(report: dict):
+    print(
+        f"\n{'stage':<14}{'calls':>6}{'p50 ms':>10}{'p95 ms':>10}"
+        f"{'llm':>5}{'tokens in':>11}{'tokens out':>11}{'peak MiB':>10}"
+    )
+    for node, summary in report["nodes"].items():
+        peak = summary.get("peak_bytes")
+        print(
+            f"{node:<14}{summary['calls']:>6}"
+            f"{summary['wall_ms']['p50']:>10.1f}{summary['wall_ms']['p95']:>10.1f}"
+            f"{summary['llm_calls']:>5}{summary['input_tokens']:>11}"
+            f"{summary['output_tokens']:>11}"
+            f"{(peak / 2**20 if peak is not None else float('nan')):>10.2f}"
+        )
+    pipeline = report["pipeline_ms"]
+    print(f"pipeline p50 {pipeline['p50']:.0f} ms, p95 {pipeline['p95']:.0f} ms")
+    for note in report["notes"]:
+        print(f"Note: {note}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--task", action="append", dest="tasks")
+    parser.add_argument("--corpus-size", type=int, default=1000)
+    parser.add_argument("--ttft", type=float, default=0.2, help="seconds")
+    parser.add_argument("--tps", type=float, default=400.0, help="tokens/second")
+    parser.add_argument("--planner-tokens", type=int, default=60)
+    parser.add_argument("--draft-tokens", type=int, default=700)
+    parser.add_argument("--reviser-tokens", type=int, default=800)
+    parser.add_argument("--sync", action="store_true", help="invoke() not ainvoke()")
+    parser.add_argument("--no-memory", action="store_true")
+    parser.add_argument("--output", default="pipeline_benchmark.json")
+    args = parser.parse_args()
+
+    llm = ScriptedChatModel(
+        time_to_first_token=args.ttft,
+        tokens_per_second=args.tps,
+        output_tokens={
+            "planner": args.planner_tokens,
+            "draft_writer": args.draft_tokens,
+            "reviser": args.reviser_tokens,
+        },
+    )
+    report = run(
+        tasks=args.tasks or DEFAULT_TASKS,
+        runs=args.runs,
+        corpus_size=args.corpus_size,
+        llm=llm,
+        use_async=not args.sync,
+        trace_memory=not args.no_memory,
+    )
+    _print_report(report)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Quality/latency tradeoff of cross-encoder reranking.
+
+Builds the PDF-derived corpus (see corpora.py) in a local flat store and
+groups its labelled queries into research plans of `--plan-steps` steps. For
+every over-fetch depth and latency budget it retrieves each plan's candidates
+in vector order, reranks all (step, candidate) pairs of the plan in one pass
+(reranker.py) and reports, against vector order at the same depth:
+
+- recall@k and MRR@k of the step's relevant chunk;
+- rerank latency per plan with a cold score cache and again with a warm one;
+- how often the budget ran out and the plan kept its vector order.
+
+By default the cross-encoder is `OverlapCrossEncoder`, an offline stand-in
+that scores word-trigram overlap and simulates `--pair-ms` of inference per
+pair, so the benchmark runs without downloads. `--model` uses a real
+fastembed cross-encoder instead (downloaded on first use), which is what
+gives meaningful quality numbers.
+
+    python -m benchmarks.rerank_benchmark --fetch-k 8,20,30 --budgets 0.1,0.5,0
+    python -m benchmarks.rerank_benchmark --model Xenova/ms-marco-MiniLM-L-6-v2
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import tempfile
+import time
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import config
+from benchmarks.corpora import Corpus, HashingEmbedder, load_pdf_chunks, pdf_corpus
+from benchmarks.retrieval_benchmark import _build, _int_list, _ranks
+from local_vector_store import LocalVectorStore
+from reranker import CrossEncoderReranker
+from sparse_index import tokenize
+
+
+class OverlapCrossEncoder:
+    """
+    Offline stand-in for fastembed's `TextCrossEncoder`.
+
+    Scores the share of the query's word trigrams found in the text, which
+    (unlike the bag-of-words hashing embedder) rewards word order. Sleeps
+    `pair_seconds` per pair to simulate ONNX inference cost.
+    """
+
+    def __init__(self, pair_seconds: float = 0.0):
+        self.pair_seconds = pair_seconds
+
+    @staticmethod
+    def _trigrams(text: str) -> set:
+        words = tokenize(text)
+        return {tuple(words[i : i + 3]) for i in range(len(words) - 2)}
+
+    def rerank_pairs(
+        self, pairs: Sequence[Tuple[str, str]], batch_size: int = 64
+    ) -> Iterator[float]:
+        if self.pair_seconds:
+            time.sleep(self.pair_seconds * len(pairs))
+        for query, text in pairs:
+            query_trigrams = self._trigrams(query)
+            share = (
+                len(query_trigrams & self._trigrams(text)) / len(query_trigrams)
+                if query_trigrams
+                else 0.0
+            )
+            # Logit-like range, as a cross-encoder would return
+            yield 8.0 * share - 4.0
+
+
+def _plans(corpus: Corpus, steps: int) -> List[range]:
+    return [
+        range(start, min(start + steps, len(corpus.query_texts)))
+        for start in range(0, len(corpus.query_texts), steps)
+    ]
+
+
+def _quality(hits: List[List[dict]], relevant_ids: List[str], k: int) -> dict:
+    ranks = _ranks([step_hits[:k] for step_hits in hits], relevant_ids)
+    found = ranks >= 0
+    reciprocal_ranks = np.zeros(len(ranks))
+    reciprocal_ranks[found] = 1.0 / (ranks[found] + 1)
+    return {
+        "recall_at_k": float(found.mean()),
+        "mrr_at_k": float(reciprocal_ranks.mean()),
+    }
+
+
+def _percentiles(seconds: List[float]) -> dict:
+    values = np.asarray(seconds) * 1000
+    return {
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "mean": float(values.mean()),
+    }
+
+
+def measure(
+    store: LocalVectorStore,
+    corpus: Corpus,
+    fetch_k: int,
+    budget: float,
+    k: int,
+    steps: int,
+    model,
+    model_name: str,
+) -> dict:
+    """One (depth, budget) setting over every plan, cold and warm cache."""
+    reranker = CrossEncoderReranker(
+        model_name=model_name, budget_seconds=budget, model=model
+    )
+    vector_hits, reranked_hits, relevant = [], [], []
+    cold, warm, fallbacks = [], [], 0
+    for plan in _plans(corpus, steps):
+        queries = [corpus.query_texts[i] for i in plan]
+        hits = store.search(corpus.query_vectors[plan.start : plan.stop], k=fetch_k)
+        # Fallbacks are counted below instead of printed per plan
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            result = reranker.rerank(queries, hits)
+            cold.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            reranker.rerank(queries, hits)
+            warm.append(time.perf_counter() - started)
+        if result is None:
+            fallbacks += 1
+        vector_hits.extend(hits)
+        reranked_hits.extend(hits if result is None else result[0])
+        relevant.extend(corpus.relevant_ids[i] for i in plan)
+    return {
+        "fetch_k": fetch_k,
+        "budget_seconds": budget,
+        "k": k,
+        "plans": len(cold),
+        "pairs_per_plan": float(
+            np.mean([len(p) * fetch_k for p in _plans(corpus, steps)])
+        ),
+        "vector": _quality(vector_hits, relevant, k),
+        "reranked": _quality(reranked_hits, relevant, k),
+        "rerank_ms_cold": _percentiles(cold),
+        "rerank_ms_warm": _percentiles(warm),
+        "fallback_rate": fallbacks / len(cold),
+    }
+
+
+def run(
+    size: int,
+    num_queries: int,
+    fetch_ks: List[int],
+    budgets: List[float],
+    k: int,
+    steps: int,
+    model_name: Optional[str],
+    pair_seconds: float,
+    data_directory: str = config.DATA_DIRECTORY,
+) -> dict:
+    embedder = HashingEmbedder()
+    print(f"--- Building pdf corpus with {size} chunks ---")
+    corpus = pdf_corpus(size, num_queries, load_pdf_chunks(data_directory), embedder)
+    if model_name:
+        model = CrossEncoderReranker(model_name=model_name).load()
+    else:
+        model = OverlapCrossEncoder(pair_seconds)
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        store = LocalVectorStore(directory, f"bench_rerank_{size}", index_type="FLAT")
+        _build(store, corpus)
+        for fetch_k in fetch_ks:
+            for budget in budgets:
+                row = measure(
+                    store,
+                    corpus,
+                    fetch_k,
+                    budget,
+                    k,
+                    steps,
+                    model,
+                    model_name or "overlap-stand-in",
+                )
+                results.append(row)
+                _print_row(row)
+    return {
+        "benchmark": "rerank",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+        },
+        "settings": {
+            "corpus_size": size,
+            "num_queries": num_queries,
+            "plan_steps": steps,
+            "model": model_name or "overlap-stand-in",
+            "simulated_pair_ms": None if model_name else pair_seconds * 1000,
+            "batch_size": config.RERANK_BATCH_SIZE,
+        },
+        "results": results,
+    }
+
+
+def _print_row(row: dict):
+    budget = f"{row['budget_seconds']:g}s" if row["budget_seconds"] else "none"
+    print(
+        f"fetch_k={row['fetch_k']:<3} budget={budget:<6} k={row['k']}"
+        f" recall {row['vector']['recall_at_k']:.3f}->"
+        f"{row['reranked']['recall_at_k']:.3f}"
+        f" mrr {row['vector']['mrr_at_k']:.3f}->{row['reranked']['mrr_at_k']:.3f}"
+        f" cold p50={row['rerank_ms_cold']['p50']:.1f}ms"
+        f" p95={row['rerank_ms_cold']['p95']:.1f}ms"
+        f" warm p50={row['rerank_ms_warm']['p50']:.1f}ms"
+        f" fallback={row['fallback_rate']:.0%}"
+    )
+
+
+def _float_list(value: str) -> List[float]:
+    return [float(item) for item in value.split(",") if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--fetch-k", type=_int_list, default=[8, 20, 30])
+    parser.add_argument(
+        "--budgets", type=_float_list, default=[0.1, 0.5, 0], help="0: no budget"
+    )
+    parser.add_argument("--k", type=int, default=config.RETRIEVAL_TOP_K)
+    parser.add_argument("--plan-steps", type=int, default=5)
+    parser.add_argument("--model", help="fastembed cross-encoder (downloaded)")
+    parser.add_argument(
+        "--pair-ms", type=float, default=1.0, help="stand-in cost per pair"
+    )
+    parser.add_argument("--data-directory", default=config.DATA_DIRECTORY)
+    parser.add_argument("--output", default="rerank_benchmark.json")
+    args = parser.parse_args()
+
+    report = run(
+        size=args.size,
+        num_queries=args.queries,
+        fetch_ks=args.fetch_k,
+        budgets=args.budgets,
+        k=args.k,
+        steps=args.plan_steps,
+        model_name=args.model,
+        pair_seconds=args.pair_ms / 1000,
+        data_directory=args.data_directory,
+    )
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Retrieval quality and latency benchmark for the vector backends.
+
+For every corpus (synthetic, PDF-derived), size, backend/index and `k`, it
+reports recall@k and MRR@k against the labelled queries, single-query latency
+percentiles, sequential QPS and the throughput of one batched multi-query
+search (which is how plan retrieval calls the backend). Build time and
+memory are reported per index.
+
+The default backends are in-process (`local-flat`, `local-ivf`), so the suite
+runs fully offline. `milvus-<INDEX>` (e.g. `milvus-HNSW`) benchmarks a
+throw-away collection on the configured Milvus server.
+
+    python -m benchmarks.retrieval_benchmark
+    python -m benchmarks.retrieval_benchmark --sizes 1000,10000,100000 \\
+        --k 1,3,8 --backends local-flat,local-ivf,milvus-HNSW \\
+        --output retrieval.json
+"""
+
+import argparse
+import json
+import platform
+import tempfile
+import time
+from typing import List, Optional
+
+import numpy as np
+
+import config
+from benchmarks.corpora import (
+    Corpus,
+    HashingEmbedder,
+    load_pdf_chunks,
+    pdf_corpus,
+    synthetic_corpus,
+)
+from local_vector_store import LocalVectorStore
+from vector_store import VectorStore
+
+UPSERT_BATCH_SIZE = 5000
+WARMUP_QUERIES = 10
+
+
+def _open_backend(name: str, corpus: Corpus, directory: str) -> VectorStore:
+    collection_name = f"bench_{corpus.name}_{len(corpus.ids)}"
+    if name == "local-flat":
+        return LocalVectorStore(directory, collection_name, index_type="FLAT")
+    if name == "local-ivf":
+        # Train once, after the last batch
+        return LocalVectorStore(
+            directory,
+            collection_name,
+            index_type="IVF",
+            ivf_min_vectors=len(corpus.ids),
+        )
+    if name.startswith("milvus-"):
+        from resources import get_milvus_connections
+        from vector_store import MilvusVectorStore
+
+        return MilvusVectorStore(
+            get_milvus_connections(),
+            collection_name,
+            index_type=name.split("-", 1)[1].upper(),
+        )
+    raise ValueError(f"Unknown backend '{name}'")
+
+
+def _build(store: VectorStore, corpus: Corpus) -> float:
+    started = time.perf_counter()
+    store.drop()
+    store.ensure_collection(corpus.vectors.shape[1])
+    for i in range(0, len(corpus.ids), UPSERT_BATCH_SIZE):
+        batch = slice(i, i + UPSERT_BATCH_SIZE)
+        store.upsert(
+            corpus.ids[batch],
+            corpus.texts[batch],
+            corpus.metadatas[batch],
+            corpus.vectors[batch],
+        )
+    if store.name == "milvus":
+        # Milvus: make the writes visible to every pooled client
+        store.client.flush(store.collection_name)
+    return time.perf_counter() - started
+
+
+def _ranks(hits: List[List[dict]], relevant_ids: List[str]) -> np.ndarray:
+    """0-based rank of each query's relevant chunk, or -1 if not returned."""
+    ranks = np.full(len(relevant_ids), -1)
+    for i, (query_hits, relevant) in enumerate(zip(hits, relevant_ids)):
+        for rank, hit in enumerate(query_hits):
+            if hit["pk"] == relevant:
+                ranks[i] = rank
+                break
+    return ranks
+
+
+def measure(store: VectorStore, corpus: Corpus, k: int) -> dict:
+    """Quality and latency of top-k search over the corpus' queries."""
+    queries = corpus.query_vectors
+    for vector in queries[:WARMUP_QUERIES]:
+        store.search(vector[None, :], k=k)
+
+    latencies, hits = [], []
+    for vector in queries:
+        started = time.perf_counter()
+        hits.extend(store.search(vector[None, :], k=k))
+        latencies.append(time.perf_counter() - started)
+    latencies = np.asarray(latencies) * 1000
+
+    started = time.perf_counter()
+    store.search(queries, k=k)
+    batch_seconds = time.perf_counter() - started
+
+    ranks = _ranks(hits, corpus.relevant_ids)
+    found = ranks >= 0
+    reciprocal_ranks = np.zeros(len(ranks))
+    reciprocal_ranks[found] = 1.0 / (ranks[found] + 1)
+    return {
+        "k": k,
+        "queries": len(queries),
+        "recall_at_k": float(found.mean()),
+        "mrr_at_k": float(reciprocal_ranks.mean()),
+        "latency_ms": {
+            "p50": float(np.percentile(latencies, 50)),
+            "p95": float(np.percentile(latencies, 95)),
+            "p99": float(np.percentile(latencies, 99)),
+            "mean": float(latencies.mean()),
+        },
+        "qps": float(len(queries) / (latencies.sum() / 1000)),
+        "batch_qps": float(len(queries) / batch_seconds),
+    }
+
+
+def run(
+    corpora: List[str],
+    sizes: List[int],
+    backends: List[str],
+    ks: List[int],
+    num_queries: int,
+    data_directory: str = config.DATA_DIRECTORY,
+) -> dict:
+    embedder = HashingEmbedder()
+    base_chunks: Optional[list] = None
+    results = []
+    for corpus_name in corpora:
+        for size in sizes:
+            print(f"--- Building {corpus_name} corpus with {size} chunks ---")
+            if corpus_name == "synthetic":
+                corpus = synthetic_corpus(size, num_queries)
+            elif corpus_name == "pdf":
+                if base_chunks is None:
+                    base_chunks = load_pdf_chunks(data_directory)
+                corpus = pdf_corpus(size, num_queries, base_chunks, embedder)
+            else:
+                raise ValueError(f"Unknown corpus '{corpus_name}'")
+
+            for backend in backends:
+                with tempfile.TemporaryDirectory() as directory:
+                    store = _open_backend(backend, corpus, directory)
+                    build_seconds = _build(store, corpus)
+                    info = store.describe()
+                    try:
+                        for k in ks:
+                            row = {
+                                "corpus": corpus.name,
+                                "size": size,
+                                "backend": backend,
+                                "index_type": info.get("index_type"),
+                                "build_seconds": build_seconds,
+                                "memory_bytes": info.get("memory_bytes"),
+                                **measure(store, corpus, k),
+                            }
+                            results.append(row)
+                            _print_row(row)
+                    finally:
+                        if backend.startswith("milvus-"):
+                            store.drop()
+    return {
+        "benchmark": "retrieval",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+        },
+        "settings": {
+            "num_queries": num_queries,
+            "embedding_dim": embedder.dim,
+            "local_ivf_nprobe": config.LOCAL_IVF_NPROBE,
+            "milvus_search_params": config.MILVUS_SEARCH_PARAMS,
+        },
+        "results": results,
+    }
+
+
+def _print_row(row: dict):
+    latency = row["latency_ms"]
+    print(
+        f"{row['corpus']:>9} {row['size']:>7} {row['backend']:>12} k={row['k']:<3}"
+        f" recall={row['recall_at_k']:.3f} mrr={row['mrr_at_k']:.3f}"
+        f" p50={latency['p50']:.2f}ms p95={latency['p95']:.2f}ms"
+        f" p99={latency['p99']:.2f}ms qps={row['qps']:.0f}"
+        f" batch_qps={row['batch_qps']:.0f}"
+    )
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpora", default="synthetic,pdf")
+    parser.add_argument("--sizes", type=_int_list, default=[1000, 10_000, 100_000])
+    parser.add_argument("--backends", default="local-flat,local-ivf")
+    parser.add_argument("--k", type=_int_list, default=[1, 3, 8])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--data-directory", default=config.DATA_DIRECTORY)
+    parser.add_argument("--output", default="retrieval_benchmark.json")
+    args = parser.parse_args()
+
+    report = run(
+        corpora=args.corpora.split(","),
+        sizes=args.sizes,
+        backends=args.backends.split(","),
+        ks=args.k,
+        num_queries=args.queries,
+        data_directory=args.data_directory,
+    )
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
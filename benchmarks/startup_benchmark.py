@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Import-time benchmark of the app's entry modules.
+
+Imports each module in a fresh interpreter with `python -X importtime` and
+reports the wall time of the import, the slowest modules (self and
+cumulative time, from the last run) and which heavy dependencies were loaded.
+Those (WeasyPrint, pymilvus, fastembed/onnxruntime, the Groq client) are
+meant to load on first use, not at import; see resources.py.
+
+    python -m benchmarks.startup_benchmark --runs 5
+    python -m benchmarks.startup_benchmark --module agent --budget 1.0
+
+With `--budget`, exits with status 1 if a module's median import takes longer
+(seconds), so it can guard startup time in CI.
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+DEFAULT_MODULES = ["agent", "app"]
+# Top-level packages that should not be loaded by importing the app
+HEAVY_MODULES = [
+    "weasyprint",
+    "pymilvus",
+    "fastembed",
+    "onnxruntime",
+    "langchain_groq",
+    "groq",
+]
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def _import_once(module: str) -> dict:
+    """Imports `module` in a new interpreter; returns its -X importtime rows."""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    seconds = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append(
+                {
+                    "module": name,
+                    "self_ms": int(self_us) / 1000,
+                    "cumulative_ms": int(cumulative_us) / 1000,
+                    "depth": len(indent) // 2,
+                }
+            )
+    return {"seconds": seconds, "rows": rows}
+
+
+def _baseline(runs: int) -> float:
+    """Median start-up time of a bare interpreter, subtracted from imports."""
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        samples.append(time.perf_counter() - started)
+    return float(np.median(samples))
+
+
+def run(modules: List[str], runs: int, top: int) -> dict:
+    baseline = _baseline(runs)
+    results: Dict[str, dict] = {}
+    for module in modules:
+        print(f"Importing {module} x{runs}...")
+        samples = [_import_once(module) for _ in range(runs)]
+        seconds = np.asarray([sample["seconds"] for sample in samples]) - baseline
+        rows = samples[-1]["rows"]
+        loaded = {row["module"].split(".", 1)[0] for row in rows}
+        results[module] = {
+            "import_seconds": {
+                "p50": float(np.median(seconds)),
+                "min": float(seconds.min()),
+                "max": float(seconds.max()),
+            },
+            "modules_loaded": len(rows),
+            "heavy_loaded": [name for name in HEAVY_MODULES if name in loaded],
+            "slowest_self": sorted(rows, key=lambda row: -row["self_ms"])[:top],
+            # Top-level packages only; their cumulative time includes children
+            "slowest_packages": sorted(
+                (row for row in rows if "." not in row["module"]),
+                key=lambda row: -row["cumulative_ms"],
+            )[:top],
+        }
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "interpreter_seconds": baseline,
+        },
+        "settings": {"runs": runs, "modules": modules},
+        "modules": results,
+    }
+
+
+def _print_report(report: dict):
+    for module, result in report["modules"].items():
+        timing = result["import_seconds"]
+        print(
+            f"\nimport {module}: p50 {timing['p50']:.3f}s "
+            f"(min {timing['min']:.3f}s, max {timing['max']:.3f}s), "
+            f"{result['modules_loaded']} modules"
+        )
+        heavy = ", ".join(result["heavy_loaded"]) or "none"
+        print(f"heavy dependencies loaded at import: {heavy}")
+        print(f"{'package':<48}{'cumulative ms':>15}")
+        for row in result["slowest_packages"]:
+            print(f"{row['module']:<48}{row['cumulative_ms']:>15.1f}")
+        print(f"{'module':<48}{'self ms':>15}")
+        for row in result["slowest_self"]:
+            print(f"{row['module']:<48}{row['self_ms']:>15.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--module", action="append", dest="modules")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--budget", type=float, help="max median import seconds")
+    parser.add_argument("--output", default="startup_benchmark.json")
+    args = parser.parse_args()
+
+    report = run(args.modules or DEFAULT_MODULES, runs=args.runs, top=args.top)
+    _print_report(report)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.budget is not None:
+        over = [
+            module
+            for module, result in report["modules"].items()
+            if result["import_seconds"]["p50"] > args.budget
+        ]
+        if over:
+            print(f"Over the {args.budget}s import budget: {', '.join(over)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
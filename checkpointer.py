@@ -0,0 +1,475 @@
+"""
+Bounded, persistent LangGraph checkpointer.
+
+Every research session is a LangGraph thread: the planning phase and the
+execution phase run as separate graph invocations, and the state in between
+(plan, research summary, drafts) lives in the checkpointer. `MemorySaver`
+kept every thread of the process forever; `SQLiteCheckpointSaver` keeps them
+in SQLite instead, so a session survives a restart and app workers that share
+the file can serve either phase of it.
+
+Growth is bounded per thread: a thread unused for `ttl_seconds` expires, and
+beyond `max_threads` the least recently used threads are evicted, except
+those used within `grace_seconds` (a plan the user is still reviewing). A
+background sweeper (`start_sweeper`) deletes both periodically. Channel values
+are stored once per version and compressed (`CompressedSerializer`), so the
+large report fields shared by consecutive checkpoints are not duplicated.
+A path of ":memory:" gives the same bounds without persistence.
+"""
+
+import asyncio
+import os
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+import config
+
+COMPRESSED_SUFFIX = "+zlib"
+
+
+class CompressedSerializer(SerializerProtocol):
+    """Wraps a serializer and zlib-compresses payloads above a size threshold."""
+
+    def __init__(
+        self,
+        serde: Optional[SerializerProtocol] = None,
+        min_bytes: int = config.CHECKPOINT_COMPRESS_MIN_BYTES,
+        level: int = 6,
+    ):
+        self.serde = serde or JsonPlusSerializer()
+        self.min_bytes = min_bytes
+        self.level = level
+
+    def dumps(self, obj: Any) -> bytes:
+        return self.serde.dumps(obj)
+
+    def loads(self, data: bytes) -> Any:
+        return self.serde.loads(data)
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(obj)
+        if len(data) >= self.min_bytes:
+            compressed = zlib.compress(data, self.level)
+            if len(compressed) < len(data):
+                return type_ + COMPRESSED_SUFFIX, compressed
+        return type_, data
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if type_.endswith(COMPRESSED_SUFFIX):
+            type_ = type_[: -len(COMPRESSED_SUFFIX)]
+            payload = zlib.decompress(payload)
+        return self.serde.loads_typed((type_, payload))
+
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver[str]):
+    """LangGraph checkpoints in SQLite, with per-thread TTL and LRU eviction."""
+
+    def __init__(
+        self,
+        path: str = config.CHECKPOINT_PATH,
+        ttl_seconds: float = config.CHECKPOINT_TTL_SECONDS,
+        max_threads: int = config.CHECKPOINT_MAX_THREADS,
+        grace_seconds: float = config.CHECKPOINT_EVICTION_GRACE_SECONDS,
+        serde: Optional[SerializerProtocol] = None,
+    ):
+        super().__init__(serde=serde or CompressedSerializer())
+        self.ttl_seconds = ttl_seconds
+        self.max_threads = max_threads
+        self.grace_seconds = grace_seconds
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS threads ("
+            "thread_id TEXT PRIMARY KEY, last_used REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS threads_lru ON threads (last_used);"
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, "
+            "checkpoint_id TEXT NOT NULL, parent_id TEXT, "
+            "type TEXT NOT NULL, checkpoint BLOB NOT NULL, "
+            "metadata_type TEXT NOT NULL, metadata BLOB NOT NULL, "
+            "PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id));"
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, "
+            "channel TEXT NOT NULL, version TEXT NOT NULL, "
+            "type TEXT NOT NULL, value BLOB, "
+            "PRIMARY KEY (thread_id, checkpoint_ns, channel, version));"
+            "CREATE TABLE IF NOT EXISTS writes ("
+            "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, "
+            "checkpoint_id TEXT NOT NULL, task_id TEXT NOT NULL, "
+            "idx INTEGER NOT NULL, channel TEXT NOT NULL, "
+            "type TEXT NOT NULL, value BLOB, task_path TEXT NOT NULL, "
+            "PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx));"
+        )
+        self._db.commit()
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # --- Reads ---
+    def _touch(self, thread_id: str):
+        self._db.execute(
+            "INSERT OR REPLACE INTO threads (thread_id, last_used) VALUES (?, ?)",
+            (thread_id, time.time()),
+        )
+
+    def _is_expired(self, thread_id: str) -> bool:
+        row = self._db.execute(
+            "SELECT last_used FROM threads WHERE thread_id = ?", (thread_id,)
+        ).fetchone()
+        return row is None or time.time() - row[0] > self.ttl_seconds
+
+    def _channel_values(
+        self, thread_id: str, checkpoint_ns: str, versions: ChannelVersions
+    ) -> Dict[str, Any]:
+        values = {}
+        for channel, version in versions.items():
+            row = self._db.execute(
+                "SELECT type, value FROM blobs WHERE thread_id = ? AND "
+                "checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version)),
+            ).fetchone()
+            if row is not None and row[0] != "empty":
+                values[channel] = self.serde.loads_typed((row[0], row[1]))
+        return values
+
+    def _tuple(self, row: tuple) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_id = row[:4]
+        checkpoint = self.serde.loads_typed((row[4], row[5]))
+        writes = self._db.execute(
+            "SELECT task_id, channel, type, value FROM writes WHERE thread_id = ? "
+            "AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint={
+                **checkpoint,
+                "channel_values": self._channel_values(
+                    thread_id, checkpoint_ns, checkpoint["channel_versions"]
+                ),
+            },
+            metadata=self.serde.loads_typed((row[6], row[7])),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_id,
+                    }
+                }
+                if parent_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((type_, value)))
+                for task_id, channel, type_, value in writes
+            ],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """The requested (or latest) checkpoint of the thread, unless it expired."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, type, "
+            "checkpoint, metadata_type, metadata FROM checkpoints "
+            "WHERE thread_id = ? AND checkpoint_ns = ?"
+        )
+        params: tuple = (thread_id, checkpoint_ns)
+        if checkpoint_id:
+            query += " AND checkpoint_id = ?"
+            params += (checkpoint_id,)
+        else:
+            query += " ORDER BY checkpoint_id DESC LIMIT 1"
+        with self._lock:
+            if self._is_expired(thread_id):
+                # Not swept yet: drop it now, the session starts over
+                with self._db:
+                    self._delete_threads([thread_id])
+                return None
+            row = self._db.execute(query, params).fetchone()
+            if row is None:
+                return None
+            with self._db:
+                self._touch(thread_id)
+            return self._tuple(row)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        """Checkpoints matching the criteria, newest first."""
+        clauses, params = [], []
+        if config is not None:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(config["configurable"]["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(get_checkpoint_id(config))
+        if before is not None and get_checkpoint_id(before):
+            clauses.append("checkpoint_id < ?")
+            params.append(get_checkpoint_id(before))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, type, "
+                "checkpoint, metadata_type, metadata FROM checkpoints "
+                f"{where} ORDER BY checkpoint_id DESC",
+                params,
+            ).fetchall()
+            results = []
+            for row in rows:
+                if limit is not None and len(results) >= limit:
+                    break
+                if filter:
+                    metadata = self.serde.loads_typed((row[6], row[7]))
+                    if any(metadata.get(k) != v for k, v in filter.items()):
+                        continue
+                results.append(self._tuple(row))
+        yield from results
+
+    # --- Writes ---
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Stores a checkpoint and the channel values that changed with it."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        stored = checkpoint.copy()
+        values: Dict[str, Any] = stored.pop("channel_values")
+        blobs = []
+        for channel, version in new_versions.items():
+            type_, value = (
+                self.serde.dumps_typed(values[channel])
+                if channel in values
+                else ("empty", None)
+            )
+            blobs.append(
+                (thread_id, checkpoint_ns, channel, str(version), type_, value)
+            )
+        type_, payload = self.serde.dumps_typed(stored)
+        metadata_type, metadata_payload = self.serde.dumps_typed(
+            get_checkpoint_metadata(config, metadata)
+        )
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)", blobs
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    config["configurable"].get("checkpoint_id"),
+                    type_,
+                    payload,
+                    metadata_type,
+                    metadata_payload,
+                ),
+            )
+            self._touch(thread_id)
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ):
+        """Stores the pending writes of a task against a checkpoint."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        # Like MemorySaver: a task's regular writes are stored once, special
+        # writes (errors, interrupts; negative indexes) replace earlier ones
+        regular, special = [], []
+        for idx, (channel, value) in enumerate(writes):
+            type_, payload = self.serde.dumps_typed(value)
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            (special if write_idx < 0 else regular).append(
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint_id,
+                    task_id,
+                    write_idx,
+                    channel,
+                    type_,
+                    payload,
+                    task_path,
+                )
+            )
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                regular,
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                special,
+            )
+
+    def _delete_threads(self, thread_ids: Sequence[str]):
+        for table in ("checkpoints", "blobs", "writes", "threads"):
+            self._db.executemany(
+                f"DELETE FROM {table} WHERE thread_id = ?",
+                [(thread_id,) for thread_id in thread_ids],
+            )
+
+    def delete_thread(self, thread_id: str):
+        with self._lock, self._db:
+            self._delete_threads([thread_id])
+
+    # --- Eviction ---
+    def sweep(self) -> int:
+        """Deletes expired threads and the least recently used beyond the limit."""
+        now = time.time()
+        cutoff = now - self.ttl_seconds
+        with self._lock, self._db:
+            expired = [
+                row[0]
+                for row in self._db.execute(
+                    "SELECT thread_id FROM threads WHERE last_used < ?", (cutoff,)
+                )
+            ]
+            self._delete_threads(expired)
+            (count,) = self._db.execute("SELECT COUNT(*) FROM threads").fetchone()
+            evicted = []
+            if count > self.max_threads:
+                evicted = [
+                    row[0]
+                    for row in self._db.execute(
+                        "SELECT thread_id FROM threads WHERE last_used < ? "
+                        "ORDER BY last_used LIMIT ?",
+                        (now - self.grace_seconds, count - self.max_threads),
+                    )
+                ]
+                self._delete_threads(evicted)
+        if expired or evicted:
+            print(
+                f"--- Checkpointer: removed {len(expired)} expired and "
+                f"{len(evicted)} least recently used threads ---"
+            )
+        return len(expired) + len(evicted)
+
+    def start_sweeper(self, interval: float = config.CHECKPOINT_SWEEP_SECONDS):
+        """Runs `sweep()` every `interval` seconds in a daemon thread."""
+        if self._sweeper is not None:
+            return
+
+        def _run():
+            # Jitter, so workers sharing the file do not sweep in lockstep
+            while not self._stop.wait(interval * random.uniform(0.9, 1.1)):
+                try:
+                    self.sweep()
+                except sqlite3.Error as e:
+                    print(f"Checkpoint sweep failed: {e}")
+
+        self._sweeper = threading.Thread(
+            target=_run, name="checkpoint-sweeper", daemon=True
+        )
+        self._sweeper.start()
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            self._db.close()
+
+    # --- Async variants; SQLite calls run in a worker thread ---
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        results = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for result in results:
+            yield result
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(
+            self.put, config, checkpoint, metadata, new_versions
+        )
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ):
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str):
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        # Same scheme as MemorySaver: increasing counter plus a random suffix
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
@@ -3,13 +3,9 @@
 Complete fresh start script - drops everything and creates clean ingestion
 """
 
-import os
-from pymilvus import connections, utility
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_milvus import Milvus
 import config
-from data_handler import FastEmbedEmbeddings
+from data_handler import list_data_pdfs, process_and_embed_pdfs
+from resources import get_embedding_model, get_vector_backend
 
 
 def completely_fresh_ingestion():
@@ -17,22 +13,12 @@ def completely_fresh_ingestion():
     print("=== COMPLETE FRESH START ===")
 
     try:
-        # Connect and drop everything
-        connections.connect("default", host=config.MILVUS_HOST, port=config.MILVUS_PORT)
-
-        if utility.has_collection(config.COLLECTION_NAME):
-            utility.drop_collection(config.COLLECTION_NAME)
-            print(f"Dropped collection: {config.COLLECTION_NAME}")
-
-        connections.disconnect("default")
-        print("Disconnected from Milvus")
+        # Drop everything (the shared connection pool stays open)
+        backend = get_vector_backend()
+        backend.drop()
 
         # Find PDF files
-        pdf_files = [
-            os.path.join(config.DATA_DIRECTORY, f)
-            for f in os.listdir(config.DATA_DIRECTORY)
-            if f.endswith(".pdf")
-        ]
+        pdf_files = list_data_pdfs(config.DATA_DIRECTORY)
 
         if not pdf_files:
             print("No PDF files found!")
@@ -40,78 +26,29 @@ def completely_fresh_ingestion():
 
         print(f"Found {len(pdf_files)} PDF files")
 
-        # Process documents with absolutely minimal metadata
-        all_texts = []
-        all_metadatas = []
-
-        for file_path in pdf_files:
-            try:
-                print(f"Processing: {os.path.basename(file_path)}")
-
-                # Load PDF
-                loader = PyPDFLoader(file_path)
-                docs = loader.load()
-
-                if not docs:
-                    continue
-
-                # Split text
-                text_splitter = RecursiveCharacterTextSplitter(
-                    chunk_size=config.CHUNK_SIZE, chunk_overlap=config.CHUNK_OVERLAP
-                )
-                chunks = text_splitter.split_documents(docs)
-
-                # Extract only text and minimal metadata
-                for chunk in chunks:
-                    all_texts.append(chunk.page_content)
-
-                    # Minimal metadata - only what we absolutely need
-                    metadata = {
-                        "source": os.path.basename(file_path),
-                        "page": int(chunk.metadata.get("page", 0)),
-                    }
-                    all_metadatas.append(metadata)
-
-                print(f"  Added {len(chunks)} chunks")
-
-            except Exception as e:
-                print(f"Error processing {file_path}: {e}")
-                continue
-
-        if not all_texts:
+        # Stream parse -> split -> embed -> insert in fixed-size batches instead
+        # of holding every chunk of every file in memory
+        docs_processed, chunks_ingested = process_and_embed_pdfs(pdf_files)
+        if not chunks_ingested:
             print("No text content found!")
             return
 
-        print(f"Total chunks: {len(all_texts)}")
-
-        # Create embeddings
-        embedding_model = FastEmbedEmbeddings(model_name=config.EMBEDDING_MODEL)
-
-        # Create vector store using from_texts (simpler than from_documents)
-        print("Creating vector store...")
-        vector_store = Milvus.from_texts(
-            texts=all_texts,
-            embedding=embedding_model,
-            metadatas=all_metadatas,
-            connection_args={"host": config.MILVUS_HOST, "port": config.MILVUS_PORT},
-            collection_name=config.COLLECTION_NAME,
-        )
+        print(f"Total chunks: {chunks_ingested}")
 
-        print("Successfully created vector store!")
+        print(f"Successfully created vector store! ({backend.count()} chunks)")
 
         # Test search
         print("Testing search...")
-        results = vector_store.similarity_search("hackathon", k=3)
+        vectors = get_embedding_model().embed_queries(["hackathon"])
+        results = backend.search(vectors, k=3)[0]
 
         if results:
             print(f"Search successful! Found {len(results)} results:")
-            for i, doc in enumerate(results, 1):
-                source = doc.metadata.get("source", "N/A")
-                page = doc.metadata.get("page", "N/A")
+            for i, hit in enumerate(results, 1):
+                source = hit["source"]
+                page = hit["page"]
                 preview = (
-                    doc.page_content[:100] + "..."
-                    if len(doc.page_content) > 100
-                    else doc.page_content
+                    hit["text"][:100] + "..." if len(hit["text"]) > 100 else hit["text"]
                 )
                 print(f"  {i}. [{source}, p.{page}] {preview}")
         else:
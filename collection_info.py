@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Reports the vector index the collection actually has on the server.
+
+Shows the index type, metric and build params, indexing progress, load state
+and memory of `research_docs_v1`, next to what config.py asks for, and flags
+a mismatch (which makes queries fail or silently use the wrong metric).
+"""
+
+import json
+import sys
+
+import config
+from resources import get_vector_backend
+from vector_store import milvus_index_params
+
+
+def _format_bytes(value) -> str:
+    if not isinstance(value, (int, float)):
+        return str(value)
+    for unit in ("B", "KiB", "MiB"):
+        if value < 1024:
+            return f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} GiB"
+
+
+def configured_index() -> dict:
+    if config.VECTOR_BACKEND == "local":
+        return {"index_type": config.LOCAL_INDEX_TYPE.upper(), "metric_type": "L2"}
+    index_type, metric_type, params = milvus_index_params()
+    return {"index_type": index_type, "metric_type": metric_type, "params": params}
+
+
+def main():
+    as_json = "--json" in sys.argv[1:]
+    info = get_vector_backend().describe()
+    expected = configured_index()
+
+    if as_json:
+        print(json.dumps({**info, "configured": expected}, indent=2, default=str))
+        return
+
+    print(f"=== Collection '{config.COLLECTION_NAME}' ({info['backend']}) ===")
+    if not info.get("exists"):
+        print("Collection does not exist; run ingest.py or sync_data.py")
+        return
+
+    print(f"Rows:           {info['rows']}")
+    print(f"Index:          {info['index_type']} / {info['metric_type']}")
+    print(f"Build params:   {info['index_params']}")
+    print(f"Search params:  {info['search_params']}")
+    if info.get("indexed_rows") is not None:
+        print(
+            f"Indexed rows:   {info['indexed_rows']} "
+            f"(pending: {info['pending_index_rows']}, state: {info['index_state']})"
+        )
+    if info.get("load_state") is not None:
+        progress = info.get("load_progress")
+        suffix = f" ({progress}%)" if progress is not None else ""
+        print(f"Load state:     {info['load_state']}{suffix}")
+    if info.get("loaded_segments") is not None:
+        print(f"Segments:       {info['loaded_segments']} loaded")
+    print(f"Memory:         {_format_bytes(info['memory_bytes'])}")
+
+    print(f"Configured:     {expected['index_type']} / {expected['metric_type']}")
+    actual = (info["index_type"], info["metric_type"])
+    # The local store only switches to IVF once it is large enough
+    if config.VECTOR_BACKEND == "local":
+        actual = (info["configured_index_type"], info["metric_type"])
+    if actual != (expected["index_type"], expected["metric_type"]):
+        print("⚠️  Index does not match config.py; run fresh_start.py to rebuild it")
+    else:
+        print("✅ Index matches config.py")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,19 +10,178 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 # Recommended embedding model for speed and accuracy
 EMBEDDING_MODEL = "BAAI/bge-base-en-v1.5"
 
+# Persistent embedding cache (memory-mapped float32 vectors + SQLite index);
+# 1 GiB holds roughly 350k 768-dimensional vectors
+CACHE_DIRECTORY = os.getenv("CACHE_DIRECTORY", ".cache")
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE", "1") != "0"
+EMBEDDING_CACHE_DIRECTORY = os.path.join(CACHE_DIRECTORY, "embeddings")
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", 1 << 30))
+# In-memory LRU of query embeddings (entries; 0 disables it)
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", 2048))
+
 # LLM model for planning, synthesis, and refinement
 LLM_MODEL = "llama-3.1-8b-instant"
 
+# Persistent LLM response cache (the LLM runs at temperature 0, so identical
+# prompts give identical answers)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1") != "0"
+LLM_CACHE_PATH = os.path.join(CACHE_DIRECTORY, "llm.sqlite")
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", 5000))
+
 # --- Vector Database Configuration ---
 # Use environment variables for Docker compatibility
 MILVUS_HOST = os.getenv("MILVUS_HOST", "localhost")
 MILVUS_PORT = os.getenv("MILVUS_PORT", "19530")
 COLLECTION_NAME = "research_docs_v1"
+# Long-lived client pool (see milvus_connection.py): idle clients are pinged
+# before reuse, and dropped connections are re-opened with exponential backoff
+MILVUS_POOL_SIZE = int(os.getenv("MILVUS_POOL_SIZE", 2))
+MILVUS_HEALTH_CHECK_SECONDS = 30
+MILVUS_RECONNECT_ATTEMPTS = 5
+MILVUS_RECONNECT_BACKOFF_SECONDS = 0.5
+# Vector store backend: "milvus" (standalone server) or "local" (in-process
+# index in memory-mapped files, no server needed; see local_vector_store.py)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "milvus").lower()
+
+# Milvus vector index, applied when the collection is created and, with the
+# matching search params, to every query. Supported: HNSW, IVF_FLAT, IVF_PQ
+# and AUTOINDEX. The metric must match the one the collection was built with;
+# run collection_info.py to see what the server actually has.
+MILVUS_INDEX_TYPE = os.getenv("MILVUS_INDEX_TYPE", "HNSW").upper()
+MILVUS_METRIC_TYPE = os.getenv("MILVUS_METRIC_TYPE", "L2").upper()
+MILVUS_INDEX_PARAMS = {
+    "HNSW": {"M": 16, "efConstruction": 200},
+    "IVF_FLAT": {"nlist": 1024},
+    # m (sub-quantisers) must divide the embedding dimension (768 for bge-base)
+    "IVF_PQ": {"nlist": 1024, "m": 48, "nbits": 8},
+    "AUTOINDEX": {},
+}
+MILVUS_SEARCH_PARAMS = {
+    # ef is raised to the requested limit when that is larger
+    "HNSW": {"ef": int(os.getenv("MILVUS_SEARCH_EF", 64))},
+    "IVF_FLAT": {"nprobe": int(os.getenv("MILVUS_SEARCH_NPROBE", 16))},
+    "IVF_PQ": {"nprobe": int(os.getenv("MILVUS_SEARCH_NPROBE", 16))},
+    "AUTOINDEX": {},
+}
+
+# Chunks retrieved per plan step, and the thread pool used when plan steps
+# have to be searched one by one
+RETRIEVAL_TOP_K = 3
+RETRIEVAL_MAX_WORKERS = 4
+
+# Pooled retrieval over the whole plan: each step over-fetches candidates,
+# near-duplicates (same chunk, overlapping or near-identical text) are merged
+# and max-marginal-relevance picks a diverse set for the draft prompt
+RETRIEVAL_FETCH_K = 8
+RETRIEVAL_CONTEXT_CHUNKS = 10
+RETRIEVAL_MMR_LAMBDA = 0.7
+RETRIEVAL_DUPLICATE_SIMILARITY = 0.95
+
+# Hybrid retrieval: a BM25 keyword index (maintained by ingestion) is fused
+# with the dense ranking by weighted reciprocal rank fusion
+SPARSE_INDEX_ENABLED = os.getenv("SPARSE_INDEX", "1") != "0"
+SPARSE_INDEX_PATH = os.path.join(CACHE_DIRECTORY, "bm25.sqlite")
+BM25_K1 = 1.2
+BM25_B = 0.75
+HYBRID_DENSE_WEIGHT = float(os.getenv("HYBRID_DENSE_WEIGHT", 1.0))
+HYBRID_SPARSE_WEIGHT = float(os.getenv("HYBRID_SPARSE_WEIGHT", 1.0))
+RRF_K = 60
+
+# Cross-encoder reranking (see reranker.py): each step over-fetches
+# RERANK_FETCH_K candidates, and every (step, candidate) pair of the research
+# run is scored in one batched pass. Over RERANK_BUDGET_SECONDS the steps keep
+# their vector order.
+RERANK_ENABLED = os.getenv("RERANK", "1") != "0"
+RERANK_MODEL = os.getenv("RERANK_MODEL", "Xenova/ms-marco-MiniLM-L-6-v2")
+RERANK_FETCH_K = int(os.getenv("RERANK_FETCH_K", 20))
+RERANK_BATCH_SIZE = 32
+RERANK_BUDGET_SECONDS = float(os.getenv("RERANK_BUDGET_SECONDS", 1.5))
+RERANK_CACHE_SIZE = 20_000
+
+# Speculative retrieval: the plan's searches start as soon as the plan is
+# shown, and the researcher uses them if the plan is executed unchanged.
+# Prefetches of sessions that are abandoned (closed tab, new research, or
+# not executed within the TTL) are cancelled.
+PREFETCH_ENABLED = os.getenv("PREFETCH", "1") != "0"
+PREFETCH_TTL_SECONDS = 600
+PREFETCH_MAX_SESSIONS = 100
+
+# Semantic cache of finished reports: a new task reuses the report of a
+# previous one whose embedding is at least this cosine-similar
+REPORT_CACHE_ENABLED = os.getenv("REPORT_CACHE", "1") != "0"
+REPORT_CACHE_PATH = os.path.join(CACHE_DIRECTORY, "reports.sqlite")
+REPORT_CACHE_THRESHOLD = float(os.getenv("REPORT_CACHE_THRESHOLD", 0.95))
+REPORT_CACHE_SIZE = int(os.getenv("REPORT_CACHE_SIZE", 500))
+
+# LangGraph checkpoints (the session state between the plan and execute
+# phases) in SQLite, shared by app workers on the same disk; ":memory:" keeps
+# them in process. Sessions unused for the TTL expire, and beyond
+# CHECKPOINT_MAX_THREADS the least recently used are evicted by a sweeper.
+CHECKPOINT_PATH = os.getenv(
+    "CHECKPOINT_PATH", os.path.join(CACHE_DIRECTORY, "checkpoints.sqlite")
+)
+CHECKPOINT_TTL_SECONDS = float(os.getenv("CHECKPOINT_TTL_SECONDS", 24 * 3600))
+CHECKPOINT_MAX_THREADS = int(os.getenv("CHECKPOINT_MAX_THREADS", 1000))
+# Sessions used this recently (e.g. a plan under review) are never evicted
+CHECKPOINT_EVICTION_GRACE_SECONDS = 15 * 60
+CHECKPOINT_SWEEP_SECONDS = 300
+# Serialized checkpoint values at least this large are zlib-compressed
+CHECKPOINT_COMPRESS_MIN_BYTES = 1024
+
+# Report exports: one directory per session, PDFs rendered on a worker pool
+# and cached by report content hash
+EXPORT_DIRECTORY = os.getenv(
+    "EXPORT_DIRECTORY", os.path.join(CACHE_DIRECTORY, "exports")
+)
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", 2))
+EXPORT_PDF_CACHE_SIZE = 200
+EXPORT_TTL_SECONDS = CHECKPOINT_TTL_SECONDS
+EXPORT_SWEEP_SECONDS = CHECKPOINT_SWEEP_SECONDS
 
 # --- Data Ingestion Configuration ---
 DATA_DIRECTORY = "data"
 CHUNK_SIZE = 1024
 CHUNK_OVERLAP = 120
 
+# Worker processes for PDF parsing (1 disables the process pool)
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", os.cpu_count() or 1))
+# Large PDFs are split into page ranges of this size and parsed in parallel
+PARSE_PAGES_PER_TASK = 16
+# Streaming ingestion: chunks per embed/insert batch and batches buffered
+# between pipeline stages (bounds peak memory regardless of corpus size)
+EMBED_BATCH_SIZE = 64
+INGEST_QUEUE_DEPTH = 2
+# Content-hash manifest used for incremental ingestion
+MANIFEST_PATH = os.getenv(
+    "MANIFEST_PATH", os.path.join(DATA_DIRECTORY, ".ingest_manifest.json")
+)
+
+# Local vector backend: exact ("FLAT") search, or "IVF" once the collection
+# holds LOCAL_IVF_MIN_VECTORS chunks (NLIST 0 picks 4 * sqrt(n) lists)
+LOCAL_VECTOR_DIRECTORY = os.getenv(
+    "LOCAL_VECTOR_DIRECTORY", os.path.join(DATA_DIRECTORY, ".vectors")
+)
+LOCAL_INDEX_TYPE = os.getenv("LOCAL_INDEX_TYPE", "FLAT")
+LOCAL_IVF_MIN_VECTORS = 20_000
+LOCAL_IVF_NLIST = 0
+LOCAL_IVF_NPROBE = 16
+
 # --- Application Configuration ---
 APP_TITLE = "Deep Researcher Agent"
+
+# Prometheus metrics endpoint (GET /metrics) served next to the Gradio app;
+# port 0 disables it. Binds like Gradio unless METRICS_HOST is set.
+METRICS_HOST = os.getenv("METRICS_HOST", os.getenv("GRADIO_SERVER_NAME", "127.0.0.1"))
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9464))
+# Histogram buckets (seconds) for node, LLM, embedding and search latencies
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# --- Startup Configuration ---
+# `health.py --wait` (run by entrypoint.sh) probes the vector store until it
+# answers, backing off from READINESS_PROBE_SECONDS, for at most this long.
+READINESS_TIMEOUT_SECONDS = float(os.getenv("READINESS_TIMEOUT_SECONDS", 120))
+READINESS_PROBE_SECONDS = 1.0
+# The app retries a failed warm-up (e.g. a model download or Milvus not up
+# yet), backing off up to this long between attempts, until /readyz is 200
+WARM_UP_RETRY_MAX_SECONDS = 60.0
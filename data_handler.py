@@ -1,165 +1,419 @@
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_milvus import Milvus
-from pymilvus import connections, utility
 import config
 import os
 from langchain_core.embeddings import Embeddings
-from fastembed.embedding import DefaultEmbedding as FastEmbedDefaultEmbedding
-from typing import List
+from langchain_core.documents import Document
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set
 import numpy as np
+import queue
+import threading
+import time
+
+from embedding_cache import EmbeddingCache, QueryEmbeddingCache
+from manifest import IngestManifest, chunk_ids, file_sha256, ingest_lock
+from pdf_parser import iter_split_pdfs
+import metrics
+import resources
 
 
 # --- LangChain-Compatible Embedding Wrapper ---
 class FastEmbedEmbeddings(Embeddings):
-    def __init__(self, model_name: str):
+    def __init__(
+        self, model_name: str, use_cache: bool = config.EMBEDDING_CACHE_ENABLED
+    ):
+        # Imported here: fastembed pulls in onnxruntime, which is slow to load
+        from fastembed.embedding import DefaultEmbedding as FastEmbedDefaultEmbedding
+
         self.model = FastEmbedDefaultEmbedding(model_name=model_name)
+        self.cache = EmbeddingCache(model_name) if use_cache else None
+        self.query_cache = QueryEmbeddingCache()
         print(f"Initialized FastEmbed model: {model_name}")
 
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        print(f"Embedding {len(texts)} documents")
-        try:
-            # Generate embeddings
-            embeddings = list(self.model.embed(texts))
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """
+        Embeds texts into one contiguous `(len(texts), dim)` float32 matrix.
+
+        This is the native batch API: vectors are copied straight into a
+        preallocated matrix, without any Python float lists. The on-disk
+        embedding cache is consulted first and only misses reach the model.
+        """
+        started = time.perf_counter()
+        if self.cache is None or not texts:
+            matrix = self._embed_uncached(texts)
+            metrics.record_embedding(
+                "document", len(texts), 0, time.perf_counter() - started
+            )
+            return matrix
 
-            # Convert to list of lists of floats
-            result = []
-            for embedding in embeddings:
-                if isinstance(embedding, np.ndarray):
-                    result.append(embedding.tolist())
-                else:
-                    result.append(list(embedding))
+        matrix, missing = self.cache.get_many(texts)
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            embedded = self._embed_uncached(missing_texts)
+            self.cache.put_many(missing_texts, embedded)
+            if matrix is None:
+                matrix = embedded
+            else:
+                matrix[missing] = embedded
+        metrics.record_embedding(
+            "document",
+            len(texts),
+            len(texts) - len(missing),
+            time.perf_counter() - started,
+        )
+        return matrix
 
-            print(f"Successfully generated {len(result)} document embeddings")
-            return result
+    def _embed_uncached(self, texts: List[str]) -> np.ndarray:
+        try:
+            matrix = None
+            for i, vector in enumerate(self.model.embed(texts)):
+                if matrix is None:
+                    matrix = np.empty((len(texts), vector.shape[-1]), dtype=np.float32)
+                matrix[i] = vector
+            if matrix is None:
+                return np.empty((0, 0), dtype=np.float32)
+            return matrix
 
         except Exception as e:
-            print(f"Error in embed_documents: {e}")
+            print(f"Error in embed_array: {e}")
             raise
 
+    # LangChain's List[List[float]] interface, kept as a thin shim over embed_array
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(texts).tolist()
+
     def embed_query(self, text: str) -> List[float]:
-        print(f"Embedding query: {text[:50]}...")
-        try:
-            # Generate embedding for single query
-            embeddings = list(self.model.embed([text]))
-            embedding = embeddings[0]
+        return self.embed_queries([text])[0].tolist()
 
-            # Convert to list of floats
-            if isinstance(embedding, np.ndarray):
-                result = embedding.tolist()
-            else:
-                result = list(embedding)
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        """
+        Embeds search queries into a float32 matrix in one model call.
 
-            print(
-                f"Successfully generated query embedding with dimension: {len(result)}"
-            )
-            return result
+        Repeated queries are served by the in-memory LRU and skip ONNX
+        inference; one-off queries would only churn the on-disk cache, so they
+        stay out of it.
+        """
+        started = time.perf_counter()
+        vectors = [self.query_cache.get(text) for text in texts]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            embedded = self._embed_uncached([texts[i] for i in missing])
+            for i, vector in zip(missing, embedded):
+                self.query_cache.put(texts[i], vector)
+                vectors[i] = vector
+        metrics.record_embedding(
+            "query",
+            len(texts),
+            len(texts) - len(missing),
+            time.perf_counter() - started,
+        )
+        if not vectors:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack(vectors)
+
+
+# --- Streaming Ingestion Pipeline ---
+# parse/split -> embed -> insert run as generator stages in separate threads,
+# connected by bounded queues. Only a few batches are buffered between stages,
+# so memory stays flat with corpus size and the first batches are searchable
+# while later files are still being parsed.
 
-        except Exception as e:
-            print(f"Error in embed_query: {e}")
-            raise
 
+class _FileDone(NamedTuple):
+    """Marks that every chunk of a file has been handed to the pipeline."""
 
-def process_and_embed_pdfs(file_paths: List[str]):
+    file_path: str
+    ids: List[str]
+    ok: bool
+
+
+class _Batch(NamedTuple):
+    ids: List[str]
+    chunks: List[Document]
+    vectors: Optional[np.ndarray]
+    # Files whose last chunk is in this (or an earlier) batch
+    finished: List[_FileDone]
+
+
+class _StageError(NamedTuple):
+    error: BaseException
+
+
+def _prefetch(items: Iterator, depth: int) -> Iterator:
     """
-    Loads, splits, embeds, and ingests a list of PDF files into Milvus.
+    Runs a generator stage in a background thread.
+
+    The bounded queue is the backpressure between stages: the producer blocks
+    once `depth` items are waiting for the consumer.
     """
-    print(f"--- Processing {len(file_paths)} PDF file(s) ---")
-    all_chunks = []
+    buffer = queue.Queue(maxsize=depth)
+    done = object()
+    stop = threading.Event()
 
-    for file_path in file_paths:
+    def _put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _run():
         try:
-            print(f"Loading PDF: {file_path}")
-            loader = PyPDFLoader(file_path)
-            docs = loader.load()
+            for item in items:
+                _put(item)
+                if stop.is_set():
+                    break
+            _put(done)
+        except BaseException as e:
+            _put(_StageError(e))
+        finally:
+            close = getattr(items, "close", None)
+            if close is not None:
+                close()
 
-            if not docs:
-                print(f"No documents loaded from {file_path}")
-                continue
+    threading.Thread(target=_run, daemon=True).start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is done:
+                return
+            if isinstance(item, _StageError):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
 
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=config.CHUNK_SIZE, chunk_overlap=config.CHUNK_OVERLAP
-            )
-            chunks = text_splitter.split_documents(docs)
-
-            # Clean and standardize metadata for each chunk
-            for chunk in chunks:
-                # Completely replace metadata with only what we need
-                original_page = chunk.metadata.get("page", 0)
-
-                # Ensure page is an integer
-                if isinstance(original_page, str):
-                    try:
-                        page_num = int(original_page)
-                    except (ValueError, TypeError):
-                        page_num = 0
-                else:
-                    page_num = int(original_page) if original_page is not None else 0
-
-                # Replace all metadata with clean version
-                chunk.metadata = {
-                    "source": os.path.basename(file_path),
-                    "page": page_num,
-                }
-
-            all_chunks.extend(chunks)
-            print(f"Loaded and split '{file_path}' into {len(chunks)} chunks.")
 
-        except Exception as e:
-            print(f"Error processing file {file_path}: {e}")
+def _chunk_batches(
+    file_paths: List[str], stored_ids: Dict[str, Set[str]]
+) -> Iterator[_Batch]:
+    """Parse/split stage: yields fixed-size batches of chunks not yet stored."""
+    ids, chunks, finished = [], [], []
+    file_ids: Dict[str, List[str]] = {}
+
+    for file_path, range_chunks, is_last in iter_split_pdfs(file_paths):
+        source = os.path.basename(file_path)
+        if range_chunks is None:
+            finished.append(_FileDone(file_path, [], ok=False))
             continue
 
-    if not all_chunks:
-        print("No processable content found in the provided files.")
-        return 0, 0
+        # Page ranges never share a page, so ids can be computed per range
+        range_ids = chunk_ids(range_chunks)
+        file_ids.setdefault(file_path, []).extend(range_ids)
+        for chunk_id, chunk in zip(range_ids, range_chunks):
+            if chunk_id in stored_ids.get(source, ()):
+                continue
+            ids.append(chunk_id)
+            chunks.append(chunk)
+            if len(chunks) >= config.EMBED_BATCH_SIZE:
+                yield _Batch(ids, chunks, None, finished)
+                ids, chunks, finished = [], [], []
 
-    print(f"Total chunks to ingest: {len(all_chunks)}")
+        if is_last:
+            finished.append(_FileDone(file_path, file_ids.pop(file_path), ok=True))
 
-    try:
-        # Initialize the embedding model
-        embedding_model = FastEmbedEmbeddings(model_name=config.EMBEDDING_MODEL)
+    if chunks or finished:
+        yield _Batch(ids, chunks, None, finished)
 
-        # Test embedding functionality
-        test_text = "This is a test embedding."
-        test_embedding = embedding_model.embed_query(test_text)
-        print(f"Test embedding successful. Dimension: {len(test_embedding)}")
 
-        # Drop existing collection to avoid schema conflicts
-        try:
-            connections.connect(
-                "default", host=config.MILVUS_HOST, port=config.MILVUS_PORT
-            )
-            if utility.has_collection(config.COLLECTION_NAME):
-                utility.drop_collection(config.COLLECTION_NAME)
-                print(f"Dropped existing collection: {config.COLLECTION_NAME}")
-        except Exception as e:
-            print(f"Note: Could not drop existing collection: {e}")
-        finally:
+def _embed_batches(batches: Iterator[_Batch], embedding_model) -> Iterator[_Batch]:
+    """Embed stage."""
+    for batch in batches:
+        texts = [chunk.page_content for chunk in batch.chunks]
+        if texts:
+            batch = batch._replace(vectors=embedding_model.embed_array(texts))
+        yield batch
+
+
+def _reconcile_manifest(store, manifest: IngestManifest):
+    """Keeps the manifest and the vector store collection in agreement."""
+    exists = store.has_collection()
+    if exists and not manifest.on_disk:
+        # Rows of unknown origin (ingested before there was a manifest):
+        # rebuild once. A manifest that exists but cannot be used raises in
+        # IngestManifest.load instead, so it never gets here.
+        print(f"Dropping unmanaged collection: {config.COLLECTION_NAME}")
+        store.drop()
+    elif not exists and manifest.files:
+        print("Collection is missing, re-ingesting all files")
+        manifest.reset()
+
+
+def _sync_sparse_index(store, sparse_index, manifest: IngestManifest):
+    """Rebuilds the BM25 index from the collection if it is out of date."""
+    if sparse_index is None or sparse_index.generation == manifest.generation:
+        return
+    if manifest.files and store.has_collection():
+        print("Keyword index is out of date, rebuilding it from the collection...")
+        sparse_index.rebuild(store.iter_texts())
+    else:
+        sparse_index.clear()
+    sparse_index.generation = manifest.generation
+
+
+def list_data_pdfs(directory: str = config.DATA_DIRECTORY) -> List[str]:
+    """Returns the PDF files in the data directory."""
+    return [
+        os.path.join(directory, f)
+        for f in sorted(os.listdir(directory))
+        if f.endswith(".pdf")
+    ]
+
+
+def sync_data_directory(directory: str = config.DATA_DIRECTORY):
+    """Brings the collection in line with the PDFs in the data directory."""
+    return process_and_embed_pdfs(list_data_pdfs(directory), remove_missing=True)
+
+
+def process_and_embed_pdfs(
+    file_paths: List[str],
+    remove_missing: bool = False,
+    origin: str = "data",
+    rebuild: bool = False,
+):
+    """
+    Incrementally ingests a list of PDF files into the vector store.
+
+    Files whose content hash matches the ingestion manifest are skipped. For
+    new or changed files only chunks that are not already stored are embedded
+    and upserted, and chunks that disappeared are deleted by primary key. With
+    `remove_missing`, files known to the manifest but absent from `file_paths`
+    are deleted as well. `origin` ("data" or "upload") is recorded per file so
+    a data-directory sync never removes files that were uploaded through the UI.
+    `rebuild` drops the collection and ignores the manifest first; it is the
+    only way past an unreadable or mismatched manifest (`ManifestError`).
+
+    Returns the number of files processed and the number of new chunks.
+    """
+    with ingest_lock:
+        return _ingest(file_paths, remove_missing, origin, rebuild)
+
+
+def _ingest(file_paths: List[str], remove_missing: bool, origin: str, rebuild: bool):
+    print(f"--- Processing {len(file_paths)} PDF file(s) ---")
+
+    try:
+        # Milvus or the in-process backend, per config.VECTOR_BACKEND
+        store = resources.get_vector_backend()
+        if rebuild:
+            print(f"Rebuilding collection: {config.COLLECTION_NAME}")
+            manifest = IngestManifest.load()
+            store.drop()
+            manifest.reset()
+        else:
+            manifest = IngestManifest.load(strict=True)
+            _reconcile_manifest(store, manifest)
+        sparse_index = resources.get_sparse_index()
+        _sync_sparse_index(store, sparse_index, manifest)
+
+        # Hash first: files with unchanged content are never parsed or embedded
+        file_hashes = {}
+        changed_paths = []
+        for file_path in file_paths:
             try:
-                connections.disconnect("default")
-            except Exception:
-                pass
-
-        # Ingest into Milvus with clean schema
-        print("Starting ingestion into Milvus...")
-
-        vector_store = Milvus.from_documents(
-            documents=all_chunks,
-            embedding=embedding_model,
-            connection_args={"host": config.MILVUS_HOST, "port": config.MILVUS_PORT},
-            collection_name=config.COLLECTION_NAME,
+                file_hashes[file_path] = file_sha256(file_path)
+            except OSError as e:
+                print(f"Error processing file {file_path}: {e}")
+                continue
+            if manifest.is_unchanged(
+                os.path.basename(file_path), file_hashes[file_path]
+            ):
+                print(f"Unchanged, skipping: {file_path}")
+            else:
+                changed_paths.append(file_path)
+
+        sources = {os.path.basename(file_path) for file_path in file_paths}
+        removed_sources = (
+            [s for s in manifest.sources(origin) if s not in sources]
+            if remove_missing
+            else []
         )
 
+        if not changed_paths and not removed_sources:
+            print("Knowledge base is already up to date.")
+            return len(file_hashes), 0
+
+        # Shared model: loaded once per process, not once per upload
+        embedding_model = resources.get_embedding_model()
+
+        # Snapshot of what is stored, read by the parse stage's thread
+        stored_ids = {
+            os.path.basename(path): set(manifest.chunk_ids_for(os.path.basename(path)))
+            for path in changed_paths
+        }
+
+        print(f"Starting streaming ingestion into the {store.name} vector store...")
+        batches = _prefetch(
+            _chunk_batches(changed_paths, stored_ids), config.INGEST_QUEUE_DEPTH
+        )
+        embedded = _prefetch(
+            _embed_batches(batches, embedding_model), config.INGEST_QUEUE_DEPTH
+        )
+
+        chunks_ingested = 0
+        files_ingested = 0
+        for batch in embedded:
+            if batch.chunks:
+                if not chunks_ingested:
+                    store.ensure_collection(batch.vectors.shape[1])
+                texts = [chunk.page_content for chunk in batch.chunks]
+                store.upsert(
+                    batch.ids,
+                    texts,
+                    [chunk.metadata for chunk in batch.chunks],
+                    batch.vectors,
+                )
+                if sparse_index is not None:
+                    sparse_index.add(batch.ids, texts)
+                chunks_ingested += len(batch.chunks)
+                print(f"Inserted batch of {len(batch.chunks)} chunks")
+
+            for done in batch.finished:
+                if not done.ok:
+                    # Keep the old manifest entry; the file is retried next run
+                    continue
+                source = os.path.basename(done.file_path)
+                stale_ids = sorted(stored_ids[source] - set(done.ids))
+                if stale_ids:
+                    store.delete(stale_ids)
+                    if sparse_index is not None:
+                        sparse_index.delete(stale_ids)
+
+                # Save after every file so an interrupted run keeps its progress
+                manifest.record(source, file_hashes[done.file_path], done.ids, origin)
+                manifest.save()
+                files_ingested += 1
+                print(f"'{source}': {len(done.ids)} chunks, {len(stale_ids)} removed")
+
+        for source in removed_sources:
+            stale_ids = manifest.chunk_ids_for(source)
+            if stale_ids and store.has_collection():
+                store.delete(stale_ids)
+            if stale_ids and sparse_index is not None:
+                sparse_index.delete(stale_ids)
+            manifest.forget(source)
+            manifest.save()
+            print(f"Removed '{source}' ({len(stale_ids)} chunks)")
+
+        manifest.generation += 1
+        manifest.save()
+        if sparse_index is not None:
+            sparse_index.generation = manifest.generation
+        # Reports researched against the old collection are stale now
+        report_cache = resources.get_report_cache()
+        if report_cache is not None:
+            report_cache.invalidate(manifest.generation)
+
         print(
-            f"--- Successfully ingested {len(all_chunks)} chunks from {len(file_paths)} file(s) ---"
+            f"--- Successfully ingested {chunks_ingested} chunks from {files_ingested} file(s) ---"
         )
 
         # Test search functionality
-        print("Testing search functionality...")
-        test_results = vector_store.similarity_search("test", k=1)
-        print(f"Search test returned {len(test_results)} results")
+        if chunks_ingested:
+            print("Testing search functionality...")
+            test_results = store.search(embedding_model.embed_queries(["test"]), k=1)
+            print(f"Search test returned {len(test_results[0])} results")
 
-        return len(file_paths), len(all_chunks)
+        return len(file_hashes), chunks_ingested
 
     except Exception as e:
         print(f"Error during ingestion: {e}")
@@ -0,0 +1,267 @@
+"""
+Embedding caches: a persistent on-disk store for chunk embeddings and an
+in-memory LRU for query embeddings.
+
+Vectors are stored in fixed-size slots of a memory-mapped float32 file; a small
+SQLite index maps each key to its slot and records when it was last used.
+Keys hash the embedding model name together with the normalised chunk text,
+so re-ingesting unchanged chunks costs a disk read instead of an ONNX run.
+When the file reaches its size budget the least recently used slots are reused.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+import config
+
+
+def normalize_text(text: str) -> str:
+    """Unicode- and whitespace-normalises text so trivially different copies share a key."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+def cache_key(model_name: str, text: str) -> str:
+    payload = f"{model_name}\x00{normalize_text(text)}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+class EmbeddingCache:
+    """Memory-mapped float32 embedding store with an SQLite slot index."""
+
+    def __init__(
+        self,
+        model_name: str,
+        directory: str = config.EMBEDDING_CACHE_DIRECTORY,
+        max_bytes: int = config.EMBEDDING_CACHE_MAX_BYTES,
+    ):
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+        self.directory = os.path.join(directory, safe_name)
+        os.makedirs(self.directory, exist_ok=True)
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(self.directory, "index.sqlite"),
+            check_same_thread=False,
+            timeout=30,
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, slot INTEGER UNIQUE NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS lru ON entries (last_used)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)"
+        )
+        self._db.commit()
+
+        self.dim: Optional[int] = None
+        self.capacity = 0
+        self._vectors: Optional[np.memmap] = None
+        row = self._db.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+        if row is not None:
+            self._open(int(row[0]))
+
+    # --- Storage ---
+    def _open(self, dim: int):
+        """Maps the vector file, resizing it to the current size budget."""
+        self.dim = dim
+        self.capacity = max(1, self.max_bytes // (dim * 4))
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES ('dim', ?)",
+                (str(dim),),
+            )
+            # The budget may have shrunk since the file was written
+            self._db.execute("DELETE FROM entries WHERE slot >= ?", (self.capacity,))
+        size = self.capacity * dim * 4
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(size)  # sparse on most filesystems
+        self._vectors = np.memmap(
+            self.vectors_path, dtype=np.float32, mode="r+", shape=(self.capacity, dim)
+        )
+
+    def _reset(self, dim: int):
+        """Drops every entry, e.g. when the model's dimension changed."""
+        with self._db:
+            self._db.execute("DELETE FROM entries")
+        self._vectors = None
+        if os.path.exists(self.vectors_path):
+            os.remove(self.vectors_path)
+        self._open(dim)
+
+    def _free_slots(self, count: int) -> List[int]:
+        """
+        Returns `count` writable slots, evicting least recently used entries.
+
+        Must run inside a `BEGIN IMMEDIATE` transaction, so no other process
+        allocates from the same MAX(slot) or victims.
+        """
+        (max_slot,) = self._db.execute("SELECT MAX(slot) FROM entries").fetchone()
+        next_slot = 0 if max_slot is None else max_slot + 1
+        slots = list(range(next_slot, min(next_slot + count, self.capacity)))
+
+        # Size budget reached: reuse the slots of the least recently used entries
+        if len(slots) < count:
+            victims = self._db.execute(
+                "SELECT key, slot FROM entries ORDER BY last_used LIMIT ?",
+                (count - len(slots),),
+            ).fetchall()
+            self._db.executemany(
+                "DELETE FROM entries WHERE key = ?", [(key,) for key, _ in victims]
+            )
+            slots.extend(slot for _, slot in victims)
+        return slots
+
+    def _lookup_slots(self, keys: List[str]) -> dict:
+        slots = {}
+        for i in range(0, len(keys), 500):
+            part = keys[i : i + 500]
+            placeholders = ",".join("?" * len(part))
+            slots.update(
+                self._db.execute(
+                    f"SELECT key, slot FROM entries WHERE key IN ({placeholders})",
+                    part,
+                ).fetchall()
+            )
+        return slots
+
+    # --- Public API ---
+    def get_many(self, texts: List[str]) -> Tuple[Optional[np.ndarray], List[int]]:
+        """
+        Looks up embeddings for `texts`.
+
+        Returns a `(len(texts), dim)` matrix with the cached rows filled in (or
+        None when nothing is cached yet) and the indices of the missing texts.
+        """
+        if self._vectors is None or not texts:
+            return None, list(range(len(texts)))
+
+        keys = [cache_key(self.model_name, text) for text in texts]
+        with self._lock, self._db:
+            # Held while the rows are copied: another process may reuse a slot
+            self._db.execute("BEGIN IMMEDIATE")
+            slots = self._lookup_slots(keys)
+
+            matrix = np.empty((len(texts), self.dim), dtype=np.float32)
+            missing = []
+            for i, key in enumerate(keys):
+                slot = slots.get(key)
+                if slot is None:
+                    missing.append(i)
+                else:
+                    matrix[i] = self._vectors[slot]
+
+            if slots:
+                self._db.executemany(
+                    "UPDATE entries SET last_used = ? WHERE key = ?",
+                    [(time.time(), key) for key in slots],
+                )
+        return matrix, missing
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        """Stores embeddings for `texts`, evicting old entries when full."""
+        if not texts:
+            return
+        dim = vectors.shape[1]
+        # Keys are unique per call so each text gets exactly one slot
+        items = {}
+        for text, vector in zip(texts, vectors):
+            items[cache_key(self.model_name, text)] = vector
+        with self._lock:
+            if self.dim is None:
+                self._open(dim)
+            elif self.dim != dim:
+                print(
+                    f"Embedding dimension changed ({self.dim} -> {dim}), clearing cache"
+                )
+                self._reset(dim)
+
+            keys = list(items)[: self.capacity]
+            now = time.time()
+            with self._db:
+                # The app and sync_data.py share the cache directory: the write
+                # lock is taken before slots are allocated and held until the
+                # vectors are flushed and the rows committed
+                self._db.execute("BEGIN IMMEDIATE")
+                # Existing keys are overwritten in place
+                slots = self._lookup_slots(keys)
+                new_keys = [key for key in keys if key not in slots]
+                for key, slot in zip(new_keys, self._free_slots(len(new_keys))):
+                    slots[key] = slot
+                for key, slot in slots.items():
+                    self._vectors[slot] = items[key]
+                self._vectors.flush()
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO entries (key, slot, last_used) VALUES (?, ?, ?)",
+                    [(key, slot, now) for key, slot in slots.items()],
+                )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded, thread-safe in-memory LRU of query embeddings.
+
+    Keys are whitespace-normalised query texts, which tokenise identically, so
+    a hit returns exactly the vector the model would have produced.
+    """
+
+    def __init__(self, capacity: int = config.QUERY_CACHE_SIZE):
+        self.capacity = capacity
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        key = normalize_text(text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, text: str, vector: np.ndarray):
+        if self.capacity <= 0:
+            return
+        vector = np.array(vector, dtype=np.float32)
+        vector.setflags(write=False)
+        key = normalize_text(text)
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -29,30 +29,24 @@ wait_for_milvus() {
     exit 1
 }
 
-# Wait for Milvus
-wait_for_milvus
+# Wait for Milvus (the local backend needs no server)
+if [ "${VECTOR_BACKEND:-milvus}" = "milvus" ]; then
+    wait_for_milvus
+fi
 
-# Additional wait to ensure Milvus is fully initialized
-echo "Waiting additional 15 seconds for Milvus full initialization..."
-sleep 15
+# Milvus' /healthz turns green before it serves every request, so probe the
+# vector store with a real call (retrying with backoff) instead of sleeping
+echo "Waiting for the vector store to answer..."
+uv run health.py --wait
 
-# Check if data directory has PDFs, if so, run ingestion
-if [ -n "$(find data -name '*.pdf' 2>/dev/null)" ]; then
-    echo "Found PDF files, attempting ingestion..."
-    
-    # Try fresh_start.py first, fallback to ingest.py
-    if [ -f "fresh_start.py" ]; then
-        echo "Running fresh_start.py..."
-        uv run fresh_start.py
-    elif [ -f "ingest.py" ]; then
-        echo "Running ingest.py..."
-        uv run  ingest.py
-    else
-        echo "Warning: No ingestion script found (fresh_start.py or ingest.py)"
-        echo "You can upload PDFs through the web interface instead."
-    fi
+# Incrementally sync data/ into Milvus: unchanged PDFs are skipped, removed
+# PDFs are deleted, so a reboot with the same data is close to a no-op.
+# (Run fresh_start.py manually to force a full rebuild.)
+if [ -d data ]; then
+    echo "Syncing data directory into the knowledge base..."
+    uv run sync_data.py
 else
-    echo "No PDF files found in data directory, skipping ingestion"
+    echo "No data directory found, skipping ingestion"
 fi
 
 # Start the Gradio application
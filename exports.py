@@ -0,0 +1,171 @@
+"""
+Report export (Markdown and PDF) as background jobs.
+
+Each research session (LangGraph thread) exports into its own directory under
+`config.EXPORT_DIRECTORY`, so concurrent users no longer overwrite each
+other's files. The Markdown file is written straight away; the PDF is
+rendered by WeasyPrint on a small worker pool, so the report is shown as soon
+as it is written and the PDF download appears when its job finishes.
+
+Rendered PDFs are cached by the SHA-256 of the report text: a report that was
+rendered before (e.g. one served from the report cache) is copied instead of
+rendered again. The cache and the session directories are pruned by age and
+size by a background sweeper (`start_sweeper`).
+"""
+
+import hashlib
+import os
+import random
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+import markdown
+
+import config
+import metrics
+
+MD_FILENAME = "research_report.md"
+PDF_FILENAME = "research_report.pdf"
+
+
+def content_hash(report: str) -> str:
+    return hashlib.sha256(report.encode("utf-8")).hexdigest()
+
+
+def render_pdf(report: str, pdf_path: str):
+    """Renders Markdown `report` to a PDF file with WeasyPrint."""
+    # Imported here: WeasyPrint and its native libraries load slowly
+    from weasyprint import HTML
+
+    HTML(string=markdown.markdown(report)).write_pdf(pdf_path)
+
+
+class ExportJobs:
+    """Per-session Markdown/PDF exports, with PDFs rendered on a worker pool."""
+
+    def __init__(
+        self,
+        directory: str = config.EXPORT_DIRECTORY,
+        workers: int = config.EXPORT_WORKERS,
+        cache_size: int = config.EXPORT_PDF_CACHE_SIZE,
+        ttl_seconds: float = config.EXPORT_TTL_SECONDS,
+    ):
+        self.sessions_directory = os.path.join(directory, "sessions")
+        self.cache_directory = os.path.join(directory, "pdf_cache")
+        os.makedirs(self.sessions_directory, exist_ok=True)
+        os.makedirs(self.cache_directory, exist_ok=True)
+        self.cache_size = cache_size
+        self.ttl_seconds = ttl_seconds
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, workers), thread_name_prefix="export"
+        )
+        # Renders of the same report share one job
+        self._lock = threading.Lock()
+        self._rendering: dict = {}
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def session_directory(self, session_id: str) -> str:
+        # Thread IDs are UUIDs; anything else is reduced to a safe name
+        safe_id = re.sub(r"[^A-Za-z0-9_-]+", "_", session_id)
+        path = os.path.join(self.sessions_directory, safe_id)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def write_markdown(self, session_id: str, report: str) -> str:
+        """Writes the Markdown export now (it is cheap) and returns its path."""
+        md_path = os.path.join(self.session_directory(session_id), MD_FILENAME)
+        with open(md_path, "w", encoding="utf-8") as f:
+            f.write(report)
+        return md_path
+
+    def submit_pdf(self, session_id: str, report: str) -> "Future[str]":
+        """Starts the PDF export; the future resolves to the session's PDF path."""
+        # Called from the event loop: all file system work happens in the job
+        return self._executor.submit(self._export_pdf, session_id, report)
+
+    def _cached_pdf(self, report: str) -> str:
+        """Path of the cached PDF of `report`, rendering it if needed."""
+        key = content_hash(report)
+        cached_path = os.path.join(self.cache_directory, f"{key}.pdf")
+        with self._lock:
+            event = self._rendering.get(key)
+            owner = event is None and not os.path.exists(cached_path)
+            if owner:
+                event = self._rendering[key] = threading.Event()
+        if event is not None and not owner:
+            event.wait()
+        if not owner:
+            if os.path.exists(cached_path):
+                # Refresh the LRU position
+                os.utime(cached_path)
+                return cached_path
+            # The other render failed; try again ourselves
+            return self._cached_pdf(report)
+
+        partial_path = f"{cached_path}.{threading.get_ident()}.tmp"
+        try:
+            started = time.perf_counter()
+            render_pdf(report, partial_path)
+            # Atomic, so readers never see a half-written PDF
+            os.replace(partial_path, cached_path)
+            metrics.record_export(time.perf_counter() - started)
+            return cached_path
+        except Exception:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+        finally:
+            with self._lock:
+                self._rendering.pop(key).set()
+
+    def _export_pdf(self, session_id: str, report: str) -> str:
+        pdf_path = os.path.join(self.session_directory(session_id), PDF_FILENAME)
+        shutil.copyfile(self._cached_pdf(report), pdf_path)
+        return pdf_path
+
+    def prune(self):
+        """Drops expired session directories and the oldest cached PDFs."""
+        cutoff = time.time() - self.ttl_seconds
+        for entry in os.scandir(self.sessions_directory):
+            if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        cached = sorted(
+            (
+                entry
+                for entry in os.scandir(self.cache_directory)
+                if entry.name.endswith(".pdf")
+            ),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in cached[: max(0, len(cached) - self.cache_size)]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def start_sweeper(self, interval: float = config.EXPORT_SWEEP_SECONDS):
+        """Runs `prune()` every `interval` seconds in a daemon thread."""
+        if self._sweeper is not None:
+            return
+
+        def _run():
+            # Jitter, so workers sharing the directory do not sweep in lockstep
+            while not self._stop.wait(interval * random.uniform(0.9, 1.1)):
+                try:
+                    self.prune()
+                except OSError as e:
+                    print(f"Export sweep failed: {e}")
+
+        self._sweeper = threading.Thread(
+            target=_run, name="export-sweeper", daemon=True
+        )
+        self._sweeper.start()
+
+    def shutdown(self, wait: bool = True):
+        self._stop.set()
+        self._executor.shutdown(wait=wait)
@@ -1,73 +1,54 @@
 #!/usr/bin/env python3
 """
-Script to fix the Milvus collection metric type issue
+Script to fix a collection whose index or metric does not match config.py
 """
 
-from pymilvus import (
-    connections,
-    utility,
-    Collection,
-    FieldSchema,
-    CollectionSchema,
-    DataType,
-)
 import config
-from data_handler import FastEmbedEmbeddings, process_and_embed_pdfs
-import os
+from collection_info import configured_index
+from data_handler import list_data_pdfs, process_and_embed_pdfs
+from resources import get_embedding_model, get_vector_backend
 
 
 def check_collection_info():
-    """Check current collection configuration"""
+    """Check current collection configuration against config.py"""
     print("=== Checking Current Collection ===")
 
     try:
-        connections.connect("default", host=config.MILVUS_HOST, port=config.MILVUS_PORT)
-
-        if utility.has_collection(config.COLLECTION_NAME):
-            collection = Collection(config.COLLECTION_NAME)
+        info = get_vector_backend().describe()
 
+        if info.get("exists"):
             print(f"Collection '{config.COLLECTION_NAME}' exists")
-            print(f"Number of entities: {collection.num_entities}")
-
-            # Get schema info
-            schema = collection.schema
-            print(f"Schema: {schema}")
-
-            # Get index info
-            indexes = collection.indexes
-            for index in indexes:
-                print(f"Index: {index}")
-
-            return True
+            print(f"Number of entities: {info['rows']}")
+            print(
+                f"Index: {info['index_type']} / {info['metric_type']} "
+                f"{info['index_params']}"
+            )
+            return info
         else:
             print(f"Collection '{config.COLLECTION_NAME}' does not exist")
-            return False
+            return None
 
     except Exception as e:
         print(f"Error checking collection: {e}")
-        return False
+        return None
 
 
-def recreate_collection_with_cosine():
-    """Recreate the collection with COSINE metric"""
-    print("=== Recreating Collection with COSINE Metric ===")
+def recreate_collection():
+    """Recreate the collection with the index declared in config.py"""
+    expected = configured_index()
+    print(
+        f"=== Recreating Collection with {expected['index_type']} / "
+        f"{expected['metric_type']} ==="
+    )
 
     try:
-        connections.connect("default", host=config.MILVUS_HOST, port=config.MILVUS_PORT)
-
         # Drop existing collection
-        if utility.has_collection(config.COLLECTION_NAME):
-            print(f"Dropping existing collection '{config.COLLECTION_NAME}'")
-            utility.drop_collection(config.COLLECTION_NAME)
+        get_vector_backend().drop()
 
         print("Collection dropped. Now re-ingesting data...")
 
-        # Re-ingest data - this will create a new collection with proper settings
-        pdf_files = [
-            os.path.join(config.DATA_DIRECTORY, f)
-            for f in os.listdir(config.DATA_DIRECTORY)
-            if f.endswith(".pdf")
-        ]
+        # Re-ingest data - this creates the collection from config.py
+        pdf_files = list_data_pdfs(config.DATA_DIRECTORY)
 
         if pdf_files:
             print(f"Found {len(pdf_files)} PDF files to re-ingest")
@@ -88,35 +69,21 @@ def test_fixed_collection():
     print("=== Testing Fixed Collection ===")
 
     try:
-        from langchain_milvus import Milvus
-
-        embedding_model = FastEmbedEmbeddings(model_name=config.EMBEDDING_MODEL)
-
-        # Test with L2 metric (which should work now)
-        vector_store = Milvus(
-            embedding_function=embedding_model,
-            collection_name=config.COLLECTION_NAME,
-            connection_args={"host": config.MILVUS_HOST, "port": config.MILVUS_PORT},
-            search_params={
-                "metric_type": "L2",
-                "params": {"nprobe": 10},
-            },
-        )
+        embedding_model = get_embedding_model()
 
-        # Test search
-        results = vector_store.similarity_search("test query", k=3)
+        # Searches with the search params that match config.py's index
+        vectors = embedding_model.embed_queries(["test query"])
+        results = get_vector_backend().search(vectors, k=3)[0]
 
         if results:
             print(f"✅ Search successful! Found {len(results)} results")
-            for i, doc in enumerate(results, 1):
-                source = doc.metadata.get("source", "N/A")
-                page = doc.metadata.get("page", "N/A")
+            for i, hit in enumerate(results, 1):
                 content_preview = (
-                    doc.page_content[:100] + "..."
-                    if len(doc.page_content) > 100
-                    else doc.page_content
+                    hit["text"][:100] + "..." if len(hit["text"]) > 100 else hit["text"]
+                )
+                print(
+                    f"  {i}. [{hit['source']}, page: {hit['page']}] {content_preview}"
                 )
-                print(f"  {i}. [{source}, page: {page}] {content_preview}")
         else:
             print("⚠️  Search returned no results, but no errors")
 
@@ -126,33 +93,46 @@ def test_fixed_collection():
 
 def main():
     """Main function"""
-    print("🔧 Fixing Milvus Collection Metric Type Issue")
+    print("🔧 Fixing Collection Index / Metric Mismatch")
     print("=" * 50)
 
     # Check current collection
-    collection_exists = check_collection_info()
+    info = check_collection_info()
+    expected = configured_index()
 
-    if collection_exists:
+    if info is None:
+        print("No existing collection found. Creating new one...")
+        recreate_collection()
+    elif (info["index_type"], info["metric_type"]) != (
+        expected["index_type"],
+        expected["metric_type"],
+    ) and config.VECTOR_BACKEND != "local":
         print("\n" + "!" * 50)
-        print("DETECTED METRIC TYPE MISMATCH!")
-        print("Your collection was created with L2 metric, but code expects COSINE.")
+        print("DETECTED INDEX MISMATCH!")
+        print(
+            f"Your collection uses {info['index_type']} / {info['metric_type']}, "
+            f"but config.py declares {expected['index_type']} / "
+            f"{expected['metric_type']}."
+        )
         print("!" * 50)
 
         choice = input(
-            "\nChoose an option:\n1. Recreate collection (will delete existing data)\n2. Update code to use L2 metric\nEnter choice (1 or 2): "
+            "\nChoose an option:\n1. Recreate collection (will delete existing data)\n2. Keep it and update MILVUS_INDEX_TYPE / MILVUS_METRIC_TYPE instead\nEnter choice (1 or 2): "
         ).strip()
 
         if choice == "1":
-            recreate_collection_with_cosine()
+            recreate_collection()
         elif choice == "2":
-            print("\n✅ Use the updated agent.py and test_search.py files I provided.")
-            print("They now use L2 metric to match your existing collection.")
+            print(
+                f"\n✅ Set MILVUS_INDEX_TYPE={info['index_type']} and "
+                f"MILVUS_METRIC_TYPE={info['metric_type']} in your environment."
+            )
+            return
         else:
             print("Invalid choice. Exiting.")
             return
     else:
-        print("No existing collection found. Creating new one...")
-        recreate_collection_with_cosine()
+        print("✅ Collection index matches config.py")
 
     # Test the fixed collection
     test_fixed_collection()
@@ -4,7 +4,6 @@ Complete fresh start script using existing data_handler code
 """
 
 import os
-from pymilvus import connections, utility
 import config
 from data_handler import process_and_embed_pdfs
 
@@ -14,17 +13,6 @@ def completely_fresh_ingestion():
     print("=== COMPLETE FRESH START ===")
 
     try:
-        # Connect to Milvus and drop existing collection
-        print(f"Connecting to Milvus at {config.MILVUS_HOST}:{config.MILVUS_PORT}")
-        connections.connect("default", host=config.MILVUS_HOST, port=config.MILVUS_PORT)
-
-        if utility.has_collection(config.COLLECTION_NAME):
-            utility.drop_collection(config.COLLECTION_NAME)
-            print(f"Dropped collection: {config.COLLECTION_NAME}")
-
-        connections.disconnect("default")
-        print("Disconnected from Milvus")
-
         # Find PDF files
         pdf_files = [
             os.path.join(config.DATA_DIRECTORY, f)
@@ -38,8 +26,11 @@ def completely_fresh_ingestion():
 
         print(f"Found {len(pdf_files)} PDF files")
 
-        # Use the existing process_and_embed_pdfs function
-        docs_processed, chunks_ingested = process_and_embed_pdfs(pdf_files)
+        # Drops the existing collection and ignores the old manifest, also
+        # when it is unreadable or for another collection
+        docs_processed, chunks_ingested = process_and_embed_pdfs(
+            pdf_files, rebuild=True
+        )
 
         if chunks_ingested > 0:
             print(
@@ -81,6 +72,7 @@ def test_agent_functionality():
 
 def main():
     print("Starting complete fresh ingestion...")
+    print(f"Vector Backend: {config.VECTOR_BACKEND}")
     print(f"Milvus Host: {config.MILVUS_HOST}")
     print(f"Milvus Port: {config.MILVUS_PORT}")
     print(f"Collection Name: {config.COLLECTION_NAME}")
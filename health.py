@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Liveness and readiness probes.
+
+- `readiness()`: the app is ready once the shared resources are warmed up
+  (embedding model loaded, LLM client built) and the vector store answers a
+  real request. The metrics server exposes it as GET /readyz, and GET /healthz
+  as plain liveness.
+- `wait_until_ready()` / `python health.py --wait`: blocks until the vector
+  store answers, retrying with backoff. `entrypoint.sh` runs it before
+  ingestion instead of sleeping a fixed time after Milvus' /healthz turns
+  green (Milvus reports healthy before its proxy serves every request).
+"""
+
+import argparse
+import sys
+import time
+from typing import Dict, Tuple
+
+import config
+import resources
+
+
+def probe_vector_store() -> str:
+    """A real round-trip to the configured vector backend."""
+    backend = resources.get_vector_backend()
+    exists = backend.has_collection()
+    return f"{backend.name}: collection {'present' if exists else 'missing'}"
+
+
+def readiness() -> Tuple[bool, Dict[str, str]]:
+    """Whether the app can serve requests, with a status line per check."""
+    if not resources.is_warmed_up():
+        # The vector store may still be connecting; probing would wait for it
+        return False, {"resources": "warming up"}
+    checks = {"resources": "warmed up"}
+    ready = True
+    try:
+        checks["vector_store"] = probe_vector_store()
+    except Exception as e:
+        ready = False
+        checks["vector_store"] = f"unavailable: {e}"
+    return ready, checks
+
+
+def wait_until_ready(
+    timeout: float = config.READINESS_TIMEOUT_SECONDS,
+    interval: float = config.READINESS_PROBE_SECONDS,
+) -> bool:
+    """Probes the vector store until it answers or `timeout` seconds pass."""
+    deadline = time.monotonic() + timeout
+    attempt = 1
+    while True:
+        try:
+            print(f"Vector store ready ({probe_vector_store()})")
+            return True
+        except Exception as e:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                print(f"Vector store not ready after {timeout:.0f}s: {e}")
+                return False
+            delay = min(interval * 2 ** (attempt - 1), 10.0, remaining)
+            print(f"Attempt {attempt}: vector store not ready ({e}), retrying...")
+            time.sleep(delay)
+            attempt += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Readiness probes")
+    parser.add_argument(
+        "--wait", action="store_true", help="block until the vector store answers"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=config.READINESS_TIMEOUT_SECONDS
+    )
+    args = parser.parse_args()
+
+    if args.wait:
+        sys.exit(0 if wait_until_ready(timeout=args.timeout) else 1)
+    ready, checks = readiness()
+    for name, status in checks.items():
+        print(f"{name}: {status}")
+    sys.exit(0 if ready else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Persistent cache of LLM responses.
+
+The agent's LLM runs at temperature 0, so an identical formatted prompt sent
+to the same model gets the same answer. This LangChain `BaseCache` keeps the
+responses in SQLite keyed by a hash of the prompt and the model configuration,
+so repeated runs and retries skip the Groq round-trip. Entries expire after a
+TTL and the least recently used ones are evicted beyond a size limit.
+
+Hits and misses are counted per graph node; nodes run inside
+`node_context(name)`, which the lookup reads from a context variable (this
+also works across `await`).
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import warnings
+from typing import Any, Dict, Optional
+
+from langchain_core._api import LangChainBetaWarning
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+import config
+import metrics
+
+_current_node: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "llm_cache_node", default="other"
+)
+
+
+@contextlib.contextmanager
+def node_context(name: str):
+    """Attributes the LLM calls made inside the block to graph node `name`."""
+    token = _current_node.set(name)
+    try:
+        yield
+    finally:
+        _current_node.reset(token)
+
+
+def current_node() -> str:
+    """The graph node the current LLM call belongs to ("other" outside nodes)."""
+    return _current_node.get()
+
+
+def _key(prompt: str, llm_string: str) -> str:
+    return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+
+class SQLiteLLMCache(BaseCache):
+    """SQLite prompt-hash -> response cache with TTL and LRU size eviction."""
+
+    def __init__(
+        self,
+        path: str = config.LLM_CACHE_PATH,
+        ttl_seconds: float = config.LLM_CACHE_TTL_SECONDS,
+        max_entries: int = config.LLM_CACHE_SIZE,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS lru ON responses (last_used)")
+        self._db.commit()
+        # node -> [hits, misses]
+        self._stats: Dict[str, list] = {}
+
+    def _count(self, hit: bool):
+        node = current_node()
+        counts = self._stats.setdefault(node, [0, 0])
+        counts[0 if hit else 1] += 1
+        metrics.record_llm_cache(node, hit)
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = _key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                with self._db:
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is not None:
+                with self._db:
+                    self._db.execute(
+                        "UPDATE responses SET last_used = ? WHERE key = ?", (now, key)
+                    )
+            self._count(hit=row is not None)
+        if row is None:
+            return None
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", LangChainBetaWarning)
+                return loads(row[0])
+        except Exception as e:
+            print(f"Ignoring unreadable LLM cache entry: {e}")
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE):
+        value = dumps(return_val)
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                (_key(prompt, llm_string), value, now, now),
+            )
+            (count,) = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()
+            if count > self.max_entries:
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+
+    def clear(self, **kwargs: Any):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM responses")
+
+    # asyncio.to_thread copies the context, so node attribution survives
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        return await asyncio.to_thread(self.lookup, prompt, llm_string)
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE):
+        await asyncio.to_thread(self.update, prompt, llm_string, return_val)
+
+    async def aclear(self, **kwargs: Any):
+        await asyncio.to_thread(self.clear, **kwargs)
+
+    def stats(self) -> dict:
+        """Hits, misses and hit rate per graph node."""
+        with self._lock:
+            return {
+                node: {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+                }
+                for node, (hits, misses) in self._stats.items()
+            }
@@ -0,0 +1,497 @@
+"""
+In-process vector backend: no Milvus, etcd or MinIO required.
+
+Vectors live in fixed-size slots of a memory-mapped float32 file; an SQLite
+table maps each chunk id to its slot and holds the text and metadata. Search
+is exact (flat) by default: one matrix product over the mapped file. With
+`LOCAL_INDEX_TYPE = "IVF"` and enough vectors, a k-means coarse quantiser
+restricts each query to the chunks of its `nprobe` nearest lists.
+
+Other processes (e.g. `sync_data.py`) may write the same files; the in-memory
+slot bookkeeping is reloaded whenever SQLite reports a foreign commit.
+"""
+
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+import config
+import metrics
+from vector_store import VectorStore, filter_values
+
+INITIAL_CAPACITY = 1024
+# k-means training sample per list, and Lloyd iterations
+IVF_SAMPLES_PER_LIST = 64
+IVF_ITERATIONS = 10
+# Rows scored per matrix product when assigning vectors to lists
+ASSIGN_BLOCK = 16_384
+
+
+def _nearest_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    distances = (centroids**2).sum(axis=1)[None, :] - 2 * (vectors @ centroids.T)
+    return np.argmin(distances, axis=1).astype(np.int32)
+
+
+def train_kmeans(sample: np.ndarray, nlist: int, seed: int = 0) -> np.ndarray:
+    """Lloyd's k-means; empty lists are re-seeded from random samples."""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(IVF_ITERATIONS):
+        assignment = _nearest_centroids(sample, centroids)
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=nlist)
+        nonempty = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[nonempty]
+        sums = np.add.reduceat(sample[order], starts, axis=0)
+        centroids[nonempty] = sums / counts[nonempty, None]
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            centroids[empty] = sample[rng.choice(len(sample), len(empty))]
+    return centroids
+
+
+class LocalVectorStore(VectorStore):
+    """Flat (optionally IVF-indexed) float32 store in memory-mapped files."""
+
+    name = "local"
+
+    def __init__(
+        self,
+        directory: str = config.LOCAL_VECTOR_DIRECTORY,
+        collection_name: str = config.COLLECTION_NAME,
+        index_type: str = config.LOCAL_INDEX_TYPE,
+        nlist: int = config.LOCAL_IVF_NLIST,
+        nprobe: int = config.LOCAL_IVF_NPROBE,
+        ivf_min_vectors: int = config.LOCAL_IVF_MIN_VECTORS,
+    ):
+        self.directory = os.path.join(directory, collection_name)
+        self.index_type = index_type.upper()
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.ivf_min_vectors = ivf_min_vectors
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+        self.db_path = os.path.join(self.directory, "index.sqlite")
+        self.centroids_path = os.path.join(self.directory, "centroids.npy")
+
+        self._lock = threading.RLock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._data_version = None
+        self._reset_state()
+        if os.path.exists(self.db_path):
+            self._connect()
+
+    # --- Storage ---
+    def _reset_state(self):
+        self.dim: Optional[int] = None
+        self.capacity = 0
+        self._vectors: Optional[np.memmap] = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._sq_norms = np.zeros(0, dtype=np.float32)
+        self._slots: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._high_water = 0
+        self._centroids: Optional[np.ndarray] = None
+        self._lists = np.zeros(0, dtype=np.int32)
+        self._trained_on = 0
+
+    def _connect(self):
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "pk TEXT PRIMARY KEY, slot INTEGER UNIQUE NOT NULL, text TEXT NOT NULL, "
+            "source TEXT, page INTEGER)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS by_source ON chunks (source)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)"
+        )
+        self._db.commit()
+        self._reload()
+
+    def _reload(self):
+        """Rebuilds the in-memory slot bookkeeping from disk."""
+        row = self._db.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+        self._reset_state()
+        self._data_version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        if row is None:
+            return
+        self.dim = int(row[0])
+        size = (
+            os.path.getsize(self.vectors_path)
+            if os.path.exists(self.vectors_path)
+            else 0
+        )
+        self._map(max(INITIAL_CAPACITY, size // (self.dim * 4)))
+
+        for pk, slot in self._db.execute("SELECT pk, slot FROM chunks"):
+            self._slots[pk] = slot
+        if self._slots:
+            used = np.fromiter(self._slots.values(), np.int64, len(self._slots))
+            self._high_water = int(used.max()) + 1
+            self._alive[used] = True
+            self._free = np.flatnonzero(~self._alive[: self._high_water]).tolist()
+            block = np.asarray(self._vectors[: self._high_water])
+            self._sq_norms[: self._high_water] = (block**2).sum(axis=1)
+
+        if self.index_type == "IVF" and os.path.exists(self.centroids_path):
+            centroids = np.load(self.centroids_path)
+            if centroids.shape[1] == self.dim:
+                self._set_centroids(centroids)
+
+    def _refresh(self):
+        """
+        Picks up commits made by other connections (processes).
+
+        SQLite's data_version only changes for foreign commits, so our own
+        writes never trigger a reload.
+        """
+        if self._db is None:
+            if os.path.exists(self.db_path):
+                self._connect()
+            return
+        version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._data_version:
+            self._reload()
+
+    def _map(self, capacity: int):
+        """(Re)maps the vector file with room for `capacity` vectors."""
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(self.vectors_path, "ab") as f:
+            if f.tell() < capacity * self.dim * 4:
+                f.truncate(capacity * self.dim * 4)  # sparse on most filesystems
+        self._vectors = np.memmap(
+            self.vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim)
+        )
+        grow = capacity - self.capacity
+        self._alive = np.concatenate([self._alive, np.zeros(grow, dtype=bool)])
+        self._sq_norms = np.concatenate(
+            [self._sq_norms, np.zeros(grow, dtype=np.float32)]
+        )
+        self._lists = np.concatenate([self._lists, np.full(grow, -1, dtype=np.int32)])
+        self.capacity = capacity
+
+    def _begin_write(self):
+        """
+        Starts a write transaction, then catches up with other processes.
+
+        Slots are allocated from the in-memory free list and high-water mark;
+        holding SQLite's write lock from the reload until the commit means no
+        other process allocates from the same state.
+        """
+        self._db.execute("BEGIN IMMEDIATE")
+        self._refresh()
+
+    def _take_slots(self, count: int) -> List[int]:
+        """Must run after `_begin_write()`, see there."""
+        slots = self._free[:count]
+        del self._free[:count]
+        needed = count - len(slots)
+        if needed:
+            if self._high_water + needed > self.capacity:
+                self._map(max(self.capacity * 2, self._high_water + needed))
+            slots.extend(range(self._high_water, self._high_water + needed))
+            self._high_water += needed
+        return slots
+
+    # --- IVF ---
+    def _set_centroids(self, centroids: np.ndarray):
+        self._centroids = centroids.astype(np.float32)
+        self._lists[:] = -1
+        for start in range(0, self._high_water, ASSIGN_BLOCK):
+            stop = min(start + ASSIGN_BLOCK, self._high_water)
+            self._lists[start:stop] = _nearest_centroids(
+                np.asarray(self._vectors[start:stop]), self._centroids
+            )
+        self._trained_on = int(self._alive.sum())
+
+    def _maybe_train(self):
+        """Trains (or retrains, after the store doubled) the IVF quantiser."""
+        count = len(self._slots)
+        if self.index_type != "IVF" or count < self.ivf_min_vectors:
+            return
+        if self._centroids is not None and count < 2 * self._trained_on:
+            return
+        nlist = self.nlist or int(4 * np.sqrt(count))
+        live = np.flatnonzero(self._alive[: self._high_water])
+        rng = np.random.default_rng(0)
+        sample_slots = np.sort(
+            rng.choice(
+                live, min(len(live), nlist * IVF_SAMPLES_PER_LIST), replace=False
+            )
+        )
+        print(f"Training local IVF index ({nlist} lists, {count} vectors)...")
+        centroids = train_kmeans(np.asarray(self._vectors[sample_slots]), nlist)
+        np.save(self.centroids_path, centroids)
+        self._set_centroids(centroids)
+
+    # --- VectorStore API ---
+    def has_collection(self) -> bool:
+        with self._lock:
+            self._refresh()
+            return self.dim is not None
+
+    def ensure_collection(self, dim: int):
+        with self._lock:
+            self._refresh()
+            if self.dim is not None:
+                if self.dim != dim:
+                    raise ValueError(
+                        f"Collection has dimension {self.dim}, got vectors of {dim}"
+                    )
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            if self._db is None:
+                self._connect()
+            with self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO meta (name, value) VALUES ('dim', ?)",
+                    (str(dim),),
+                )
+            self._reload()
+            print(f"Created local collection: {self.directory} (dim={dim})")
+
+    def drop(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+            self._reset_state()
+            if os.path.exists(self.directory):
+                shutil.rmtree(self.directory)
+                print(f"Dropped local collection: {self.directory}")
+
+    def upsert(
+        self,
+        ids: List[str],
+        texts: List[str],
+        metadatas: List[dict],
+        vectors: np.ndarray,
+    ):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock:
+            self._refresh()
+            with self._db:
+                self._begin_write()
+                # Keys are unique per call; existing chunks are overwritten in place
+                rows = dict(zip(ids, zip(texts, metadatas, vectors)))
+                new_ids = [pk for pk in rows if pk not in self._slots]
+                for pk, slot in zip(new_ids, self._take_slots(len(new_ids))):
+                    self._slots[pk] = slot
+
+                slots = np.fromiter(
+                    (self._slots[pk] for pk in rows), np.int64, len(rows)
+                )
+                matrix = np.stack([vector for _, _, vector in rows.values()])
+                self._vectors[slots] = matrix
+                self._vectors.flush()
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO chunks (pk, slot, text, source, page) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (pk, int(slot), text, meta.get("source"), meta.get("page"))
+                        for (pk, (text, meta, _)), slot in zip(rows.items(), slots)
+                    ],
+                )
+            self._alive[slots] = True
+            self._sq_norms[slots] = (matrix**2).sum(axis=1)
+            if self._centroids is not None:
+                self._lists[slots] = _nearest_centroids(matrix, self._centroids)
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            self._refresh()
+            if self._db is None:
+                return
+            with self._db:
+                self._begin_write()
+                slots = [self._slots.pop(pk) for pk in ids if pk in self._slots]
+                if not slots:
+                    return
+                self._db.executemany(
+                    "DELETE FROM chunks WHERE pk = ?", [(pk,) for pk in ids]
+                )
+            self._alive[slots] = False
+            self._lists[slots] = -1
+            self._free.extend(slots)
+
+    def _candidate_mask(self, filters: Optional[Dict[str, Any]]) -> np.ndarray:
+        mask = self._alive[: self._high_water].copy()
+        values_by_field = filter_values(filters)
+        if values_by_field:
+            clauses, params = [], []
+            for field, values in values_by_field.items():
+                clauses.append(f"{field} IN ({','.join('?' * len(values))})")
+                params.extend(values)
+            matching = np.zeros_like(mask)
+            slots = [
+                row[0]
+                for row in self._db.execute(
+                    f"SELECT slot FROM chunks WHERE {' AND '.join(clauses)}", params
+                )
+            ]
+            matching[slots] = True
+            mask &= matching
+        return mask
+
+    def search(
+        self,
+        vectors: np.ndarray,
+        k: int,
+        with_vectors: bool = False,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[List[dict]]:
+        started = time.perf_counter()
+        queries = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        hits = self._search(queries, k, with_vectors, filters)
+        metrics.record_search(
+            self.name, len(queries), hits, time.perf_counter() - started
+        )
+        return hits
+
+    def _search(
+        self,
+        queries: np.ndarray,
+        k: int,
+        with_vectors: bool,
+        filters: Optional[Dict[str, Any]],
+    ) -> List[List[dict]]:
+        with self._lock:
+            self._refresh()
+            if self.dim is None or not self._slots:
+                return [[] for _ in queries]
+            self._maybe_train()
+            mask = self._candidate_mask(filters)
+            query_norms = (queries**2).sum(axis=1)
+
+            results = []
+            if self._centroids is None:
+                # Exact search: one product over every slot in use
+                block = np.asarray(self._vectors[: self._high_water])
+                distances = (
+                    self._sq_norms[: self._high_water, None]
+                    - 2 * (block @ queries.T)
+                    + query_norms[None, :]
+                )
+                candidates = np.flatnonzero(mask)
+                for q in range(len(queries)):
+                    results.append(self._top_k(candidates, distances[candidates, q], k))
+            else:
+                probes = np.argsort(
+                    (self._centroids**2).sum(axis=1)[None, :]
+                    - 2 * (queries @ self._centroids.T),
+                    axis=1,
+                )[:, : self.nprobe]
+                lists = self._lists[: self._high_water]
+                for q in range(len(queries)):
+                    candidates = np.flatnonzero(mask & np.isin(lists, probes[q]))
+                    block = np.asarray(self._vectors[candidates])
+                    distances = (
+                        self._sq_norms[candidates]
+                        - 2 * (block @ queries[q])
+                        + query_norms[q]
+                    )
+                    results.append(self._top_k(candidates, distances, k))
+            return self._hits(results, with_vectors)
+
+    @staticmethod
+    def _top_k(candidates: np.ndarray, distances: np.ndarray, k: int):
+        if len(candidates) > k:
+            top = np.argpartition(distances, k - 1)[:k]
+            candidates, distances = candidates[top], distances[top]
+        order = np.argsort(distances, kind="stable")
+        return candidates[order], distances[order]
+
+    def _rows_for_slots(self, slots: List[int]) -> Dict[int, tuple]:
+        rows = {}
+        for i in range(0, len(slots), 500):
+            part = slots[i : i + 500]
+            rows.update(
+                (row[0], row[1:])
+                for row in self._db.execute(
+                    "SELECT slot, pk, text, source, page FROM chunks "
+                    f"WHERE slot IN ({','.join('?' * len(part))})",
+                    part,
+                )
+            )
+        return rows
+
+    def _hit(self, slot: int, row: tuple, distance, with_vectors: bool) -> dict:
+        pk, text, source, page = row
+        hit = {"pk": pk, "text": text, "source": source, "page": page}
+        # The expanded form can round slightly below zero for exact matches
+        hit["distance"] = None if distance is None else max(float(distance), 0.0)
+        if with_vectors:
+            hit["vector"] = np.array(self._vectors[slot])
+        return hit
+
+    def _hits(self, results, with_vectors: bool) -> List[List[dict]]:
+        wanted = sorted({int(slot) for slots, _ in results for slot in slots})
+        rows = self._rows_for_slots(wanted)
+        return [
+            [
+                self._hit(int(slot), rows[int(slot)], distance, with_vectors)
+                for slot, distance in zip(slots, distances)
+            ]
+            for slots, distances in results
+        ]
+
+    def get(self, ids: List[str], with_vectors: bool = False) -> Dict[str, dict]:
+        with self._lock:
+            self._refresh()
+            slots = [self._slots[pk] for pk in ids if pk in self._slots]
+            rows = self._rows_for_slots(slots)
+            return {
+                rows[slot][0]: self._hit(slot, rows[slot], None, with_vectors)
+                for slot in slots
+            }
+
+    def iter_texts(self) -> Iterator[Tuple[str, str]]:
+        with self._lock:
+            self._refresh()
+            if self._db is None:
+                return iter(())
+            rows = self._db.execute("SELECT pk, text FROM chunks").fetchall()
+        return iter(rows)
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._slots)
+
+    def describe(self) -> dict:
+        with self._lock:
+            self._refresh()
+            info = {"backend": self.name, "collection": self.directory}
+            if self.dim is None:
+                return {**info, "exists": False}
+            ivf = self._centroids is not None
+            info.update(
+                exists=True,
+                rows=len(self._slots),
+                dim=self.dim,
+                index_type="IVF" if ivf else "FLAT",
+                configured_index_type=self.index_type,
+                metric_type="L2",
+                index_params=(
+                    {"nlist": len(self._centroids), "trained_on": self._trained_on}
+                    if ivf
+                    else {}
+                ),
+                search_params={"nprobe": self.nprobe} if ivf else {},
+                # Mapped vectors plus the in-memory norms and list assignments
+                memory_bytes=int(
+                    self._high_water * self.dim * 4
+                    + self._sq_norms.nbytes
+                    + self._lists.nbytes
+                    + (self._centroids.nbytes if ivf else 0)
+                ),
+            )
+            return info
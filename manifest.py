@@ -0,0 +1,189 @@
+"""
+Ingestion manifest: remembers what is already in the vector store.
+
+The manifest records, per source file, the SHA-256 of the file bytes and the
+primary keys of its chunks. Chunk primary keys are themselves content hashes,
+so re-ingesting a file only touches the chunks whose text (or page) changed.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, List
+
+from langchain_core.documents import Document
+
+import config
+
+MANIFEST_VERSION = 1
+
+# Serialises ingestion runs (e.g. two concurrent uploads) within a process
+ingest_lock = threading.Lock()
+
+# (path, mtime_ns, size) -> generation, see current_generation()
+_generation_cache: Dict[tuple, int] = {}
+
+
+def file_sha256(file_path: str) -> str:
+    """Hashes a file's bytes without reading it into memory at once."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def current_generation(path: str = config.MANIFEST_PATH) -> int:
+    """
+    The collection generation recorded in the manifest.
+
+    Ingestion bumps it whenever the collection changes, also from other
+    processes (e.g. `sync_data.py`). The manifest is only re-read when the
+    file changed on disk.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return 0
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    generation = _generation_cache.get(key)
+    if generation is None:
+        manifest = IngestManifest.load(path)
+        generation = manifest.generation
+        _generation_cache.clear()
+        _generation_cache[key] = generation
+    return generation
+
+
+def chunk_ids(chunks: List[Document]) -> List[str]:
+    """
+    Deterministic primary keys for a file's chunks.
+
+    The key hashes the source, page and text of the chunk; identical chunks on
+    the same page (repeated headers, etc.) get an occurrence suffix so keys
+    stay unique.
+    """
+    ids = []
+    seen: Dict[str, int] = {}
+    for chunk in chunks:
+        key = "\x00".join(
+            [
+                str(chunk.metadata.get("source", "")),
+                str(chunk.metadata.get("page", 0)),
+                chunk.page_content,
+            ]
+        )
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+        count = seen.get(digest, 0)
+        seen[digest] = count + 1
+        ids.append(digest if count == 0 else f"{digest}-{count}")
+    return ids
+
+
+class ManifestError(Exception):
+    """The manifest exists but cannot be trusted; see `IngestManifest.load`."""
+
+
+class IngestManifest:
+    """JSON manifest of ingested files, persisted next to the data directory."""
+
+    def __init__(self, path: str = config.MANIFEST_PATH):
+        self.path = path
+        self.collection = config.COLLECTION_NAME
+        self.generation = 0
+        self.files: Dict[str, dict] = {}
+        # False until a manifest file was read: the collection is unmanaged
+        self.on_disk = False
+
+    @classmethod
+    def load(
+        cls, path: str = config.MANIFEST_PATH, strict: bool = False
+    ) -> "IngestManifest":
+        """
+        Reads the manifest; a missing file gives an empty, unmanaged one.
+
+        An unreadable manifest, or one of another format version or
+        collection, also loads as empty, but with `strict` (ingestion) it
+        raises `ManifestError`: treating it as empty would drop a collection
+        whose files are simply not recorded, so only an explicit rebuild
+        (`fresh_start.py`) may replace it.
+        """
+        manifest = cls(path)
+        if not os.path.exists(path):
+            return manifest
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            if strict:
+                raise ManifestError(
+                    f"Unreadable manifest {path} ({e}); run fresh_start.py to "
+                    "rebuild the collection"
+                ) from e
+            print(f"Ignoring unreadable manifest {path}: {e}")
+            return manifest
+
+        # Generations only increase, whichever manifest they came from
+        manifest.generation = int(data.get("generation", 0))
+        # A manifest for another collection or format says nothing about ours
+        if (
+            data.get("version") != MANIFEST_VERSION
+            or data.get("collection") != manifest.collection
+        ):
+            if strict:
+                raise ManifestError(
+                    f"Manifest {path} is for collection "
+                    f"'{data.get('collection')}' (version {data.get('version')}), "
+                    f"not '{manifest.collection}' (version {MANIFEST_VERSION}); "
+                    "run fresh_start.py to rebuild the collection"
+                )
+            return manifest
+        manifest.files = data.get("files", {})
+        manifest.on_disk = True
+        return manifest
+
+    def save(self):
+        """Atomically writes the manifest."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "version": MANIFEST_VERSION,
+                    "collection": self.collection,
+                    "generation": self.generation,
+                    "files": self.files,
+                },
+                f,
+                indent=1,
+            )
+        os.replace(tmp_path, self.path)
+
+    def reset(self):
+        """Forgets every file, e.g. after the collection was dropped."""
+        self.files = {}
+        self.generation += 1
+
+    def is_unchanged(self, source: str, sha256: str) -> bool:
+        entry = self.files.get(source)
+        return entry is not None and entry.get("sha256") == sha256
+
+    def chunk_ids_for(self, source: str) -> List[str]:
+        return list(self.files.get(source, {}).get("chunks", []))
+
+    def sources(self, origin: str) -> List[str]:
+        """Sources that were ingested from the given origin ("data"/"upload")."""
+        return [
+            source
+            for source, entry in self.files.items()
+            if entry.get("origin", "data") == origin
+        ]
+
+    def record(self, source: str, sha256: str, ids: List[str], origin: str):
+        self.files[source] = {"sha256": sha256, "chunks": ids, "origin": origin}
+
+    def forget(self, source: str):
+        self.files.pop(source, None)
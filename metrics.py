@@ -0,0 +1,360 @@
+"""
+In-process metrics for the research pipeline.
+
+Graph nodes, LLM calls, embedding batches and vector searches record their
+duration and volume (tokens, chunks, cache hits) here:
+
+- process-wide counters and histograms, exported in the Prometheus text
+  format by a small HTTP server started next to the Gradio app (`serve`);
+- a `NodeSpan` for the graph node that is currently running (a context
+  variable, like `llm_cache.node_context`), whose one-line summary the agent
+  adds to the reasoning log so each request shows where its time went.
+
+Everything is in memory and resets when the process restarts.
+"""
+
+import bisect
+import contextlib
+import contextvars
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import config
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+# name -> (type, help)
+METRICS = {
+    "codemate_node_seconds": ("histogram", "Wall time of a graph node."),
+    "codemate_llm_seconds": ("histogram", "Latency of an LLM call, by graph node."),
+    "codemate_llm_tokens_total": ("counter", "LLM tokens, by node and direction."),
+    "codemate_llm_cache_total": (
+        "counter",
+        "LLM response cache lookups, by node and result.",
+    ),
+    "codemate_embedding_seconds": ("histogram", "Latency of an embedding batch."),
+    "codemate_embedding_texts_total": (
+        "counter",
+        "Texts embedded, by kind and whether the vector came from a cache.",
+    ),
+    "codemate_vector_search_seconds": (
+        "histogram",
+        "Latency of a vector search request, by backend.",
+    ),
+    "codemate_vector_search_queries_total": (
+        "counter",
+        "Query vectors sent to the vector backend.",
+    ),
+    "codemate_vector_search_chunks_total": (
+        "counter",
+        "Chunks returned by the vector backend.",
+    ),
+    "codemate_export_seconds": ("histogram", "PDF render time of a report export."),
+    "codemate_rerank_seconds": (
+        "histogram",
+        "Cross-encoder scoring time of one research run.",
+    ),
+    "codemate_rerank_pairs_total": (
+        "counter",
+        "(plan step, chunk) pairs reranked, by whether the score was cached.",
+    ),
+    "codemate_rerank_total": (
+        "counter",
+        "Rerank attempts, by outcome (reranked, timeout, error).",
+    ),
+    "codemate_prefetch_total": (
+        "counter",
+        "Speculative plan retrievals, by outcome (hit, stale, abandoned, ...).",
+    ),
+}
+
+
+class _Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    """Thread-safe labelled counters and histograms."""
+
+    def __init__(self, buckets: Tuple[float, ...] = config.METRICS_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelSet, float]] = {}
+        self._histograms: Dict[str, Dict[LabelSet, _Histogram]] = {}
+
+    @staticmethod
+    def _labels(labels: Dict[str, str]) -> LabelSet:
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def increment(self, name: str, value: float = 1, **labels: str):
+        key = self._labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: str):
+        key = self._labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(self.buckets)
+            histogram.observe(value)
+
+    def render(self) -> str:
+        """All series in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            for name in sorted(set(self._counters) | set(self._histograms)):
+                kind, help_text = METRICS.get(name, ("untyped", name))
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in sorted(self._counters.get(name, {}).items()):
+                    lines.append(f"{name}{_format_labels(labels)} {value:g}")
+                for labels, histogram in sorted(self._histograms.get(name, {}).items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        bucket_labels = labels + (("le", f"{bound:g}"),)
+                        lines.append(
+                            f"{name}_bucket{_format_labels(bucket_labels)} {cumulative}"
+                        )
+                    inf_labels = labels + (("le", "+Inf"),)
+                    lines.append(
+                        f"{name}_bucket{_format_labels(inf_labels)} {histogram.count}"
+                    )
+                    lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+                    lines.append(
+                        f"{name}_count{_format_labels(labels)} {histogram.count}"
+                    )
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: LabelSet) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+registry = MetricsRegistry()
+
+
+# --- Per-node spans ---
+@dataclass
+class NodeSpan:
+    """What one graph node spent its time on."""
+
+    node: str
+    seconds: float = 0.0
+    llm_calls: int = 0
+    llm_seconds: float = 0.0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    llm_cache_hits: int = 0
+    embedded_texts: int = 0
+    embedding_seconds: float = 0.0
+    searches: int = 0
+    search_seconds: float = 0.0
+    chunks: int = 0
+    reranked_pairs: int = 0
+    rerank_seconds: float = 0.0
+
+    def summary(self) -> str:
+        parts = []
+        if self.llm_calls:
+            cached = f", {self.llm_cache_hits} cached" if self.llm_cache_hits else ""
+            parts.append(
+                f"LLM {self.llm_seconds:.2f}s for {self.llm_calls} call(s), "
+                f"{self.input_tokens} tokens in / {self.output_tokens} out{cached}"
+            )
+        if self.embedded_texts:
+            parts.append(
+                f"embedded {self.embedded_texts} text(s) in "
+                f"{self.embedding_seconds:.2f}s"
+            )
+        if self.searches:
+            parts.append(
+                f"{self.searches} search(es) in {self.search_seconds:.2f}s "
+                f"returning {self.chunks} chunks"
+            )
+        if self.reranked_pairs:
+            parts.append(
+                f"reranked {self.reranked_pairs} pair(s) in "
+                f"{self.rerank_seconds:.2f}s"
+            )
+        details = f" ({'; '.join(parts)})" if parts else ""
+        return f"Timing: {self.node} took {self.seconds:.2f}s{details}."
+
+
+_current_span: contextvars.ContextVar[Optional[NodeSpan]] = contextvars.ContextVar(
+    "metrics_span", default=None
+)
+
+
+@contextlib.contextmanager
+def node_span(name: str) -> Iterator[NodeSpan]:
+    """Times graph node `name`; calls recorded inside the block add to its span."""
+    span = NodeSpan(name)
+    token = _current_span.set(span)
+    started = time.perf_counter()
+    try:
+        yield span
+    finally:
+        span.seconds = time.perf_counter() - started
+        _current_span.reset(token)
+        registry.observe("codemate_node_seconds", span.seconds, node=name)
+
+
+def current_span() -> Optional[NodeSpan]:
+    return _current_span.get()
+
+
+# --- Recorders, called by the instrumented code ---
+def record_llm_call(node: str, seconds: float, response):
+    """An LLM call and the token usage reported on its response message."""
+    usage = getattr(response, "usage_metadata", None) or {}
+    input_tokens = usage.get("input_tokens", 0)
+    output_tokens = usage.get("output_tokens", 0)
+    registry.observe("codemate_llm_seconds", seconds, node=node)
+    registry.increment(
+        "codemate_llm_tokens_total", input_tokens, node=node, direction="input"
+    )
+    registry.increment(
+        "codemate_llm_tokens_total", output_tokens, node=node, direction="output"
+    )
+    span = current_span()
+    if span is not None:
+        span.llm_calls += 1
+        span.llm_seconds += seconds
+        span.input_tokens += input_tokens
+        span.output_tokens += output_tokens
+
+
+def record_llm_cache(node: str, hit: bool):
+    registry.increment(
+        "codemate_llm_cache_total", node=node, result="hit" if hit else "miss"
+    )
+    span = current_span()
+    if span is not None and hit:
+        span.llm_cache_hits += 1
+
+
+def record_embedding(kind: str, texts: int, cached: int, seconds: float):
+    """An embedding batch of `texts` texts, `cached` of them served from a cache."""
+    registry.observe("codemate_embedding_seconds", seconds, kind=kind)
+    registry.increment(
+        "codemate_embedding_texts_total", cached, kind=kind, source="cache"
+    )
+    registry.increment(
+        "codemate_embedding_texts_total", texts - cached, kind=kind, source="model"
+    )
+    span = current_span()
+    if span is not None:
+        span.embedded_texts += texts
+        span.embedding_seconds += seconds
+
+
+def record_search(backend: str, queries: int, hits: List[List[dict]], seconds: float):
+    chunks = sum(len(query_hits) for query_hits in hits)
+    registry.observe("codemate_vector_search_seconds", seconds, backend=backend)
+    registry.increment("codemate_vector_search_queries_total", queries, backend=backend)
+    registry.increment("codemate_vector_search_chunks_total", chunks, backend=backend)
+    span = current_span()
+    if span is not None:
+        span.searches += 1
+        span.search_seconds += seconds
+        span.chunks += chunks
+
+
+def record_export(seconds: float):
+    """A PDF render (cached PDFs are not rendered again)."""
+    registry.observe("codemate_export_seconds", seconds)
+
+
+def record_rerank(pairs: int, cached: int, scored: int, seconds: float):
+    """A cross-encoder pass over `pairs` pairs (`cached` + `scored` have scores)."""
+    registry.observe("codemate_rerank_seconds", seconds)
+    registry.increment("codemate_rerank_pairs_total", cached, source="cache")
+    registry.increment("codemate_rerank_pairs_total", scored, source="model")
+    span = current_span()
+    if span is not None:
+        # Only pairs that got a score (none when the model failed)
+        span.reranked_pairs += cached + scored
+        span.rerank_seconds += seconds
+
+
+def record_rerank_result(result: str):
+    registry.increment("codemate_rerank_total", result=result)
+
+
+def record_prefetch(result: str):
+    """What became of a speculative plan retrieval (see prefetch.py)."""
+    registry.increment("codemate_prefetch_total", result=result)
+
+
+# --- Prometheus endpoint ---
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            self._reply(200, registry.render(), "text/plain; version=0.0.4")
+        elif path == "/healthz":
+            self._reply(200, "ok\n")
+        elif path == "/readyz" and self.server.ready is not None:
+            ready, checks = self.server.ready()
+            body = "".join(f"{name}: {status}\n" for name, status in checks.items())
+            self._reply(200 if ready else 503, body)
+        else:
+            self.send_error(404)
+
+    def _reply(self, status: int, text: str, content_type: str = "text/plain"):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would flood the app's output
+        pass
+
+
+def serve(
+    host: str = config.METRICS_HOST,
+    port: int = config.METRICS_PORT,
+    ready: Optional[Callable[[], Tuple[bool, Dict[str, str]]]] = None,
+) -> Optional[ThreadingHTTPServer]:
+    """
+    Serves GET /metrics and /healthz from a daemon thread; port 0 disables it.
+
+    With `ready` (see health.readiness), GET /readyz answers 200 or 503.
+    """
+    if not port:
+        return None
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    # Read by the handler: returns (ready, {check: status})
+    server.ready = ready
+    threading.Thread(
+        target=server.serve_forever, name="metrics-server", daemon=True
+    ).start()
+    print(f"Serving Prometheus metrics on http://{host}:{port}/metrics")
+    return server
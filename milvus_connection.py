@@ -0,0 +1,227 @@
+"""
+Long-lived, health-checked Milvus connections shared by the whole process.
+
+Every pymilvus client owns a gRPC channel registered under a connection alias.
+Opening one per operation repeats the handshake, and a script disconnecting
+the shared alias pulled the channel out from under the agent. `MilvusConnections`
+keeps a small pool of clients under aliases of its own, pings a client that
+has been idle before handing it out, and reconnects with exponential backoff
+when a call fails with a connection error. Collections are loaded once per
+process instead of before every operation.
+
+Async clients are kept per event loop, since a gRPC aio channel only works on
+the loop it was created on.
+"""
+
+import asyncio
+import itertools
+import random
+import threading
+import time
+import weakref
+from typing import Awaitable, Callable, List, Set, TypeVar
+
+import grpc
+from pymilvus import AsyncMilvusClient, MilvusClient, connections
+from pymilvus.client.types import LoadState, Status
+from pymilvus.exceptions import (
+    ConnectError,
+    ConnectionNotExistException,
+    MilvusException,
+    MilvusUnavailableException,
+)
+
+import config
+
+T = TypeVar("T")
+
+# Longest wait between two reconnect attempts
+MAX_BACKOFF_SECONDS = 8.0
+
+
+def is_connection_error(error: BaseException) -> bool:
+    """Whether an error means the channel is gone (as opposed to a bad request)."""
+    if isinstance(
+        error, (ConnectError, ConnectionNotExistException, MilvusUnavailableException)
+    ):
+        return True
+    if isinstance(error, grpc.RpcError):
+        return error.code() == grpc.StatusCode.UNAVAILABLE
+    # pymilvus re-raises exhausted gRPC retries with the gRPC status as code
+    return isinstance(error, MilvusException) and error.code in (
+        Status.CONNECT_FAILED,
+        grpc.StatusCode.UNAVAILABLE,
+    )
+
+
+def _backoff(attempt: int) -> float:
+    delay = config.MILVUS_RECONNECT_BACKOFF_SECONDS * 2**attempt
+    # Jitter keeps several workers from reconnecting in lockstep
+    return min(delay, MAX_BACKOFF_SECONDS) * random.uniform(0.5, 1.0)
+
+
+def _remove_connection(alias: str):
+    try:
+        connections.remove_connection(alias)
+    except Exception:
+        pass
+
+
+class _PooledClient:
+    def __init__(self, name: str):
+        self.name = name
+        self.client = None
+        # Closes the current client's channel; see MilvusConnections._connect
+        self.release = None
+        self.checked = 0.0
+        # Held while (re)connecting, so one slot's backoff does not block others
+        self.lock = threading.Lock()
+
+
+class MilvusConnections:
+    """A pool of Milvus clients with health checks and backoff reconnects."""
+
+    def __init__(
+        self,
+        uri: str = f"http://{config.MILVUS_HOST}:{config.MILVUS_PORT}",
+        pool_size: int = config.MILVUS_POOL_SIZE,
+        health_check_seconds: float = config.MILVUS_HEALTH_CHECK_SECONDS,
+        attempts: int = config.MILVUS_RECONNECT_ATTEMPTS,
+    ):
+        self.uri = uri
+        self.health_check_seconds = health_check_seconds
+        self.attempts = max(1, attempts)
+        self._lock = threading.Lock()
+        self._pool: List[_PooledClient] = [
+            _PooledClient(f"codemate-{i}") for i in range(max(1, pool_size))
+        ]
+        self._next = itertools.count()
+        self._async_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        # Aliases must never repeat: pymilvus reuses a registered alias' channel
+        self._client_ids = itertools.count()
+        self._async_ids = itertools.count()
+        self._loaded: Set[str] = set()
+
+    # --- Sync clients ---
+    def _connect(self, slot: _PooledClient):
+        """
+        (Re)opens a slot's client, backing off between failed attempts.
+
+        The new client is swapped in; the old one is not closed here, as other
+        threads may be in the middle of a call on it. Its channel is closed
+        once the last reference to it is dropped.
+        """
+        for attempt in range(self.attempts):
+            try:
+                alias = f"{slot.name}-{next(self._client_ids)}-{self.uri}"
+                client = MilvusClient(uri=self.uri, alias=alias)
+                slot.release = weakref.finalize(client, _remove_connection, alias)
+                slot.client = client
+                slot.checked = time.monotonic()
+                return
+            except Exception as e:
+                if not is_connection_error(e) or attempt == self.attempts - 1:
+                    raise
+                delay = _backoff(attempt)
+                print(f"Milvus unavailable ({e}); reconnecting in {delay:.1f}s")
+                time.sleep(delay)
+
+    def client(self) -> MilvusClient:
+        """A healthy client from the pool (round-robin)."""
+        slot = self._pool[next(self._next) % len(self._pool)]
+        with slot.lock:
+            if slot.client is None:
+                self._connect(slot)
+            elif time.monotonic() - slot.checked > self.health_check_seconds:
+                try:
+                    slot.client.get_server_version(timeout=5)
+                    slot.checked = time.monotonic()
+                except Exception as e:
+                    print(f"Milvus health check failed ({e}); reconnecting")
+                    self._connect(slot)
+            return slot.client
+
+    def _reset(self, client: MilvusClient):
+        """Marks a client as suspect so its next checkout health-checks it."""
+        for slot in self._pool:
+            if slot.client is client:
+                slot.checked = 0.0
+
+    def run(self, operation: Callable[[MilvusClient], T]) -> T:
+        """
+        Runs `operation(client)`, retrying on a fresh connection if the
+        channel dropped. Only use it for idempotent operations.
+        """
+        for attempt in range(self.attempts):
+            client = self.client()
+            try:
+                return operation(client)
+            except Exception as e:
+                if not is_connection_error(e) or attempt == self.attempts - 1:
+                    raise
+                self._reset(client)
+                time.sleep(_backoff(attempt))
+
+    # --- Async clients ---
+    def async_client(self) -> AsyncMilvusClient:
+        """The async client for the running event loop."""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            with self._lock:
+                client = self._async_clients.get(loop)
+                if client is None:
+                    client = AsyncMilvusClient(
+                        uri=self.uri,
+                        alias=f"codemate-async-{next(self._async_ids)}-{self.uri}",
+                    )
+                    self._async_clients[loop] = client
+        return client
+
+    async def arun(self, operation: Callable[[AsyncMilvusClient], Awaitable[T]]) -> T:
+        """Async variant of `run()` on the running loop's client."""
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.attempts):
+            client = self.async_client()
+            try:
+                return await operation(client)
+            except Exception as e:
+                if not is_connection_error(e) or attempt == self.attempts - 1:
+                    raise
+                with self._lock:
+                    if self._async_clients.get(loop) is client:
+                        del self._async_clients[loop]
+                try:
+                    await client.close()
+                except Exception:
+                    pass
+                await asyncio.sleep(_backoff(attempt))
+
+    # --- Collections ---
+    def is_loaded(self, collection_name: str) -> bool:
+        return collection_name in self._loaded
+
+    def ensure_loaded(self, collection_name: str):
+        """Loads the collection into query nodes, once per process."""
+        if collection_name in self._loaded:
+            return
+
+        def _load(client: MilvusClient):
+            state = client.get_load_state(collection_name).get("state")
+            if state != LoadState.Loaded:
+                client.load_collection(collection_name)
+
+        self.run(_load)
+        self._loaded.add(collection_name)
+
+    def forget_loaded(self, collection_name: str):
+        """Called when a collection is dropped, so a new one gets loaded."""
+        self._loaded.discard(collection_name)
+
+    def close(self):
+        for slot in self._pool:
+            with slot.lock:
+                if slot.release is not None:
+                    slot.release()
+                slot.client = None
+                slot.release = None
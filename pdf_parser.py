@@ -0,0 +1,148 @@
+"""
+Parallel PDF parsing stage used by the ingestion pipeline.
+
+This module is deliberately lightweight (pypdf + the text splitter only) so
+that process-pool workers do not have to import the embedding model or the
+Milvus client when they start.
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from pypdf import PdfReader
+
+import config
+
+# A parse task covers the pages [start, stop) of a single file.
+ParseTask = Tuple[str, int, int]
+
+
+def _clean_page_number(page) -> int:
+    """Normalise the page metadata to an integer."""
+    if isinstance(page, str):
+        try:
+            return int(page)
+        except (ValueError, TypeError):
+            return 0
+    return int(page) if page is not None else 0
+
+
+def split_pages(file_path: str, docs: List[Document]) -> List[Document]:
+    """Splits page documents into chunks with clean `source`/`page` metadata."""
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=config.CHUNK_SIZE, chunk_overlap=config.CHUNK_OVERLAP
+    )
+    chunks = text_splitter.split_documents(docs)
+
+    # Completely replace metadata with only what we need
+    for chunk in chunks:
+        chunk.metadata = {
+            "source": os.path.basename(file_path),
+            "page": _clean_page_number(chunk.metadata.get("page", 0)),
+        }
+    return chunks
+
+
+def _parse_task(task: ParseTask) -> Tuple[List[Document], str]:
+    """
+    Worker: loads and splits one page range of a PDF.
+
+    Returns the chunks and an error message (empty on success). Errors are
+    returned instead of raised so one bad file never takes down the pool.
+    """
+    file_path, start, stop = task
+    try:
+        reader = PdfReader(file_path)
+        docs = []
+        for page_number in range(start, stop):
+            # Same extraction PyPDFLoader uses in its default "plain" mode
+            text = reader.pages[page_number].extract_text(extraction_mode="plain")
+            docs.append(
+                Document(
+                    page_content=text.strip(),
+                    metadata={"source": file_path, "page": page_number},
+                )
+            )
+        return split_pages(file_path, docs), ""
+    except Exception as e:
+        return [], str(e)
+
+
+def _plan_tasks(file_paths: List[str]) -> List[ParseTask]:
+    """Turns files into parse tasks, splitting large files into page ranges."""
+    pages_per_task = max(1, config.PARSE_PAGES_PER_TASK)
+    tasks = []
+    for file_path in file_paths:
+        try:
+            num_pages = len(PdfReader(file_path).pages)
+        except Exception as e:
+            print(f"Error processing file {file_path}: {e}")
+            continue
+        if num_pages == 0:
+            print(f"No documents loaded from {file_path}")
+            continue
+        for start in range(0, num_pages, pages_per_task):
+            tasks.append((file_path, start, min(start + pages_per_task, num_pages)))
+    return tasks
+
+
+def iter_split_pdfs(
+    file_paths: List[str],
+) -> Iterator[Tuple[str, Optional[List[Document]], bool]]:
+    """
+    Streams the chunks of a list of PDFs, parsed in parallel.
+
+    Yields `(file_path, chunks, is_last)` per page range, in file and page
+    order, so the output is identical to parsing the files one by one. Only a
+    bounded window of page ranges is in flight, which keeps memory flat however
+    many files there are. A file that fails to parse yields a final
+    `(file_path, None, True)` and none of its remaining ranges.
+    """
+    file_paths = list(dict.fromkeys(file_paths))
+    tasks = _plan_tasks(file_paths)
+    workers = min(max(1, config.PARSE_WORKERS), len(tasks))
+    last_task = {file_path: i for i, (file_path, _, _) in enumerate(tasks)}
+    failed = set()
+    chunk_counts: Dict[str, int] = {}
+
+    def _emit(i: int, chunks: List[Document], error: str):
+        file_path = tasks[i][0]
+        if file_path in failed:
+            return
+        if error:
+            print(f"Error processing file {file_path}: {error}")
+            failed.add(file_path)
+            yield file_path, None, True
+            return
+        is_last = last_task[file_path] == i
+        chunk_counts[file_path] = chunk_counts.get(file_path, 0) + len(chunks)
+        if is_last:
+            print(
+                f"Loaded and split '{file_path}' into {chunk_counts[file_path]} chunks."
+            )
+        yield file_path, chunks, is_last
+
+    if workers <= 1:
+        for i, task in enumerate(tasks):
+            yield from _emit(i, *_parse_task(task))
+        return
+
+    print(f"Parsing {len(tasks)} page range(s) with {workers} worker(s)")
+    window = workers * 2
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        next_task = 0
+        while pending or next_task < len(tasks):
+            # Keep a bounded number of ranges in flight; results are consumed
+            # in submission order so chunk order never depends on timing.
+            while next_task < len(tasks) and len(pending) < window:
+                pending.append(
+                    (next_task, executor.submit(_parse_task, tasks[next_task]))
+                )
+                next_task += 1
+            i, future = pending.popleft()
+            yield from _emit(i, *future.result())
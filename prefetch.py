@@ -0,0 +1,193 @@
+"""
+Speculative retrieval while the user reviews the research plan.
+
+The graph pauses after the planner until the user clicks "Execute Plan", but
+the plan is known as soon as it is shown. The app starts the plan's searches
+(embedding, vector search, keyword fusion) in the background right away, and
+the researcher node takes the result instead of searching again, so retrieval
+no longer adds to the wait after the click.
+
+A prefetch is only used for the exact plan it was started for and while the
+collection generation is unchanged (see manifest.py); otherwise it is
+discarded and the researcher searches as before. Prefetches of abandoned
+sessions are cancelled: when the same browser session starts a new research,
+when it disconnects, or when the plan is not executed within the TTL (a
+timer on the event loop, so an idle app does not keep them either).
+"""
+
+import asyncio
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+import config
+import metrics
+from manifest import current_generation
+from retrieval import PlanContext
+
+
+class _Prefetch(NamedTuple):
+    plan: tuple
+    generation: int
+    owner: Optional[str]
+    task: asyncio.Task
+    started: float
+
+
+def _cancel(task: asyncio.Task):
+    """Cancels `task` from any thread."""
+    if task.done():
+        return
+    try:
+        task.get_loop().call_soon_threadsafe(task.cancel)
+    except RuntimeError:
+        # The loop is closed, so the task will never run again
+        pass
+
+
+def _log_failure(task: asyncio.Task):
+    # Retrieves the exception so asyncio does not warn about it
+    if not task.cancelled() and task.exception() is not None:
+        print(f"--- Retrieval prefetch failed: {task.exception()} ---")
+
+
+class RetrievalPrefetcher:
+    """Background plan searches keyed by session (LangGraph thread) id."""
+
+    def __init__(
+        self,
+        ttl_seconds: float = config.PREFETCH_TTL_SECONDS,
+        max_sessions: int = config.PREFETCH_MAX_SESSIONS,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._entries: Dict[str, _Prefetch] = {}
+
+    def start(
+        self,
+        session_id: str,
+        plan: List[str],
+        search: Callable[[List[str]], Awaitable[PlanContext]],
+        generation: int,
+        owner: Optional[str] = None,
+    ):
+        """
+        Runs `search(plan)` as a task on the running event loop.
+
+        `generation` is the collection generation the plan is searched
+        against; callers on the event loop read it in a worker thread, since
+        `current_generation()` may parse the manifest. `owner` identifies the browser session: its earlier prefetches are
+        cancelled, as that session has moved on to a new research.
+        """
+        if owner is not None:
+            self.cancel_owner(owner)
+        loop = asyncio.get_running_loop()
+        task = loop.create_task(search(list(plan)))
+        task.add_done_callback(_log_failure)
+        entry = _Prefetch(tuple(plan), generation, owner, task, time.monotonic())
+        with self._lock:
+            previous = self._entries.pop(session_id, None)
+            self._entries[session_id] = entry
+        if previous is not None:
+            _cancel(previous.task)
+        loop.call_later(self.ttl_seconds, self._expire, session_id, entry)
+        self.prune()
+
+    def _expire(self, session_id: str, entry: _Prefetch):
+        """TTL timer: cancels `entry` unless it was taken or replaced since."""
+        with self._lock:
+            if self._entries.get(session_id) is not entry:
+                return
+            del self._entries[session_id]
+        _cancel(entry.task)
+        metrics.record_prefetch("abandoned")
+
+    def _take(
+        self, session_id: str, plan: List[str], generation: int
+    ) -> Optional[asyncio.Task]:
+        """Removes the session's prefetch; returns its task if still valid."""
+        self.prune()
+        with self._lock:
+            entry = self._entries.pop(session_id, None)
+        if entry is None:
+            return None
+        if entry.plan != tuple(plan) or entry.generation != generation:
+            _cancel(entry.task)
+            metrics.record_prefetch("stale")
+            return None
+        return entry.task
+
+    async def aresult(self, session_id: str, plan: List[str]) -> Optional[PlanContext]:
+        """The prefetched context for `plan`, awaiting it if still running."""
+        # May parse the manifest, so not on the event loop
+        generation = await asyncio.to_thread(current_generation)
+        task = self._take(session_id, plan, generation)
+        if task is None:
+            return None
+        if not task.done() and task.get_loop() is not asyncio.get_running_loop():
+            # Started on another event loop; it cannot be awaited here
+            _cancel(task)
+            metrics.record_prefetch("stale")
+            return None
+        try:
+            context = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.cancelled():
+                # This caller was cancelled, not the prefetch
+                raise
+            metrics.record_prefetch("cancelled")
+            return None
+        except Exception:
+            metrics.record_prefetch("failed")
+            return None
+        metrics.record_prefetch("hit")
+        return context
+
+    def result(self, session_id: str, plan: List[str]) -> Optional[PlanContext]:
+        """Sync variant of `aresult`: only a finished prefetch is used."""
+        task = self._take(session_id, plan, current_generation())
+        if task is None:
+            return None
+        if not task.done():
+            _cancel(task)
+            metrics.record_prefetch("pending")
+            return None
+        if task.cancelled() or task.exception() is not None:
+            metrics.record_prefetch("failed")
+            return None
+        metrics.record_prefetch("hit")
+        return task.result()
+
+    def cancel(self, session_id: str):
+        with self._lock:
+            entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            _cancel(entry.task)
+            metrics.record_prefetch("abandoned")
+
+    def cancel_owner(self, owner: str):
+        """Cancels every prefetch started by browser session `owner`."""
+        self.prune()
+        with self._lock:
+            session_ids = [
+                session_id
+                for session_id, entry in self._entries.items()
+                if entry.owner == owner
+            ]
+        for session_id in session_ids:
+            self.cancel(session_id)
+
+    def prune(self):
+        """Cancels prefetches older than the TTL and the oldest beyond the cap."""
+        cutoff = time.monotonic() - self.ttl_seconds
+        with self._lock:
+            by_age = sorted(self._entries, key=lambda key: self._entries[key].started)
+            excess = max(0, len(by_age) - self.max_sessions)
+            expired = [
+                session_id
+                for i, session_id in enumerate(by_age)
+                if i < excess or self._entries[session_id].started < cutoff
+            ]
+        for session_id in expired:
+            self.cancel(session_id)
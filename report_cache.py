@@ -0,0 +1,167 @@
+"""
+Semantic cache of finished research reports.
+
+Users often ask near-identical questions against the same corpus. A report is
+stored with the embedding of its task, the collection generation it was
+researched against and the LLM that wrote it; a new task whose embedding is
+within the cosine-similarity threshold of a cached one gets the cached plan
+and report instead of another planner/search/draft/revise round.
+
+Entries persist in SQLite; the vectors of the live entries are kept in memory
+as one normalised float32 matrix, so a lookup is a single matrix-vector product.
+Entries from older generations never match and are deleted when ingestion
+changes the collection.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+
+import config
+
+
+class CachedReport(NamedTuple):
+    task: str
+    plan: List[str]
+    report: str
+    reasoning_log: List[str]
+    similarity: float
+
+
+def _normalize(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class ReportCache:
+    """Cosine-similarity lookup of reports for one LLM/embedding model pair."""
+
+    def __init__(
+        self,
+        path: str = config.REPORT_CACHE_PATH,
+        max_entries: int = config.REPORT_CACHE_SIZE,
+        threshold: float = config.REPORT_CACHE_THRESHOLD,
+    ):
+        self.model_key = f"{config.LLM_MODEL}|{config.EMBEDDING_MODEL}"
+        self.max_entries = max_entries
+        self.threshold = threshold
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS reports ("
+            "id INTEGER PRIMARY KEY, model TEXT NOT NULL, generation INTEGER NOT NULL, "
+            "task TEXT NOT NULL, vector BLOB NOT NULL, plan TEXT NOT NULL, "
+            "report TEXT NOT NULL, reasoning_log TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.commit()
+
+        # In-memory matrix of the entries matching (model, generation)
+        self._generation: Optional[int] = None
+        self._ids: List[int] = []
+        self._vectors: Optional[np.ndarray] = None
+
+    def _load(self, generation: int):
+        rows = self._db.execute(
+            "SELECT id, vector FROM reports WHERE model = ? AND generation = ?",
+            (self.model_key, generation),
+        ).fetchall()
+        self._generation = generation
+        self._ids = [row[0] for row in rows]
+        self._vectors = (
+            np.stack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+            if rows
+            else None
+        )
+
+    def lookup(self, vector, generation: int) -> Optional[CachedReport]:
+        """Returns the most similar cached report above the threshold, if any."""
+        query = _normalize(vector)
+        with self._lock:
+            if self._generation != generation:
+                self._load(generation)
+            if self._vectors is None or self._vectors.shape[1] != query.shape[0]:
+                return None
+            similarities = self._vectors @ query
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self.threshold:
+                return None
+
+            report_id = self._ids[best]
+            row = self._db.execute(
+                "SELECT task, plan, report, reasoning_log FROM reports WHERE id = ?",
+                (report_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            with self._db:
+                self._db.execute(
+                    "UPDATE reports SET last_used = ? WHERE id = ?",
+                    (time.time(), report_id),
+                )
+        task, plan, report, reasoning_log = row
+        return CachedReport(
+            task, json.loads(plan), report, json.loads(reasoning_log), similarity
+        )
+
+    def store(
+        self,
+        task: str,
+        vector,
+        generation: int,
+        plan: List[str],
+        report: str,
+        reasoning_log: List[str],
+    ):
+        """Adds a finished report, evicting the least recently used beyond the limit."""
+        if self.max_entries <= 0:
+            return
+        vector = _normalize(vector)
+        with self._lock:
+            with self._db:
+                self._db.execute(
+                    "INSERT INTO reports (model, generation, task, vector, plan, "
+                    "report, reasoning_log, last_used) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        self.model_key,
+                        generation,
+                        task,
+                        vector.tobytes(),
+                        json.dumps(plan),
+                        report,
+                        json.dumps(reasoning_log),
+                        time.time(),
+                    ),
+                )
+                self._db.execute(
+                    "DELETE FROM reports WHERE id NOT IN "
+                    "(SELECT id FROM reports ORDER BY last_used DESC LIMIT ?)",
+                    (self.max_entries,),
+                )
+            self._load(generation)
+
+    def invalidate(self, generation: int):
+        """Drops every report researched against another collection generation."""
+        with self._lock:
+            with self._db:
+                deleted = self._db.execute(
+                    "DELETE FROM reports WHERE generation != ?", (generation,)
+                ).rowcount
+            self._load(generation)
+        if deleted:
+            print(f"Invalidated {deleted} cached report(s)")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM reports").fetchone()[0]
@@ -0,0 +1,200 @@
+"""
+Cross-encoder reranking of the candidates of a whole research plan.
+
+Vector distance is a coarse relevance signal. Plan retrieval therefore
+over-fetches `RERANK_FETCH_K` candidates per step, and a local ONNX
+cross-encoder (fastembed's `TextCrossEncoder`) scores every (plan step,
+candidate) pair of the research run in one batched pass before pooling
+(see retrieval.py):
+
+- pairs are deduplicated and looked up in an in-memory LRU keyed by the hash
+  of (model, step, chunk text), so repeated steps and chunks are scored once;
+- the remaining pairs are sorted by length, so each batch pads to similar
+  lengths, and scored in batches of `RERANK_BATCH_SIZE`;
+- the budget (`RERANK_BUDGET_SECONDS`) covers inference, not loading the
+  model. Before each batch the time left is compared with the previous
+  batch's duration; when the batch would not fit, or the model cannot be
+  loaded, the steps keep their vector order. The pairs scored so far are
+  still cached, so the next attempt is cheaper.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import config
+import metrics
+from embedding_cache import normalize_text
+
+
+def pair_key(model_name: str, query: str, text: str) -> str:
+    payload = f"{model_name}\x00{normalize_text(query)}\x00{normalize_text(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RerankTimeout(Exception):
+    """Scoring did not finish within the latency budget."""
+
+
+class CrossEncoderReranker:
+    """Batched, cached cross-encoder scoring with a latency budget."""
+
+    def __init__(
+        self,
+        model_name: str = config.RERANK_MODEL,
+        batch_size: int = config.RERANK_BATCH_SIZE,
+        cache_size: int = config.RERANK_CACHE_SIZE,
+        budget_seconds: float = config.RERANK_BUDGET_SECONDS,
+        model=None,
+    ):
+        """`model` replaces the fastembed cross-encoder, e.g. in benchmarks."""
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self.cache_size = cache_size
+        self.budget_seconds = budget_seconds
+        self._model = model
+        self._model_error: Optional[Exception] = None
+        # Separate locks: lookups in the score cache never wait for a load
+        self._load_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._scores: "OrderedDict[str, float]" = OrderedDict()
+
+    def load(self):
+        """Loads the ONNX model (downloading it on first use)."""
+        if self._model is not None:
+            return self._model
+        if self._model_error is not None:
+            raise self._model_error
+        with self._load_lock:
+            if self._model is None:
+                try:
+                    # Imported here: fastembed pulls in onnxruntime
+                    from fastembed.rerank.cross_encoder import TextCrossEncoder
+
+                    self._model = TextCrossEncoder(model_name=self.model_name)
+                    print(f"Initialized cross-encoder: {self.model_name}")
+                except Exception as e:
+                    # Not retried for every research run; restart to try again
+                    self._model_error = e
+                    raise
+        return self._model
+
+    def _cached(self, keys: Sequence[str]) -> Dict[str, float]:
+        with self._lock:
+            found = {}
+            for key in keys:
+                score = self._scores.get(key)
+                if score is not None:
+                    self._scores.move_to_end(key)
+                    found[key] = score
+            return found
+
+    def _store(self, keys: Sequence[str], scores: Sequence[float]):
+        if self.cache_size <= 0:
+            return
+        with self._lock:
+            for key, score in zip(keys, scores):
+                self._scores[key] = float(score)
+                self._scores.move_to_end(key)
+            while len(self._scores) > self.cache_size:
+                self._scores.popitem(last=False)
+
+    def score_pairs(
+        self, pairs: Sequence[Tuple[str, str]], budget_seconds: Optional[float] = None
+    ) -> np.ndarray:
+        """
+        Relevance logits of (query, text) pairs, in input order.
+
+        Raises `RerankTimeout` when the budget runs out before every pair is
+        scored; scores computed until then are cached.
+        """
+        started = time.perf_counter()
+        budget = self.budget_seconds if budget_seconds is None else budget_seconds
+        keys = [pair_key(self.model_name, query, text) for query, text in pairs]
+        scores = self._cached(keys)
+        cached = sum(1 for key in keys if key in scores)
+
+        # One entry per distinct uncached pair, shortest first
+        missing: Dict[str, Tuple[str, str]] = {}
+        for key, pair in zip(keys, pairs):
+            if key not in scores:
+                missing.setdefault(key, pair)
+        order = sorted(missing, key=lambda key: sum(map(len, missing[key])))
+        try:
+            if order:
+                model = self.load()
+            # The clock starts once the model is loaded
+            deadline = time.perf_counter() + budget if budget and budget > 0 else None
+            batch_seconds = 0.0
+            for start in range(0, len(order), self.batch_size):
+                if deadline is not None:
+                    # Skip a batch that would overrun: batches are sorted
+                    # shortest first, so it likely takes as long as the last
+                    if time.perf_counter() + batch_seconds > deadline:
+                        raise RerankTimeout(
+                            f"{len(order) - start} of {len(keys)} pairs unscored "
+                            f"within {budget:.2f}s"
+                        )
+                batch = order[start : start + self.batch_size]
+                batch_started = time.perf_counter()
+                batch_scores = list(
+                    model.rerank_pairs(
+                        [missing[key] for key in batch], batch_size=len(batch)
+                    )
+                )
+                batch_seconds = time.perf_counter() - batch_started
+                self._store(batch, batch_scores)
+                scores.update(zip(batch, batch_scores))
+        finally:
+            metrics.record_rerank(
+                len(keys), cached, len(scores) - cached, time.perf_counter() - started
+            )
+        return np.asarray([scores[key] for key in keys], dtype=np.float32)
+
+    def rerank(
+        self,
+        queries: List[str],
+        hits_per_step: List[List[dict]],
+        budget_seconds: Optional[float] = None,
+    ) -> Optional[Tuple[List[List[dict]], Dict[str, float]]]:
+        """
+        Reorders each step's hits by cross-encoder score.
+
+        Returns the reordered hits and each chunk's relevance (its best score
+        over the steps, squashed to 0..1 so it is on the scale of a cosine),
+        or None when the steps should keep their vector order.
+        """
+        pairs = [
+            (query, hit["text"])
+            for query, hits in zip(queries, hits_per_step)
+            for hit in hits
+        ]
+        if not pairs:
+            return None
+        try:
+            logits = self.score_pairs(pairs, budget_seconds)
+        except RerankTimeout as e:
+            print(f"--- Reranking over budget ({e}), keeping vector order ---")
+            metrics.record_rerank_result("timeout")
+            return None
+        except Exception as e:
+            print(f"--- Reranking failed ({e}), keeping vector order ---")
+            metrics.record_rerank_result("error")
+            return None
+
+        probabilities = 1.0 / (1.0 + np.exp(-logits))
+        reranked, relevance = [], {}
+        offset = 0
+        for hits in hits_per_step:
+            step_scores = probabilities[offset : offset + len(hits)]
+            offset += len(hits)
+            order = np.argsort(-step_scores, kind="stable")
+            reranked.append([hits[i] for i in order])
+            for hit, score in zip(hits, step_scores):
+                relevance[hit["pk"]] = max(relevance.get(hit["pk"], 0.0), float(score))
+        metrics.record_rerank_result("reranked")
+        return reranked, relevance
@@ -0,0 +1,274 @@
+"""
+Process-wide registry of shared, lazily initialised resources.
+
+The ONNX embedding model, the vector store backend and the caches are
+expensive to create, so the app, the agent and the ingestion scripts all get
+them from here instead of constructing their own. `warm_up()` loads everything
+once at startup.
+"""
+
+import threading
+from typing import TYPE_CHECKING, Dict
+
+import config
+
+# Heavy clients are imported where they are first constructed, so importing
+# the registry (and the agent) stays cheap; see benchmarks/startup_benchmark.py
+if TYPE_CHECKING:
+    from pymilvus import AsyncMilvusClient, MilvusClient
+
+    from milvus_connection import MilvusConnections
+
+# Guards the lock table and set_resources(). Each resource is built under its
+# own lock, so a slow one (e.g. the ONNX model during warm-up) never blocks
+# callers of the others.
+_lock = threading.RLock()
+_resource_locks: Dict[str, threading.RLock] = {}
+_embedding_model = None
+_milvus_connections = None
+_vector_backend = None
+_report_cache = None
+_llm_cache = None
+_llm = None
+_checkpointer = None
+_export_jobs = None
+_sparse_index = None
+_prefetcher = None
+_reranker = None
+_warmed_up = False
+
+
+def _resource_lock(name: str) -> threading.RLock:
+    with _lock:
+        return _resource_locks.setdefault(name, threading.RLock())
+
+
+def get_embedding_model():
+    """Returns the shared FastEmbedEmbeddings instance."""
+    global _embedding_model
+    if _embedding_model is None:
+        with _resource_lock("embedding_model"):
+            if _embedding_model is None:
+                # Imported here: data_handler itself uses this registry
+                from data_handler import FastEmbedEmbeddings
+
+                _embedding_model = FastEmbedEmbeddings(
+                    model_name=config.EMBEDDING_MODEL
+                )
+    return _embedding_model
+
+
+def get_milvus_connections() -> "MilvusConnections":
+    """Returns the process-wide Milvus connection pool."""
+    global _milvus_connections
+    if _milvus_connections is None:
+        with _resource_lock("milvus_connections"):
+            if _milvus_connections is None:
+                from milvus_connection import MilvusConnections
+
+                _milvus_connections = MilvusConnections()
+    return _milvus_connections
+
+
+def get_milvus_client() -> "MilvusClient":
+    """Returns a healthy pooled pymilvus client, for writes and admin calls."""
+    return get_milvus_connections().client()
+
+
+def get_async_milvus_client() -> "AsyncMilvusClient":
+    """Returns the async pymilvus client for the running event loop."""
+    return get_milvus_connections().async_client()
+
+
+def get_vector_backend():
+    """
+    Returns the configured vector store backend (see vector_store.py).
+
+    Ingestion and retrieval only use this; "local" needs no Milvus server.
+    """
+    global _vector_backend
+    if _vector_backend is None:
+        with _resource_lock("vector_backend"):
+            if _vector_backend is None:
+                if config.VECTOR_BACKEND == "local":
+                    from local_vector_store import LocalVectorStore
+
+                    _vector_backend = LocalVectorStore()
+                elif config.VECTOR_BACKEND == "milvus":
+                    from vector_store import MilvusVectorStore
+
+                    _vector_backend = MilvusVectorStore(get_milvus_connections())
+                else:
+                    raise ValueError(
+                        f"Unknown VECTOR_BACKEND '{config.VECTOR_BACKEND}'"
+                    )
+    return _vector_backend
+
+
+def get_report_cache():
+    """Returns the shared semantic report cache, or None when it is disabled."""
+    global _report_cache
+    if not config.REPORT_CACHE_ENABLED:
+        return None
+    if _report_cache is None:
+        with _resource_lock("report_cache"):
+            if _report_cache is None:
+                from report_cache import ReportCache
+
+                _report_cache = ReportCache()
+    return _report_cache
+
+
+def get_llm_cache():
+    """Returns the shared LLM response cache, or None when it is disabled."""
+    global _llm_cache
+    if not config.LLM_CACHE_ENABLED:
+        return None
+    if _llm_cache is None:
+        with _resource_lock("llm_cache"):
+            if _llm_cache is None:
+                from llm_cache import SQLiteLLMCache
+
+                _llm_cache = SQLiteLLMCache()
+    return _llm_cache
+
+
+def get_llm():
+    """
+    Returns the shared chat model.
+
+    ChatGroq at temperature 0 by default, with responses cached per prompt
+    (see llm_cache.py); `set_resources(llm=...)` replaces it.
+    """
+    global _llm
+    if _llm is None:
+        with _resource_lock("llm"):
+            if _llm is None:
+                from langchain_groq import ChatGroq
+
+                _llm = ChatGroq(
+                    model=config.LLM_MODEL, temperature=0, cache=get_llm_cache()
+                )
+    return _llm
+
+
+def get_checkpointer():
+    """
+    Returns the shared LangGraph checkpointer (see checkpointer.py), with its
+    expiry sweeper running.
+    """
+    global _checkpointer
+    if _checkpointer is None:
+        with _resource_lock("checkpointer"):
+            if _checkpointer is None:
+                from checkpointer import SQLiteCheckpointSaver
+
+                _checkpointer = SQLiteCheckpointSaver(config.CHECKPOINT_PATH)
+                _checkpointer.start_sweeper()
+    return _checkpointer
+
+
+def get_export_jobs():
+    """
+    Returns the shared background export pool (see exports.py), with its
+    pruning sweeper running.
+    """
+    global _export_jobs
+    if _export_jobs is None:
+        with _resource_lock("export_jobs"):
+            if _export_jobs is None:
+                from exports import ExportJobs
+
+                _export_jobs = ExportJobs()
+                _export_jobs.start_sweeper()
+    return _export_jobs
+
+
+def set_resources(embedding_model=None, vector_backend=None, llm=None, reranker=None):
+    """
+    Replaces shared resources, e.g. with offline stand-ins for benchmarks.
+
+    Only the arguments that are given are replaced; call this before the
+    resources are first used.
+    """
+    global _embedding_model, _vector_backend, _llm, _reranker
+    with _lock:
+        if embedding_model is not None:
+            _embedding_model = embedding_model
+        if vector_backend is not None:
+            _vector_backend = vector_backend
+        if llm is not None:
+            _llm = llm
+        if reranker is not None:
+            _reranker = reranker
+
+
+def get_sparse_index():
+    """Returns the shared BM25 index, or None when hybrid search is disabled."""
+    global _sparse_index
+    if not config.SPARSE_INDEX_ENABLED:
+        return None
+    if _sparse_index is None:
+        with _resource_lock("sparse_index"):
+            if _sparse_index is None:
+                from sparse_index import BM25Index
+
+                _sparse_index = BM25Index()
+    return _sparse_index
+
+
+def get_reranker():
+    """Returns the shared cross-encoder reranker, or None when it is disabled."""
+    global _reranker
+    if not config.RERANK_ENABLED:
+        return None
+    if _reranker is None:
+        with _resource_lock("reranker"):
+            if _reranker is None:
+                from reranker import CrossEncoderReranker
+
+                _reranker = CrossEncoderReranker()
+    return _reranker
+
+
+def get_prefetcher():
+    """Returns the shared retrieval prefetcher, or None when it is disabled."""
+    global _prefetcher
+    if not config.PREFETCH_ENABLED:
+        return None
+    if _prefetcher is None:
+        with _resource_lock("prefetcher"):
+            if _prefetcher is None:
+                from prefetch import RetrievalPrefetcher
+
+                _prefetcher = RetrievalPrefetcher()
+    return _prefetcher
+
+
+def warm_up():
+    """Loads the embedding model and opens the vector store, once per process."""
+    global _warmed_up
+    # Only warm_up() takes this lock; the getters below take their own
+    with _resource_lock("warm_up"):
+        if _warmed_up:
+            return
+        print("--- Warming up shared resources ---")
+        embedding_model = get_embedding_model()
+        # The first inference initialises the ONNX session
+        embedding_model.embed_query("warm-up")
+        get_vector_backend().has_collection()
+        get_sparse_index()
+        reranker = get_reranker()
+        if reranker is not None:
+            try:
+                reranker.score_pairs([("warm-up", "warm-up")], budget_seconds=0)
+            except Exception as e:
+                # Research still works, in vector order
+                print(f"Cross-encoder unavailable: {e}")
+        get_llm()
+        _warmed_up = True
+        print("--- Warm-up complete ---")
+
+
+def is_warmed_up() -> bool:
+    return _warmed_up
@@ -0,0 +1,218 @@
+"""
+Pooled retrieval for a whole research plan.
+
+Plan steps are usually related, so their top chunks overlap, and the
+splitter's `CHUNK_OVERLAP` repeats text between neighbouring chunks. Instead
+of concatenating every step's top-k, the candidates of all steps are pooled,
+merged by chunk id and near-duplicate text, and max-marginal-relevance picks a
+relevant but diverse subset. The selection is rendered grouped by source and
+page, with the overlap between consecutive chunks cut out, which keeps the
+draft prompt short.
+"""
+
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+import config
+from embedding_cache import normalize_text
+
+# Shortest suffix/prefix match treated as splitter overlap
+MIN_OVERLAP_CHARS = 20
+
+
+class PlanContext(NamedTuple):
+    text: str
+    candidates: int  # hits returned over all steps
+    unique: int  # after merging duplicates
+    selected: int  # kept by MMR
+
+
+def _unit_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def pool_candidates(hits_per_step: List[List[dict]]) -> List[dict]:
+    """Merges the hits of all steps by chunk id, keeping first-seen order."""
+    pooled: Dict[str, dict] = {}
+    for hits in hits_per_step:
+        for hit in hits:
+            if "vector" not in hit:
+                raise ValueError("pooled retrieval needs the stored vectors")
+            pooled.setdefault(hit["pk"], hit)
+    return list(pooled.values())
+
+
+def missing_ids(
+    hits_per_step: List[List[dict]], sparse_per_step: List[List[str]]
+) -> List[str]:
+    """Keyword hits that the dense search did not return (to be fetched)."""
+    dense_ids = {hit["pk"] for hits in hits_per_step for hit in hits}
+    missing = {pk for ids in sparse_per_step for pk in ids if pk not in dense_ids}
+    return sorted(missing)
+
+
+def fuse_rankings(
+    hits_per_step: List[List[dict]],
+    sparse_per_step: List[List[str]],
+    fetched: Dict[str, dict],
+) -> List[List[dict]]:
+    """
+    Weighted reciprocal rank fusion of the dense and keyword rankings per step.
+
+    A chunk scores `w / (RRF_K + rank)` for each ranking it appears in; the
+    fused list is as long as the longer input ranking. `fetched` holds the
+    chunks that only the keyword search found.
+    """
+    fused_per_step = []
+    for hits, sparse_ids in zip(hits_per_step, sparse_per_step):
+        by_id = {hit["pk"]: hit for hit in hits}
+        scores: Dict[str, float] = defaultdict(float)
+        for rank, hit in enumerate(hits):
+            scores[hit["pk"]] += config.HYBRID_DENSE_WEIGHT / (config.RRF_K + rank + 1)
+        for rank, pk in enumerate(sparse_ids):
+            if pk in by_id or pk in fetched:
+                scores[pk] += config.HYBRID_SPARSE_WEIGHT / (config.RRF_K + rank + 1)
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        limit = max(len(hits), len(sparse_ids))
+        fused_per_step.append(
+            [by_id[pk] if pk in by_id else fetched[pk] for pk in ranked[:limit]]
+        )
+    return fused_per_step
+
+
+def drop_near_duplicates(
+    candidates: List[dict], vectors: np.ndarray, relevance: np.ndarray
+) -> List[int]:
+    """
+    Indices of the candidates to keep, most relevant first.
+
+    A candidate is dropped when its text is contained in an already kept one
+    (e.g. a shorter chunk repeated in a longer one) or its embedding is nearly
+    identical to a kept one's.
+    """
+    kept: List[int] = []
+    kept_texts: List[str] = []
+    for i in np.argsort(-relevance, kind="stable"):
+        text = normalize_text(candidates[i]["text"])
+        if any(text in other for other in kept_texts):
+            continue
+        if kept and np.max(vectors[kept] @ vectors[i]) >= (
+            config.RETRIEVAL_DUPLICATE_SIMILARITY
+        ):
+            continue
+        kept.append(int(i))
+        kept_texts.append(text)
+    return kept
+
+
+def mmr_select(
+    vectors: np.ndarray, relevance: np.ndarray, k: int, lambda_mult: float
+) -> List[int]:
+    """Greedy max-marginal-relevance over unit-norm candidate vectors."""
+    selected: List[int] = []
+    remaining = list(range(len(vectors)))
+    # Highest similarity of each candidate to anything selected so far
+    redundancy = np.full(len(vectors), -np.inf, dtype=np.float32)
+    while remaining and len(selected) < k:
+        penalty = np.where(np.isinf(redundancy[remaining]), 0.0, redundancy[remaining])
+        scores = lambda_mult * relevance[remaining] - (1 - lambda_mult) * penalty
+        best = remaining.pop(int(np.argmax(scores)))
+        selected.append(best)
+        redundancy = np.maximum(redundancy, vectors @ vectors[best])
+    return selected
+
+
+def _overlap_length(previous: str, text: str) -> int:
+    """Length of the longest suffix of `previous` that starts `text`."""
+    limit = min(len(previous), len(text), config.CHUNK_OVERLAP * 2)
+    for length in range(limit, MIN_OVERLAP_CHARS - 1, -1):
+        if previous.endswith(text[:length]):
+            return length
+    return 0
+
+
+def _merge_page(texts: List[str]) -> str:
+    """Chains the chunks of one page by their overlap and joins them."""
+    # successor[i] = j when texts[j] continues texts[i]; cut[j] = overlap length
+    successor: Dict[int, int] = {}
+    cut: Dict[int, int] = {}
+    for j, text in enumerate(texts):
+        for i, previous in enumerate(texts):
+            if i == j or i in successor:
+                continue
+            length = _overlap_length(previous, text)
+            if length:
+                successor[i], cut[j] = j, length
+                break
+
+    # Start chains at chunks without a predecessor; any leftover is a cycle
+    starts = [i for i in range(len(texts)) if i not in cut] + list(range(len(texts)))
+    paragraphs, seen = [], set()
+    for start in starts:
+        node, chained = start, False
+        while node is not None and node not in seen:
+            seen.add(node)
+            if chained:
+                paragraphs[-1] += " " + texts[node][cut[node] :].lstrip()
+            else:
+                paragraphs.append(texts[node])
+            node, chained = successor.get(node), True
+    return "\n\n".join(paragraphs)
+
+
+def format_context(selected: List[dict]) -> str:
+    """Renders the selection grouped by source and page, overlap removed."""
+    pages: Dict[tuple, List[str]] = defaultdict(list)
+    for candidate in selected:
+        pages[(candidate["source"], candidate["page"])].append(candidate["text"])
+
+    def _page_order(key):
+        source, page = key
+        return (str(source), page if isinstance(page, int) else 0)
+
+    return "\n\n---\n\n".join(
+        f"[Source: {source}, page: {page}]\n{_merge_page(pages[(source, page)])}"
+        for source, page in sorted(pages, key=_page_order)
+    )
+
+
+def build_plan_context(
+    query_vectors: np.ndarray,
+    hits_per_step: List[List[dict]],
+    relevance_by_id: Optional[Dict[str, float]] = None,
+) -> PlanContext:
+    """
+    Pools, deduplicates and diversifies the hits of every plan step.
+
+    `relevance_by_id` (e.g. cross-encoder scores, see reranker.py) replaces
+    the cosine similarity to the closest step as each chunk's relevance.
+    """
+    candidates = pool_candidates(hits_per_step)
+    total = sum(len(hits) for hits in hits_per_step)
+    if not candidates:
+        return PlanContext("No information found for this research plan.", 0, 0, 0)
+
+    vectors = _unit_rows(np.stack([c["vector"] for c in candidates]))
+    if relevance_by_id is not None:
+        relevance = np.asarray(
+            [relevance_by_id[c["pk"]] for c in candidates], dtype=np.float32
+        )
+    else:
+        # A chunk is as relevant as it is to the step it matches best
+        queries = _unit_rows(np.asarray(query_vectors, dtype=np.float32))
+        relevance = (vectors @ queries.T).max(axis=1)
+
+    kept = drop_near_duplicates(candidates, vectors, relevance)
+    # Never more chunks than the per-step top-k would have contributed once
+    # duplicates are removed; MMR may only trade redundant ones for diverse ones
+    top_k_ids = {
+        hit["pk"] for hits in hits_per_step for hit in hits[: config.RETRIEVAL_TOP_K]
+    }
+    k = min(config.RETRIEVAL_CONTEXT_CHUNKS, len(top_k_ids), len(kept))
+    chosen = mmr_select(vectors[kept], relevance[kept], k, config.RETRIEVAL_MMR_LAMBDA)
+    selected = [candidates[kept[i]] for i in chosen]
+    return PlanContext(format_context(selected), total, len(kept), len(selected))
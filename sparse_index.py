@@ -0,0 +1,239 @@
+"""
+BM25 keyword index over the ingested chunks.
+
+Dense retrieval misses exact-term matches (names, IDs, acronyms), which a
+keyword index handles well. The index is maintained by ingestion alongside
+the Milvus collection, keyed by the same chunk ids, so it is updated
+incrementally. Term counts per chunk are persisted in SQLite; for scoring they
+are compiled into a CSR posting matrix (term -> chunk slots and BM25 weights),
+so a query is a single `bincount` over the postings of its terms.
+
+The index records the collection generation it reflects (see manifest.py);
+a stale index is rebuilt from the collection by the next ingestion run.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+import config
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """Incremental BM25 index with a lazily compiled posting matrix."""
+
+    def __init__(
+        self,
+        path: str = config.SPARSE_INDEX_PATH,
+        k1: float = config.BM25_K1,
+        b: float = config.BM25_B,
+    ):
+        self.k1 = k1
+        self.b = b
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS docs (pk TEXT PRIMARY KEY, terms TEXT NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)"
+        )
+        self._db.commit()
+
+        # Term ids only ever grow; unused ones simply have no postings
+        self._vocab: Dict[str, int] = {}
+        # pk -> (term ids, term frequencies)
+        self._docs: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._compiled = None
+        self._loaded_generation: Optional[int] = None
+        self._load()
+
+    # --- Persistence ---
+    def _stored_generation(self) -> int:
+        row = self._db.execute(
+            "SELECT value FROM meta WHERE name = 'generation'"
+        ).fetchone()
+        return int(row[0]) if row else 0
+
+    def _load(self):
+        self._vocab.clear()
+        self._docs.clear()
+        for pk, terms in self._db.execute("SELECT pk, terms FROM docs"):
+            self._docs[pk] = self._encode(json.loads(terms))
+        self._loaded_generation = self._stored_generation()
+        self._compiled = None
+
+    def _encode(self, counts: Dict[str, int]) -> Tuple[np.ndarray, np.ndarray]:
+        term_ids = np.fromiter(
+            (self._vocab.setdefault(term, len(self._vocab)) for term in counts),
+            dtype=np.int32,
+            count=len(counts),
+        )
+        return term_ids, np.fromiter(counts.values(), np.float32, len(counts))
+
+    @property
+    def generation(self) -> int:
+        with self._lock:
+            return self._stored_generation()
+
+    @generation.setter
+    def generation(self, value: int):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES ('generation', ?)",
+                (str(value),),
+            )
+            self._loaded_generation = value
+
+    def is_current(self, generation: int) -> bool:
+        """
+        Whether the index reflects the given collection generation.
+
+        Picks up changes another process (e.g. `sync_data.py`) wrote to disk.
+        """
+        with self._lock:
+            stored = self._stored_generation()
+            if stored != self._loaded_generation:
+                self._load()
+            return stored == generation
+
+    # --- Updates ---
+    def add(self, ids: List[str], texts: List[str]):
+        counts = [Counter(tokenize(text)) for text in texts]
+        with self._lock:
+            with self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO docs (pk, terms) VALUES (?, ?)",
+                    [(pk, json.dumps(c)) for pk, c in zip(ids, counts)],
+                )
+            for pk, c in zip(ids, counts):
+                self._docs[pk] = self._encode(c)
+            self._compiled = None
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            with self._db:
+                self._db.executemany(
+                    "DELETE FROM docs WHERE pk = ?", [(pk,) for pk in ids]
+                )
+            for pk in ids:
+                self._docs.pop(pk, None)
+            self._compiled = None
+
+    def clear(self):
+        with self._lock:
+            with self._db:
+                self._db.execute("DELETE FROM docs")
+            self._vocab.clear()
+            self._docs.clear()
+            self._compiled = None
+
+    def rebuild(self, rows: Iterable[Tuple[str, str]]):
+        """Replaces the contents with `(pk, text)` rows, e.g. read from Milvus."""
+        self.clear()
+        ids, texts = [], []
+        for pk, text in rows:
+            ids.append(pk)
+            texts.append(text)
+            if len(ids) >= 1000:
+                self.add(ids, texts)
+                ids, texts = [], []
+        if ids:
+            self.add(ids, texts)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._docs)
+
+    # --- Search ---
+    def _compile(self):
+        """
+        Builds the CSR posting matrix with precomputed BM25 weights.
+
+        idf and the length normalisation only change when the corpus does, so
+        each posting stores its full term weight and a query is a sum of the
+        weight rows of its terms.
+        """
+        pks = list(self._docs)
+        if not pks:
+            return pks, None, None, None
+        term_ids = [self._docs[pk][0] for pk in pks]
+        freqs = [self._docs[pk][1] for pk in pks]
+        sizes = np.fromiter((len(t) for t in term_ids), np.int64, len(pks))
+        all_terms = np.concatenate(term_ids)
+        all_freqs = np.concatenate(freqs)
+        slots = np.repeat(np.arange(len(pks), dtype=np.int32), sizes)
+
+        order = np.argsort(all_terms, kind="stable")
+        all_terms, all_freqs, slots = all_terms[order], all_freqs[order], slots[order]
+        df = np.bincount(all_terms, minlength=len(self._vocab))
+        offsets = np.zeros(len(df) + 1, dtype=np.int64)
+        np.cumsum(df, out=offsets[1:])
+
+        n = len(pks)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        lengths = np.fromiter((f.sum() for f in freqs), np.float32, n)
+        avg_length = float(lengths.mean()) or 1.0
+        length_norm = self.k1 * (1 - self.b + self.b * lengths / avg_length)
+        weights = (
+            idf[all_terms]
+            * all_freqs
+            * (self.k1 + 1)
+            / (all_freqs + length_norm[slots])
+        ).astype(np.float32)
+        return pks, offsets, slots, weights
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Top-k `(pk, score)` pairs for a query, best first."""
+        with self._lock:
+            if self._compiled is None:
+                self._compiled = self._compile()
+            pks, offsets, posting_slots, posting_weights = self._compiled
+            vocab = self._vocab
+        if not pks:
+            return []
+
+        ranges = []
+        for term in set(tokenize(query)):
+            term_id = vocab.get(term)
+            if term_id is not None and term_id + 1 < len(offsets):
+                start, end = offsets[term_id], offsets[term_id + 1]
+                if start < end:
+                    ranges.append((start, end))
+        if not ranges:
+            return []
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            matched = posting_slots[start:end]
+            matched_scores = posting_weights[start:end]
+        else:
+            # One pass over all postings of the query's terms
+            scores = np.bincount(
+                np.concatenate([posting_slots[a:b] for a, b in ranges]),
+                weights=np.concatenate([posting_weights[a:b] for a, b in ranges]),
+                minlength=len(pks),
+            )
+            matched = np.flatnonzero(scores)
+            matched_scores = scores[matched]
+
+        if len(matched) > k:
+            top = np.argpartition(-matched_scores, k - 1)[:k]
+            matched, matched_scores = matched[top], matched_scores[top]
+        order = np.argsort(-matched_scores, kind="stable")
+        return [(pks[matched[i]], float(matched_scores[i])) for i in order]
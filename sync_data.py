@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+Incremental sync of the data directory into Milvus.
+
+Only new or changed PDFs are embedded; PDFs removed from the directory are
+deleted from the collection. Use fresh_start.py to force a full rebuild.
+"""
+
+import config
+from data_handler import sync_data_directory
+
+
+def main():
+    print(f"Syncing '{config.DATA_DIRECTORY}' into '{config.COLLECTION_NAME}'")
+    try:
+        docs_processed, chunks_ingested = sync_data_directory()
+        print(
+            f"Sync complete: {docs_processed} file(s) checked, {chunks_ingested} new chunks ingested"
+        )
+    except Exception as e:
+        print(f"Sync failed: {e}")
+        # Don't exit with error code - let the main app start anyway
+        print("Continuing to start the main application...")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,492 @@
+"""
+Vector store backends for the document collection.
+
+`VectorStore` is the interface ingestion and retrieval use; embeddings go in
+and come out as float32 matrices, and hits are plain dicts with `pk`, `text`,
+`source`, `page` and `distance` (plus `vector` on request). Two backends
+implement it:
+
+- `MilvusVectorStore`: the Milvus standalone server, through pymilvus. The
+  schema mirrors the layout `langchain_milvus.Milvus` creates (pk / text /
+  vector + metadata fields), so the collection stays readable by LangChain.
+- `LocalVectorStore` (local_vector_store.py): an in-process flat/IVF index
+  in memory-mapped files, for small deployments and offline runs.
+
+`config.VECTOR_BACKEND` selects the backend; see `resources.get_vector_backend()`.
+Hits are always ordered best first. The local backend's distances are squared
+L2, as are Milvus' with the default `MILVUS_METRIC_TYPE`.
+"""
+
+import asyncio
+import json
+import time
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+import config
+import metrics
+
+# pymilvus takes ~0.5s to import; the local backend and the agent's module
+# import never need it, so it is loaded by the Milvus code paths only
+if TYPE_CHECKING:
+    from pymilvus import MilvusClient
+
+    from milvus_connection import MilvusConnections
+
+# Field names of the LangChain Milvus schema
+PRIMARY_FIELD = "pk"
+TEXT_FIELD = "text"
+VECTOR_FIELD = "vector"
+MAX_VARCHAR_LENGTH = 65_535
+# Chunk metadata stored alongside the text; the only fields filters may use
+METADATA_FIELDS = ("source", "page")
+
+# Primary keys per delete expression
+DELETE_BATCH_SIZE = 1000
+
+MILVUS_METRICS = ("L2", "IP", "COSINE")
+# describe_index() keys that are not index build params
+_INDEX_INFO_KEYS = {
+    "field_name",
+    "index_name",
+    "index_type",
+    "metric_type",
+    "total_rows",
+    "indexed_rows",
+    "pending_index_rows",
+    "state",
+}
+
+
+def filter_values(filters: Optional[Dict[str, Any]]) -> Dict[str, list]:
+    """Normalises `{field: value or [values]}` equality filters."""
+    normalised = {}
+    for field, values in (filters or {}).items():
+        if field not in METADATA_FIELDS:
+            raise ValueError(f"Cannot filter on '{field}'")
+        normalised[field] = (
+            list(values) if isinstance(values, (list, tuple, set)) else [values]
+        )
+    return normalised
+
+
+def milvus_index_params(
+    dim: Optional[int] = None, index_type: Optional[str] = None
+) -> Tuple[str, str, dict]:
+    """
+    Validated `(index_type, metric_type, build params)` from config.
+
+    With `dim`, IVF_PQ's sub-quantiser count is checked against it too.
+    `index_type` overrides `MILVUS_INDEX_TYPE`.
+    """
+    index_type = index_type or config.MILVUS_INDEX_TYPE
+    if index_type not in config.MILVUS_INDEX_PARAMS:
+        raise ValueError(f"Unsupported MILVUS_INDEX_TYPE '{index_type}'")
+    if config.MILVUS_METRIC_TYPE not in MILVUS_METRICS:
+        raise ValueError(
+            f"Unsupported MILVUS_METRIC_TYPE '{config.MILVUS_METRIC_TYPE}'"
+        )
+    params = dict(config.MILVUS_INDEX_PARAMS[index_type])
+    if index_type == "IVF_PQ" and dim and dim % params["m"]:
+        raise ValueError(f"IVF_PQ m={params['m']} does not divide dimension {dim}")
+    return index_type, config.MILVUS_METRIC_TYPE, params
+
+
+def milvus_search_params(limit: int, index_type: Optional[str] = None) -> dict:
+    """Search params matching the configured index, for a top-`limit` query."""
+    index_type = index_type or config.MILVUS_INDEX_TYPE
+    params = dict(config.MILVUS_SEARCH_PARAMS.get(index_type, {}))
+    if "ef" in params:
+        # HNSW rejects an ef below the limit
+        params["ef"] = max(params["ef"], limit)
+    return {"metric_type": config.MILVUS_METRIC_TYPE, "params": params}
+
+
+class VectorStore(ABC):
+    """Operations ingestion and retrieval need from a vector backend."""
+
+    name = "base"
+
+    @abstractmethod
+    def has_collection(self) -> bool:
+        """Whether the collection exists (i.e. something was ingested)."""
+
+    @abstractmethod
+    def ensure_collection(self, dim: int):
+        """Creates the collection for `dim`-dimensional vectors if needed."""
+
+    @abstractmethod
+    def drop(self):
+        """Deletes the collection and everything in it."""
+
+    @abstractmethod
+    def upsert(
+        self,
+        ids: List[str],
+        texts: List[str],
+        metadatas: List[dict],
+        vectors: np.ndarray,
+    ):
+        """Inserts or replaces chunks with a `(n, dim)` float32 matrix."""
+
+    @abstractmethod
+    def delete(self, ids: List[str]):
+        """Deletes chunks by primary key."""
+
+    @abstractmethod
+    def search(
+        self,
+        vectors: np.ndarray,
+        k: int,
+        with_vectors: bool = False,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[List[dict]]:
+        """
+        Searches several query vectors in a single call.
+
+        Returns, per query, the top-k hits as dicts with `pk`, `text`,
+        `source`, `page` and `distance` (plus the stored `vector` with
+        `with_vectors`). `filters` restricts the search by metadata equality,
+        e.g. `{"source": ["a.pdf", "b.pdf"]}`.
+        """
+
+    @abstractmethod
+    def get(self, ids: List[str], with_vectors: bool = False) -> Dict[str, dict]:
+        """Fetches chunks by primary key, as hit dicts without a distance."""
+
+    @abstractmethod
+    def iter_texts(self) -> Iterator[Tuple[str, str]]:
+        """Yields `(pk, text)` for every chunk."""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of stored chunks."""
+
+    def describe(self) -> dict:
+        """Index, load state and memory use of the collection, for diagnostics."""
+        return {"backend": self.name, "rows": self.count()}
+
+    # In-process backends are CPU-bound; run them off the event loop
+    async def asearch(
+        self,
+        vectors: np.ndarray,
+        k: int,
+        with_vectors: bool = False,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[List[dict]]:
+        return await asyncio.to_thread(self.search, vectors, k, with_vectors, filters)
+
+    async def aget(self, ids: List[str], with_vectors: bool = False) -> Dict[str, dict]:
+        return await asyncio.to_thread(self.get, ids, with_vectors)
+
+
+def row_to_hit(row: dict) -> dict:
+    """Converts a stored row (field name -> value) into a hit dict."""
+    result = {
+        "pk": row.get(PRIMARY_FIELD),
+        "text": row.get(TEXT_FIELD, ""),
+        "source": row.get("source", "N/A"),
+        "page": row.get("page", "N/A"),
+        "distance": None,
+    }
+    if row.get(VECTOR_FIELD) is not None:
+        result["vector"] = np.asarray(row[VECTOR_FIELD], dtype=np.float32)
+    return result
+
+
+class MilvusVectorStore(VectorStore):
+    """
+    The collection on a Milvus server.
+
+    Clients come from the shared connection pool (see milvus_connection.py),
+    so nothing connects until the store is used. Reads and idempotent writes
+    are retried on a fresh connection if the channel drops; the collection is
+    loaded once, before the first read.
+    """
+
+    name = "milvus"
+
+    def __init__(
+        self,
+        connections: "MilvusConnections",
+        collection_name: str = config.COLLECTION_NAME,
+        index_type: str = config.MILVUS_INDEX_TYPE,
+    ):
+        """`index_type` is used to build the collection and by every search."""
+        self._connections = connections
+        self.collection_name = collection_name
+        self.index_type = index_type.upper()
+
+    @property
+    def client(self) -> "MilvusClient":
+        return self._connections.client()
+
+    def has_collection(self) -> bool:
+        return self._connections.run(
+            lambda client: client.has_collection(self.collection_name)
+        )
+
+    def ensure_collection(self, dim: int):
+        """Creates (and loads) the collection if it does not exist yet."""
+        from pymilvus import DataType, MilvusClient
+
+        client = self.client
+        index_type, metric_type, params = milvus_index_params(dim, self.index_type)
+        if client.has_collection(self.collection_name):
+            self._warn_on_index_mismatch(index_type, metric_type)
+            return
+        schema = MilvusClient.create_schema(auto_id=False, enable_dynamic_field=False)
+        schema.add_field(TEXT_FIELD, DataType.VARCHAR, max_length=MAX_VARCHAR_LENGTH)
+        schema.add_field(
+            PRIMARY_FIELD,
+            DataType.VARCHAR,
+            is_primary=True,
+            max_length=MAX_VARCHAR_LENGTH,
+        )
+        schema.add_field(VECTOR_FIELD, DataType.FLOAT_VECTOR, dim=dim)
+        schema.add_field("source", DataType.VARCHAR, max_length=MAX_VARCHAR_LENGTH)
+        schema.add_field("page", DataType.INT64)
+
+        index_params = client.prepare_index_params()
+        index_params.add_index(
+            field_name=VECTOR_FIELD,
+            index_type=index_type,
+            metric_type=metric_type,
+            params=params,
+        )
+        client.create_collection(
+            self.collection_name,
+            schema=schema,
+            index_params=index_params,
+            consistency_level="Session",
+        )
+        print(
+            f"Created collection: {self.collection_name} "
+            f"(dim={dim}, {index_type}/{metric_type} {params})"
+        )
+
+    def _index_info(self) -> Optional[dict]:
+        client = self.client
+        index_names = client.list_indexes(self.collection_name, field_name=VECTOR_FIELD)
+        if not index_names:
+            return None
+        return client.describe_index(self.collection_name, index_names[0])
+
+    def _warn_on_index_mismatch(self, index_type: str, metric_type: str):
+        """Existing collections keep their index; say so if config disagrees."""
+        info = self._index_info() or {}
+        actual = (info.get("index_type"), info.get("metric_type"))
+        if actual != (index_type, metric_type):
+            print(
+                f"Warning: '{self.collection_name}' is indexed as "
+                f"{actual[0]}/{actual[1]} but config asks for "
+                f"{index_type}/{metric_type}; run fresh_start.py to rebuild it"
+            )
+
+    def drop(self):
+        client = self.client
+        if client.has_collection(self.collection_name):
+            client.drop_collection(self.collection_name)
+            self._connections.forget_loaded(self.collection_name)
+            print(f"Dropped collection: {self.collection_name}")
+
+    def upsert(
+        self,
+        ids: List[str],
+        texts: List[str],
+        metadatas: List[dict],
+        vectors: np.ndarray,
+    ):
+        """
+        Bulk upsert of a batch of chunks.
+
+        Rows reference the matrix rows as views, so no Python float lists are
+        built here; pymilvus serialises each row straight from the array.
+        Upserting (rather than inserting) makes retries after a partial failure
+        idempotent.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        rows = [
+            {
+                PRIMARY_FIELD: chunk_id,
+                TEXT_FIELD: text,
+                VECTOR_FIELD: vector,
+                **metadata,
+            }
+            for chunk_id, text, vector, metadata in zip(ids, texts, vectors, metadatas)
+        ]
+        self._connections.run(lambda client: client.upsert(self.collection_name, rows))
+
+    def delete(self, ids: List[str]):
+        """Deletes chunks by primary key, in batches to keep expressions small."""
+        for i in range(0, len(ids), DELETE_BATCH_SIZE):
+            batch = ids[i : i + DELETE_BATCH_SIZE]
+            self._connections.run(
+                lambda client: client.delete(self.collection_name, ids=batch)
+            )
+
+    def search(
+        self,
+        vectors: np.ndarray,
+        k: int,
+        with_vectors: bool = False,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[List[dict]]:
+        started = time.perf_counter()
+        kwargs = self._search_kwargs(vectors, k, with_vectors, filters)
+        self._connections.ensure_loaded(self.collection_name)
+        results = self._connections.run(
+            lambda client: client.search(self.collection_name, **kwargs)
+        )
+        hits = [[self._hit_to_dict(hit) for hit in hits] for hits in results]
+        metrics.record_search(
+            self.name, len(kwargs["data"]), hits, time.perf_counter() - started
+        )
+        return hits
+
+    async def asearch(
+        self,
+        vectors: np.ndarray,
+        k: int,
+        with_vectors: bool = False,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> List[List[dict]]:
+        """Awaits the search on the event loop with the async client."""
+        started = time.perf_counter()
+        kwargs = self._search_kwargs(vectors, k, with_vectors, filters)
+        await self._aensure_loaded()
+        results = await self._connections.arun(
+            lambda client: client.search(self.collection_name, **kwargs)
+        )
+        hits = [[self._hit_to_dict(hit) for hit in hits] for hits in results]
+        metrics.record_search(
+            self.name, len(kwargs["data"]), hits, time.perf_counter() - started
+        )
+        return hits
+
+    def get(self, ids: List[str], with_vectors: bool = False) -> Dict[str, dict]:
+        if not ids:
+            return {}
+        output_fields = self._output_fields(with_vectors)
+        self._connections.ensure_loaded(self.collection_name)
+        rows = self._connections.run(
+            lambda client: client.get(
+                self.collection_name, ids=ids, output_fields=output_fields
+            )
+        )
+        return {row[PRIMARY_FIELD]: row_to_hit(row) for row in rows}
+
+    async def aget(self, ids: List[str], with_vectors: bool = False) -> Dict[str, dict]:
+        if not ids:
+            return {}
+        output_fields = self._output_fields(with_vectors)
+        await self._aensure_loaded()
+        rows = await self._connections.arun(
+            lambda client: client.get(
+                self.collection_name, ids=ids, output_fields=output_fields
+            )
+        )
+        return {row[PRIMARY_FIELD]: row_to_hit(row) for row in rows}
+
+    def iter_texts(self, batch_size: int = 1000) -> Iterator[Tuple[str, str]]:
+        self._connections.ensure_loaded(self.collection_name)
+        iterator = self.client.query_iterator(
+            self.collection_name, batch_size=batch_size, output_fields=[TEXT_FIELD]
+        )
+        try:
+            while True:
+                rows = iterator.next()
+                if not rows:
+                    return
+                for row in rows:
+                    yield row[PRIMARY_FIELD], row[TEXT_FIELD]
+        finally:
+            iterator.close()
+
+    def count(self) -> int:
+        stats = self._connections.run(
+            lambda client: client.get_collection_stats(self.collection_name)
+        )
+        return int(stats.get("row_count", 0))
+
+    def describe(self) -> dict:
+        client = self.client
+        info = {"backend": self.name, "collection": self.collection_name}
+        if not client.has_collection(self.collection_name):
+            return {**info, "exists": False}
+        index = self._index_info() or {}
+        load = client.get_load_state(self.collection_name)
+        load_state = load.get("state")
+        info.update(
+            exists=True,
+            rows=self.count(),
+            index_type=index.get("index_type"),
+            metric_type=index.get("metric_type"),
+            index_params={
+                key: value
+                for key, value in index.items()
+                if key not in _INDEX_INFO_KEYS
+            },
+            indexed_rows=index.get("indexed_rows"),
+            pending_index_rows=index.get("pending_index_rows"),
+            index_state=index.get("state"),
+            load_state=getattr(load_state, "name", str(load_state)),
+            load_progress=load.get("progress"),
+            search_params=milvus_search_params(
+                config.RETRIEVAL_FETCH_K, self.index_type
+            ),
+        )
+        try:
+            # MilvusClient has no public call for the loaded segments
+            segments = client._get_connection().get_query_segment_info(
+                self.collection_name
+            )
+            info["memory_bytes"] = sum(segment.mem_size for segment in segments)
+            info["loaded_segments"] = len(segments)
+        except Exception as e:
+            info["memory_bytes"] = f"unavailable ({e})"
+        return info
+
+    async def _aensure_loaded(self):
+        # Only the first read blocks on the load, so it runs off the loop
+        if not self._connections.is_loaded(self.collection_name):
+            await asyncio.to_thread(
+                self._connections.ensure_loaded, self.collection_name
+            )
+
+    @staticmethod
+    def _output_fields(with_vectors: bool) -> List[str]:
+        output_fields = [TEXT_FIELD, *METADATA_FIELDS]
+        if with_vectors:
+            output_fields.append(VECTOR_FIELD)
+        return output_fields
+
+    def _search_kwargs(
+        self,
+        vectors: np.ndarray,
+        k: int,
+        with_vectors: bool,
+        filters: Optional[Dict[str, Any]],
+    ) -> dict:
+        expression = " and ".join(
+            f"{field} in {json.dumps(values)}"
+            for field, values in filter_values(filters).items()
+        )
+        return {
+            "data": list(np.ascontiguousarray(vectors, dtype=np.float32)),
+            "limit": k,
+            "filter": expression,
+            "anns_field": VECTOR_FIELD,
+            "search_params": milvus_search_params(k, self.index_type),
+            "output_fields": self._output_fields(with_vectors),
+        }
+
+    @staticmethod
+    def _hit_to_dict(hit) -> dict:
+        # Newer pymilvus keys the hit by the primary field name, older by "id"
+        result = row_to_hit(hit.get("entity") or {})
+        result["pk"] = hit.get(PRIMARY_FIELD, hit.get("id"))
+        result["distance"] = hit.get("distance")
+        return result